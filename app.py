@@ -1,7 +1,6 @@
+import os
 import streamlit as st
-import pandas as pd
-import numpy as np
-import requests # สำหรับการเรียก HTTP API
+from rerun_metrics import MetricsRegistry, set_memory_tracing, top_allocations
 
 # --- การตั้งค่าเบื้องต้นของหน้า (Page Configuration) ---
 st.set_page_config(
@@ -14,7 +13,11 @@ st.set_page_config(
 # ID ของ Google Sheet (จาก URL ของ Sheet)
 SPREADSHEET_ID = "10HEC9q7mwhvCkov1sd8IMWFNYhXLZ7-nQj0S10tAATQ" 
 # URL ของ Google Apps Script Web App ที่ Deploy แล้ว (URL ล่าสุดของคุณ)
-GAS_WEB_APP_URL = "https://script.google.com/macros/s/AKfycbyJm3h-MaQoVL7q-cTZjawiIKmSeHgM_8W3Sj_iboGXZRXVFmOvh-XhFvgwaHv4m1s5/exec"
+# (กำหนดแทนได้ด้วย RISK_APP_GAS_URL เช่น ชี้ไปที่ Apps Script จำลองของ benchmarks)
+GAS_WEB_APP_URL = os.environ.get(
+    'RISK_APP_GAS_URL',
+    "https://script.google.com/macros/s/AKfycbyJm3h-MaQoVL7q-cTZjawiIKmSeHgM_8W3Sj_iboGXZRXVFmOvh-XhFvgwaHv4m1s5/exec"
+)
 LOG_SHEET_NAME = "ขั้นตอนการทำงาน-ลักษณะงาน"
 
 # ชื่อคอลัมน์ที่แสดงผลใน UI และคีย์ API ที่เกี่ยวข้อง
@@ -24,316 +27,652 @@ LOG_KEYS = {
     'ตำแหน่งงาน': 'position' # ตำแหน่งงาน (Col C)
 }
 REQUIRED_COLUMNS = list(LOG_KEYS.keys())
-
-# --- 1. ฟังก์ชันการเชื่อมต่อ Google Apps Script API ---
-
-def fetch_sheet_data(action, sheet_name, data=None):
-    """ฟังก์ชันหลักสำหรับเรียกใช้ Google Apps Script API"""
-    try:
-        if action == 'read':
-            params = {
-                'action': action,
-                'sheet': sheet_name,
-                'spreadsheetId': SPREADSHEET_ID
-            }
-            response = requests.get(GAS_WEB_APP_URL, params=params)
-       
-        elif action == 'write':
-            # POST request
-            payload = {
-                'action': action,
-                'sheet': sheet_name,
-                'spreadsheetId': SPREADSHEET_ID,
-                'data': data.to_dict('records') if data is not None else []
-            }
-            response = requests.post(GAS_WEB_APP_URL, json=payload, timeout=60) 
-
-        response.raise_for_status() # ตรวจสอบ HTTP errors (เช่น 4xx, 5xx)
-        return response.json()
-
-    except requests.exceptions.RequestException as e:
-        st.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ API ({action}): กรุณาตรวจสอบ URL, การ Deploy และสิทธิ์เข้าถึง. Error: {e}")
-        return None
-    except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดที่ไม่ทราบสาเหตุในการเรียก API: {e}")
-        return None
-
-# --- 2. ฟังก์ชันโหลดข้อมูลจริง ---
-
-def load_log_data():
-    """โหลดข้อมูลขั้นตอนการทำงานจริงจาก Google Sheet และกรองตามคอลัมน์ A"""
-    with st.spinner("กำลังโหลดข้อมูลขั้นตอนการทำงานจาก Google Sheet..."):
-        response = fetch_sheet_data('read', LOG_SHEET_NAME)
-       
-        if response and response.get('status') == 'success':
-            data_list = response.get('data', [])
-           
-            if not data_list:
-                return pd.DataFrame(columns=REQUIRED_COLUMNS)
-           
-            df = pd.DataFrame(data_list)
-           
-            # 1. แมปชื่อคีย์กลับไปเป็นชื่อคอลัมน์ภาษาไทยที่ Streamlit คาดหวัง
-            reverse_map = {v: k for k, v in LOG_KEYS.items()}
-            df = df.rename(columns=reverse_map)
-           
-            # 2. ทำความสะอาดคอลัมน์ที่ไม่ต้องการ
-            if 'rowIndex' in df.columns:
-                df = df.drop(columns=['rowIndex'])
-                 
-            # 3. เลือกเฉพาะคอลัมน์ที่ต้องการตามลำดับใหม่
-            df = df[REQUIRED_COLUMNS]
-           
-            # 4. การกรอง: ยึดคอลัมน์ 'กลุ่มงาน' (Col A) เป็นหลักมีมีข้อมูลในบรรทัดนั้น ๆ
-            df = df[df['กลุ่มงาน'].astype(str).str.strip() != '']
-           
-            return df
-        else:
-            st.warning("ไม่สามารถโหลดข้อมูลขั้นตอนการทำงานได้ (ใช้ข้อมูลว่างแทน).")
-            return pd.DataFrame(columns=REQUIRED_COLUMNS)
-
-
-# จำลองข้อมูลประเมินความเสี่ยง (Mock Data)
-def load_risk_mock_data():
-    """จำลองข้อมูลความเสี่ยงตามหน่วยงาน (ไม่ได้เชื่อมต่อ API)"""
-    return {
-        "แผนกการผลิต": pd.DataFrame({
-            'กิจกรรม': ["ยกกล่องหนัก", "ใช้เครื่องจักรเจาะ"],
-            'อันตรายที่อาจเกิดขึ้น': ["บาดเจ็บหลัง/กล้ามเนื้อ", "นิ้วติด/เศษโลหะกระเด็น"],
-            'มาตรการควบคุมปัจจุบัน': ["ใช้รถเข็นหรือยกสองคน", "สวมถุงมือและแว่นตานิรภัย, มีการ์ดป้องกัน"],
-            'L': [3, 2], 'C': [4, 5]
-        }),
-        "แผนกบัญชี": pd.DataFrame({
-            'กิจกรรม': ["นั่งทำงานหน้าคอมพิวเตอร์นาน"],
-            'อันตรายที่อาจเกิดขึ้น': ["ปวดตา/ปวดหลัง/ออฟฟิศซินโดรม"],
-            'มาตรการควบคุมปัจจุบัน': ["พักสายตา 20-20-20, เก้าอี้ Ergonomic"],
-            'L': [4], 'C': [2]
-        }),
-    }
-
-
-# --- 3. การจัดการ Session State และข้อมูลเริ่มต้น ---
-if 'log_data' not in st.session_state:
-    st.session_state.log_data = load_log_data()
-    st.session_state.initial_log_data = st.session_state.log_data.copy() # ข้อมูลเริ่มต้นสำหรับการเปรียบเทียบ
-    st.session_state.risk_mock_data = load_risk_mock_data()
-    st.session_state.edited_log = False
-
-
-# --- ฟังก์ชันสำหรับเพิ่มแถวใหม่ ---
-def add_new_row():
-    """เพิ่มแถวว่างใหม่ใน Session State และตั้งค่าว่ามีการแก้ไข"""
-    new_row = pd.DataFrame({col: [''] for col in REQUIRED_COLUMNS})
-    st.session_state.log_data = pd.concat([st.session_state.log_data, new_row], ignore_index=True)
-    st.session_state.edited_log = True # ตั้งค่าทันทีเมื่อกดเพิ่ม
+# คอลัมน์ที่มีค่าซ้ำกันมาก เก็บเป็น categorical ใน Session State
+LOG_CATEGORY_COLUMNS = ('กลุ่มงาน', 'ตำแหน่งงาน')
+
+# การตั้งค่า HTTP client (timeout เป็น (connect, read) วินาที)
+API_TIMEOUTS = {'read': (5, 30), 'write': (5, 60), 'patch': (5, 60)}
+API_RETRIES = 3
+# เปิดเมื่อ Apps Script ถอด gzip ด้วย Utilities.ungzip แล้วเท่านั้น
+API_GZIP_WRITES = False
+# เปิดเมื่อ Apps Script ที่ Deploy แล้วรองรับ action 'patch' (ตามลำดับใน log_changes) เท่านั้น
+# ปิด = บันทึกด้วยการเขียนทับทั้ง Sheet (กำหนดแทนได้ด้วย RISK_APP_PATCH_WRITES=1 เช่น กับ Apps Script จำลอง)
+API_PATCH_WRITES = os.environ.get('RISK_APP_PATCH_WRITES', '0') == '1'
+
+# จำนวนแถวต่อหน้าเมื่อโหลดข้อมูลขั้นตอนการทำงาน (หน้าแรกแสดงผลทันที หน้าที่เหลือโหลดใน Background)
+LOG_PAGE_SIZE = 5000
+# จำนวนหน้าที่ขอจาก Apps Script พร้อมกันระหว่างโหลดหน้าที่เหลือ (Apps Script รับได้ไม่เกิน 30 คำขอพร้อมกัน)
+LOG_PAGE_CONCURRENCY = 4
+# รอบการรีเฟรชข้อมูลขั้นตอนการทำงานระดับ Process ใน Background (Session ใหม่ได้ข้อมูลจากที่โหลดไว้ทันที)
+LOG_SNAPSHOT_REFRESH_SECONDS = 60
+
+# ที่เก็บข้อมูล: 'apps_script' (Google Sheet โดยตรง), 'sqlite' (ไฟล์บนเครื่อง นำเข้าข้อมูลจาก Sheet ในครั้งแรก)
+# หรือ 'write_behind' (บันทึกลง SQLite ทันที แล้วซิงก์ไป Google Sheet ใน Background ผ่าน journal)
+STORAGE_BACKEND = 'apps_script'
+STORAGE_SQLITE_PATH = 'risk_assessment.db'
+SYNC_JOURNAL_PATH = 'risk_assessment.journal'
+# โฟลเดอร์ตารางความเสี่ยงต่อหน่วยงาน (.csv/.parquet ชื่อไฟล์คือชื่อหน่วยงาน) ไม่กำหนด = ใช้ข้อมูลจำลอง
+RISK_TABLE_SOURCE = os.environ.get('RISK_APP_RISK_SOURCE')
+
+# แผงวัดประสิทธิภาพสำหรับผู้ดูแลระบบ: เปิดด้วย ?admin=<token> เมื่อกำหนด RISK_APP_ADMIN_TOKEN
+ADMIN_TOKEN = os.environ.get('RISK_APP_ADMIN_TOKEN')
+# ไฟล์ Prometheus text สำหรับ textfile collector ของ node_exporter (ไม่กำหนด = ไม่เขียน)
+METRICS_TEXTFILE_PATH = os.environ.get('RISK_APP_METRICS_FILE')
+
+@st.cache_resource
+def get_metrics():
+    """ตัวเก็บค่าวัดเวลา rerun และการเรียก HTTP ระดับ Process"""
+    return MetricsRegistry()
+
+# เริ่มจับเวลา rerun นี้ และเปิด cProfile/tracemalloc ตามที่ผู้ดูแลเลือกไว้
+rerun_record = get_metrics().begin_rerun(profile=st.session_state.get('admin_cprofile', False))
+# ปิด rerun ใน finally: st.rerun()/st.stop() (รวมถึงจาก fragment) จบสคริปต์ด้วย exception
+# ถ้าไม่ปิด cProfile จะยังเปิดค้างอยู่ใน Thread ของสคริปต์
+try:
+    # --- โครงหน้าและแท็บ 1 (แสดงทันที ก่อน import โมดูลที่ใช้ pandas และก่อนรอข้อมูลจาก Google Sheet) ---
+
+    st.title("โปรแกรมประเมินความเสี่ยงจากการทำงาน")
+    st.subheader("Risk Assessment Program")
+
+    # ตรวจสอบสถานะการแก้ไขเพื่อใช้ในการปิดการใช้งานแท็บอื่น (Session ใหม่ยังไม่มีข้อมูล)
+    is_edited = st.session_state.get('edited_log', False)
+    disabled_text = "คุณมีการเปลี่ยนแปลงที่ยังไม่ได้บันทึก กรุณากด 💾 บันทึก ก่อน"
+    disabled_state = is_edited
+
+    # ค่าของ Widget ในแท็บที่ไม่ได้แสดงจะถูกล้าง: ตั้งค่าซ้ำเพื่อเก็บตัวกรองของแท็บ 2 ไว้ระหว่างเปลี่ยนแท็บ
+    if 'log_filter_select' in st.session_state:
+        st.session_state.log_filter_select = st.session_state.log_filter_select
+
+    # สร้างแท็บ (ไม่สามารถปิดการใช้งานแท็บได้โดยตรง จึงต้องใช้การเตือนและปิดใช้งานเนื้อหาในแท็บ)
+    # เปลี่ยนแท็บแล้ว rerun เพื่อให้แท็บ 2 โหลด/แสดงตารางเฉพาะเมื่อเปิดอยู่ (tab2.open)
+    tab1, tab2, tab3 = st.tabs([
+        "1. คู่มือการประเมินความเสี่ยง", 
+        "2. บันทึกขั้นตอนการทำงาน", 
+        "3. ประเมินความเสี่ยงจากการทำงาน"
+    ], key="main_tab", on_change="rerun")
+
+    # --- แท็บ 1: คู่มือการประเมินความเสี่ยง ---
+    with tab1:
+        st.header("1. คู่มือการประเมินความเสี่ยงจากการทำงาน")
    
-# --- ฟังก์ชันการคำนวณและการแสดงผล ---
-def calculate_risk_level(df):
-    """คำนวณระดับความเสี่ยง (L x C) และกำหนดสี"""
-    if df.empty:
-        return df
+        # Req 4: เตือนเมื่อมีข้อมูลที่ยังไม่ได้บันทึก
+        if disabled_state:
+            st.warning(f"**{disabled_text}** ก่อนเข้าถึงแท็บนี้")
    
-    df['ระดับความเสี่ยง (L x C)'] = df['L'] * df['C']
-   
-    def highlight_risk(val):
-        color = ''
-        if val >= 15: color = 'background-color: #fca5a5; color: #991b1b; font-weight: bold;' # Red
-        elif val >= 8: color = 'background-color: #fcd34d; color: #92400e; font-weight: bold;' # Orange
-        elif val >= 4: color = 'background-color: #fde68a; color: #9a3412;' # Yellow
-        else: color = 'background-color: #a7f3d0; color: #065f46;' # Green
-        return color
-
-    return df.style.applymap(
-        highlight_risk, 
-        subset=['ระดับความเสี่ยง (L x C)']
+        st.link_button(
+            "คลิก เพื่อดาวน์โหลด", 
+            url="https://drive.google.com/file/d/1VQb2pw5La9NPKjLDzKr_KnucMsRy_Wjl/view?usp=sharing",
+            type="primary",
+            disabled=disabled_state
+        )
+
+    # --- โมดูลที่ใช้ pandas/requests (import ครั้งแรกของ Process ใช้เวลานาน จึง import หลังแสดงแท็บ 1 แล้ว) ---
+    import pandas as pd
+    import requests # สำหรับการเรียก HTTP API
+    from log_changes import build_changeset, changeset_is_empty, apply_ack, row_hashes
+    from sheet_client import SheetClient
+    from log_frame import (
+        LogSnapshot, compact_log_frame, editor_frame
     )
+    from log_index import GroupIndex, append_rows, merge_group_edits
+    from risk_data import load_risk_tables
+    from storage import AppsScriptBackend, SQLiteBackend, copy_sheet
+    from write_behind import WriteBehindBackend
+    from risk_engine import DEFAULT_MATRIX, SCORE_COLUMN, BAND_COLUMN, score_risks, summarize_risks
+
+    # ใช้ Copy-on-Write (เปิดเสมอใน pandas >= 3) เพื่อให้การ slice/assign ไม่ต้องทำสำเนาป้องกันไว้ก่อน
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+    # --- 1. ฟังก์ชันการเชื่อมต่อ Google Apps Script API ---
+
+    @st.cache_resource
+    def get_sheet_client():
+        """HTTP client ระดับ Process (ใช้ connection pool ร่วมกันทุก Session)"""
+        return SheetClient(
+            GAS_WEB_APP_URL,
+            SPREADSHEET_ID,
+            timeouts=API_TIMEOUTS,
+            retries=API_RETRIES,
+            gzip_writes=API_GZIP_WRITES,
+            observer=get_metrics().observe_http
+        )
 
-# --- 4. โครงสร้าง UI หลัก ---
+    @st.cache_resource
+    def get_storage():
+        """ที่เก็บข้อมูลระดับ Process ตาม STORAGE_BACKEND (ใช้ร่วมกันทุก Session)"""
+        if STORAGE_BACKEND in ('sqlite', 'write_behind'):
+            storage = SQLiteBackend(
+                STORAGE_SQLITE_PATH,
+                LOG_KEYS.values(),
+                LOG_KEYS['กลุ่มงาน'],
+                risk_tables=load_risk_tables(RISK_TABLE_SOURCE)
+            )
+            if not storage.has_sheet(LOG_SHEET_NAME):
+                try:
+                    copy_sheet(AppsScriptBackend(get_sheet_client()), storage, LOG_SHEET_NAME)
+                except requests.exceptions.RequestException:
+                    # นำเข้าไม่สำเร็จ: เริ่มจากตารางว่าง และลองนำเข้าใหม่เมื่อเริ่ม Process ครั้งถัดไป
+                    pass
+            if STORAGE_BACKEND == 'write_behind':
+                return WriteBehindBackend(
+                    storage, AppsScriptBackend(get_sheet_client()), SYNC_JOURNAL_PATH, remote_patch=API_PATCH_WRITES
+                ).start()
+            return storage
+        return AppsScriptBackend(get_sheet_client(), risk_tables=load_risk_tables(RISK_TABLE_SOURCE))
+
+    @get_metrics().timed('api_fetch')
+    def fetch_sheet_data(action, sheet_name, data=None, base_version=None):
+        """ฟังก์ชันหลักสำหรับเขียน Sheet ผ่านที่เก็บข้อมูลที่เลือก (Apps Script หรือ SQLite)
+
+        การอ่านข้อมูลขั้นตอนการทำงานทำผ่าน get_log_snapshot() ซึ่งถูกปรับตามผลการเขียนที่นี่
+        patch ที่ระบุ `base_version` จะได้ status 'conflict' เมื่อ Sheet ถูกแก้ไขไปแล้วหลังจากโหลด version นั้น
+        """
+        storage = get_storage()
+        try:
+            if action == 'write':
+                records = data.to_dict('records') if data is not None else []
+                result = storage.write(sheet_name, records)
+
+            elif action == 'patch':
+                # ส่งเฉพาะแถวที่เปลี่ยนแปลง (data คือ changeset จาก build_changeset)
+                result = storage.patch(sheet_name, data, base_version=base_version)
+
+            # SheetClient ตรวจสอบ HTTP errors (เช่น 4xx, 5xx) และลองใหม่ให้แล้ว
+            if result.get('status') == 'success' and sheet_name == LOG_SHEET_NAME:
+                # ข้อมูลใน Sheet เปลี่ยนแล้ว: patch ปรับ snapshot ตาม changeset (Session อื่นยังได้ข้อมูลทันที)
+                # การเขียนทับทั้ง Sheet ต้องโหลดใหม่ทั้งชุด
+                if action == 'patch':
+                    get_log_snapshot().apply(data, result, base_version)
+                else:
+                    get_log_snapshot().invalidate()
+            return result
+
+        except requests.exceptions.RequestException as e:
+            st.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ API ({action}): กรุณาตรวจสอบ URL, การ Deploy และสิทธิ์เข้าถึง. Error: {e}")
+            return None
+        except Exception as e:
+            st.error(f"เกิดข้อผิดพลาดที่ไม่ทราบสาเหตุในการเรียก API: {e}")
+            return None
+
+    # --- 2. ฟังก์ชันโหลดข้อมูลจริง ---
+
+    def set_log_data(df):
+        """ตั้งค่า log_data ใหม่ทั้งชุด พร้อมสร้างดัชนีกลุ่มงาน → แถว ใหม่"""
+        st.session_state.log_data = df
+        st.session_state.log_group_index = GroupIndex(df['กลุ่มงาน'])
+
+    @st.cache_resource(on_release=lambda snapshot: snapshot.close())
+    def get_log_snapshot():
+        """ข้อมูลขั้นตอนการทำงานล่าสุดระดับ Process (ใช้ร่วมกันทุก Session)
+
+        เริ่มโหลดใน Background ตั้งแต่ rerun แรกของ Process และรีเฟรชทุก LOG_SNAPSHOT_REFRESH_SECONDS วินาที
+        Session ใหม่จึงได้ข้อมูลทันทีโดยไม่ต้องรอ Google Sheet (หยุด Thread เมื่อล้างแคช)
+        """
+        storage = get_storage()
+
+        def fetch_page(offset, if_version=None):
+            params = {'offset': offset, 'limit': LOG_PAGE_SIZE}
+            if if_version:
+                params['ifVersion'] = if_version
+            return storage.read(LOG_SHEET_NAME, **params)
+
+        return LogSnapshot(
+            fetch_page,
+            LOG_KEYS,
+            'กลุ่มงาน',
+            prepare=get_metrics().timed('dataframe_build')(lambda df: compact_log_frame(df, LOG_CATEGORY_COLUMNS)),
+            interval=LOG_SNAPSHOT_REFRESH_SECONDS,
+            concurrency=LOG_PAGE_CONCURRENCY
+        ).start()
+
+    def hydrate_log_data():
+        """ตั้งค่าข้อมูลขั้นตอนการทำงานของ Session จาก snapshot ระดับ Process
+
+        ถ้า snapshot ยังโหลดไม่ครบ จะได้หน้าแรกพร้อม loader ของหน้าที่เหลือ (รวมด้วย merge_background_pages)
+        คืนค่า False เมื่อ snapshot ยังไม่มีข้อมูล
+        """
+        state = get_log_snapshot().current()
+        if state is None:
+            return False
+        frame, loader, version = state
+        set_log_data(frame.copy(deep=False))
+        # เก็บเฉพาะ hash ของแต่ละแถว (ตาม rowIndex) สำหรับการเปรียบเทียบ แทนสำเนาข้อมูลทั้งชุด
+        st.session_state.log_baseline = row_hashes(st.session_state.log_data, LOG_KEYS)
+        st.session_state.log_loader = loader
+        st.session_state.log_version = version
+        st.session_state.edited_log = False
+        st.session_state.log_complete = True
+        return True
+
+    def reload_log_data():
+        """ยกเลิกการแก้ไขที่ยังไม่ได้บันทึก และรับข้อมูลล่าสุด (เมื่อบันทึกไม่ได้เพราะ Sheet ถูกแก้ไขไปแล้ว)"""
+        snapshot = get_log_snapshot()
+        state = snapshot.current()
+        if state is not None and state[2] == st.session_state.get('log_version'):
+            # snapshot ยังเป็นข้อมูลชุดเดียวกับของ Session (Sheet ถูกแก้ไขจากที่อื่น): โหลดใหม่ทั้งชุด
+            snapshot.invalidate()
+        st.session_state.pop('log_data', None)
+        st.session_state.pop('log_conflict', None)
+        st.session_state.edited_log = False
+
+    def log_editor_pending():
+        """True เมื่อ st.data_editor ของแท็บ 2 มีแถวที่แก้ไข/เพิ่ม/ลบค้างอยู่"""
+        state = st.session_state.get('log_editor') or {}
+        return any(state.get(key) for key in ('edited_rows', 'added_rows', 'deleted_rows'))
+
+    def log_data_outdated(editor_merged=False):
+        """True เมื่อ Session ยังไม่มีข้อมูล หรือ snapshot มีข้อมูลครบชุดที่ใหม่กว่าและ Session ไม่มีการแก้ไขค้างอยู่
+
+        ก่อนขั้นตอน diff ของแท็บ 2 การแก้ไขที่ค้างใน Editor ยังไม่ถูกรวมเข้า log_data (edited_log ยังเป็น False)
+        ถ้าเปลี่ยน log_data ตอนนั้น Editor จะถูกรีเซ็ตและการแก้ไขนั้นหายไป จึงต้องระบุ `editor_merged=True` เมื่อเรียกหลัง diff
+        snapshot ชุดแรกหลังการบันทึกของ Session นี้เอง (log_saved) ถือว่าตรงกับข้อมูลของ Session อยู่แล้ว
+        """
+        if 'log_data' not in st.session_state:
+            return True
+        if st.session_state.edited_log or st.session_state.get('log_loader') is not None:
+            return False
+        if not editor_merged and log_editor_pending():
+            return False
+        snapshot = get_log_snapshot()
+        state = snapshot.current()
+        if state is None or state[1] is not None or snapshot.stale or state[2] == st.session_state.get('log_version'):
+            return False
+        if st.session_state.pop('log_saved', False):
+            st.session_state.log_version = state[2]
+            return False
+        return True
+
+
+    def merge_background_pages():
+        """รวมหน้าที่โหลดใน Background เข้ากับข้อมูลใน Session เมื่อโหลดเสร็จ"""
+        loader = st.session_state.get('log_loader')
+        if loader is None or not loader.done:
+            return
+        st.session_state.log_loader = None
+
+        with get_metrics().section('dataframe_build'):
+            rest = loader.remaining_frame()
+            set_log_data(compact_log_frame(
+                pd.concat([st.session_state.log_data, rest], ignore_index=True), LOG_CATEGORY_COLUMNS
+            ))
+            rest_hashes = row_hashes(rest, LOG_KEYS)
+        if st.session_state.log_baseline is None or rest_hashes is None:
+            st.session_state.log_baseline = None
+        else:
+            st.session_state.log_baseline = pd.concat([st.session_state.log_baseline, rest_hashes])
 
-st.title("โปรแกรมประเมินความเสี่ยงจากการทำงาน")
-st.subheader("Risk Assessment Program")
+        if loader.error is not None:
+            # ข้อมูลไม่ครบ: ห้ามเขียนทับทั้ง Sheet (บันทึกเฉพาะส่วนที่เปลี่ยนแปลงยังทำได้)
+            st.session_state.log_complete = False
+            st.warning(f"โหลดข้อมูลขั้นตอนการทำงานได้ไม่ครบ ({loader.rows_loaded:,} แถว): {loader.error}")
 
-# ตรวจสอบสถานะการแก้ไขเพื่อใช้ในการปิดการใช้งานแท็บอื่น
-is_edited = st.session_state.edited_log
-disabled_text = "คุณมีการเปลี่ยนแปลงที่ยังไม่ได้บันทึก กรุณากด 💾 บันทึก ก่อน"
-disabled_state = is_edited
 
-# สร้างแท็บ (ไม่สามารถปิดการใช้งานแท็บได้โดยตรง จึงต้องใช้การเตือนและปิดใช้งานเนื้อหาในแท็บ)
-tab1, tab2, tab3 = st.tabs([
-    "1. คู่มือการประเมินความเสี่ยง", 
-    "2. บันทึกขั้นตอนการทำงาน", 
-    "3. ประเมินความเสี่ยงจากการทำงาน"
-])
+    # --- 3. การจัดการ Session State และข้อมูลเริ่มต้น ---
+    # rerun แรกของ Process เริ่มโหลด snapshot ใน Background (ไม่รอผล)
+    # Session ใหม่ใช้ข้อมูลจาก snapshot ทันทีที่มี และรับข้อมูลชุดใหม่เมื่อรีเฟรชเสร็จ (ถ้าไม่มีการแก้ไขค้างอยู่)
+    if log_data_outdated():
+        hydrate_log_data()
 
-# --- แท็บ 2: บันทึกขั้นตอนการทำงาน-ลักษณะงาน (Editable Table) ---
-with tab2:
-    st.header("2. บันทึกขั้นตอนการทำงาน-ลักษณะงาน")
-    st.info("แก้ไขข้อมูลในตารางโดยตรง เพิ่ม/ลบรายการใหม่ และกด **💾 บันทึกข้อมูล** เพื่ออัปเดต Google Sheet ทันที")
+    merge_background_pages()
+
+    # --- ฟังก์ชันสำหรับเพิ่มแถวใหม่ ---
+    def add_new_row():
+        """เพิ่มแถวว่างใหม่ใน Session State และตั้งค่าว่ามีการแก้ไข"""
+        new_row = pd.DataFrame({col: [''] for col in REQUIRED_COLUMNS})
+        st.session_state.log_data = append_rows(
+            st.session_state.log_data, new_row, st.session_state.log_group_index, 'กลุ่มงาน', LOG_CATEGORY_COLUMNS
+        )
+        st.session_state.edited_log = True # ตั้งค่าทันทีเมื่อกดเพิ่ม
+   
+    # --- ฟังก์ชันการคำนวณและการแสดงผล ---
+    def calculate_risk_level(df, matrix=DEFAULT_MATRIX):
+        """คำนวณระดับความเสี่ยง (L x C) และระดับสี (คืน DataFrame ใหม่ ไม่แก้ไข df เดิม)"""
+        return score_risks(df, matrix)
+
+    def risk_column_config(matrix=DEFAULT_MATRIX):
+        """รูปแบบการแสดงผลคอลัมน์ความเสี่ยง (แทนการลงสีทีละเซลล์ด้วย Styler)"""
+        max_l, max_c = matrix.shape
+        return {
+            SCORE_COLUMN: st.column_config.ProgressColumn(
+                SCORE_COLUMN, min_value=0, max_value=max_l * max_c, format="%d"
+            ),
+            BAND_COLUMN: st.column_config.TextColumn("ระดับความเสี่ยง", width="small")
+        }
+
+    # --- 4. โครงสร้าง UI หลัก ---
+
+    # --- แท็บ 2: บันทึกขั้นตอนการทำงาน-ลักษณะงาน (Editable Table) ---
+    with tab2:
+        st.header("2. บันทึกขั้นตอนการทำงาน-ลักษณะงาน")
+        st.info("แก้ไขข้อมูลในตารางโดยตรง เพิ่ม/ลบรายการใหม่ และกด **💾 บันทึกข้อมูล** เพื่ออัปเดต Google Sheet ทันที")
    
-    # 4.1 Dropdown กรองข้อมูล
-    current_data_for_display = st.session_state.log_data.copy()
-
-    if 'กลุ่มงาน' in current_data_for_display.columns:
-        non_empty_groups = current_data_for_display['กลุ่มงาน'].astype(str).str.strip().unique()
-        filter_options = ['--- แสดงทั้งหมด ---'] + sorted(non_empty_groups[non_empty_groups != ''].tolist())
-    else:
-        filter_options = ['--- แสดงทั้งหมด ---']
+        # รอ snapshot ระดับ Process (Session แรกหลังเริ่ม Process หรือหลังเขียนทับทั้ง Sheet) แล้ว rerun เมื่อมีข้อมูล
+        @st.fragment(run_every=1.0)
+        def wait_for_log_snapshot():
+            snapshot = get_log_snapshot()
+            if snapshot.current() is not None:
+                st.rerun()
+            if snapshot.error is not None:
+                st.warning(f"ไม่สามารถโหลดข้อมูลขั้นตอนการทำงานได้ (จะลองใหม่อัตโนมัติ): {snapshot.error}")
+            else:
+                st.caption("⏳ กำลังโหลดข้อมูลขั้นตอนการทำงานจาก Google Sheet...")
+
+        if tab2.open and 'log_data' not in st.session_state:
+            wait_for_log_snapshot()
+        elif tab2.open:
+            # แสดงความคืบหน้าการโหลดหน้าที่เหลือ และรีรันเมื่อโหลดเสร็จเพื่อรวมข้อมูล
+            @st.fragment(run_every=1.0)
+            def poll_background_pages():
+                loader = st.session_state.get('log_loader')
+                if loader is None:
+                    return
+                if loader.done:
+                    st.rerun()
+                total = f"{loader.total:,}" if loader.total else "?"
+                st.caption(f"⏳ กำลังโหลดข้อมูลเพิ่มเติม... {loader.rows_loaded:,}/{total} แถว")
+
+            poll_background_pages()
+
+            # 4.1 Dropdown กรองข้อมูล (ตัวเลือกมาจากดัชนีกลุ่มงาน ไม่ต้องสแกนทั้งตาราง)
+            group_index = st.session_state.log_group_index
+            filter_options = ['--- แสดงทั้งหมด ---'] + group_index.options()
          
-    selected_id = st.selectbox(
-        "กรองข้อมูลตามกลุ่มงาน:",
-        options=filter_options,
-        index=0,
-        key="log_filter_select"
-    )
-
-    st.markdown("### ตารางขั้นตอนการทำงาน (แก้ไข/เพิ่ม/ลบได้)")
+            selected_id = st.selectbox(
+                "กรองข้อมูลตามกลุ่มงาน:",
+                options=filter_options,
+                index=0,
+                key="log_filter_select"
+            )
+
+            st.markdown("### ตารางขั้นตอนการทำงาน (แก้ไข/เพิ่ม/ลบได้)")
    
-    # 4.2 Column Config (Req 1: Fixed width/Text wrapping)
-    column_config = {
-        "กลุ่มงาน": st.column_config.TextColumn("กลุ่มงาน", width="small"), 
-        "ขั้นตอนการทำงาน-ลักษณะงาน": st.column_config.TextColumn(
-            "ขั้นตอนการทำงาน-ลักษณะงาน", 
-            width="large", # กำหนดให้ใหญ่เพื่อรองรับการตัดคำและเพิ่มบรรทัด
-        ),
-        "ตำแหน่งงาน": st.column_config.TextColumn("ตำแหน่งงาน", width="medium")
-    }
-
-    # 4.3 กรองข้อมูลที่จะแสดงผลใน Editor
-    display_df = st.session_state.log_data.copy()
-    if selected_id != '--- แสดงทั้งหมด ---':
-        # เก็บ Index ของแถวที่ถูกกรอง เพื่อให้ง่ายต่อการ Merge กลับ
-        original_indices_filtered = display_df[display_df['กลุ่มงาน'] == selected_id].index
-        display_df = display_df[display_df['กลุ่มงาน'] == selected_id]
+            # 4.2 Column Config (Req 1: Fixed width/Text wrapping)
+            column_config = {
+                "กลุ่มงาน": st.column_config.TextColumn("กลุ่มงาน", width="small"), 
+                "ขั้นตอนการทำงาน-ลักษณะงาน": st.column_config.TextColumn(
+                    "ขั้นตอนการทำงาน-ลักษณะงาน", 
+                    width="large", # กำหนดให้ใหญ่เพื่อรองรับการตัดคำและเพิ่มบรรทัด
+                ),
+                "ตำแหน่งงาน": st.column_config.TextColumn("ตำแหน่งงาน", width="medium")
+            }
+
+            # 4.3 กรองข้อมูลที่จะแสดงผลใน Editor
+            with get_metrics().section('filter'):
+                display_df = st.session_state.log_data
+                if selected_id != '--- แสดงทั้งหมด ---':
+                    # ดึงเฉพาะแถวของกลุ่มงานจากดัชนี (Index ของแถวใช้ Merge กลับในตำแหน่งเดิม)
+                    display_df = display_df.loc[group_index.labels(selected_id)]
+                # คอลัมน์ categorical ต้องแปลงเป็นข้อความ เพื่อให้ Editor ยังพิมพ์ค่าใหม่ได้
+                display_df = editor_frame(display_df, LOG_CATEGORY_COLUMNS)
          
-    edited_df = st.data_editor(
-        display_df,
-        key="log_editor",
-        column_config=column_config,
-        column_order=REQUIRED_COLUMNS, 
-        hide_index=True,
-        use_container_width=True,
-        num_rows="dynamic" # เปิดใช้งานปุ่มลบ (Req 3) และปุ่มเพิ่มแถวในตาราง
-    )
+            with get_metrics().section('render'):
+                edited_df = st.data_editor(
+                    display_df,
+                    key="log_editor",
+                    column_config=column_config,
+                    column_order=REQUIRED_COLUMNS, 
+                    hide_index=True,
+                    width='stretch',
+                    num_rows="dynamic" # เปิดใช้งานปุ่มลบ (Req 3) และปุ่มเพิ่มแถวในตาราง
+                )
    
-    # 4.4 จัดการการเปลี่ยนแปลง (ตรวจจับการแก้ไข/การเพิ่ม/การลบ)
+            # 4.4 จัดการการเปลี่ยนแปลง (ตรวจจับการแก้ไข/การเพิ่ม/การลบ)
    
-    # ตรวจสอบว่า edited_df แตกต่างจาก display_df หรือไม่
-    if not edited_df.equals(display_df):
-        st.session_state.edited_log = True
-         
-        if selected_id == '--- แสดงทั้งหมด ---':
-            # ไม่มี Filter: อัปเดตข้อมูลหลักทั้งหมดด้วย edited_df
-            st.session_state.log_data = edited_df.copy()
-        else:
-            # มี Filter: ต้องทำการ Merge ข้อมูลที่แก้ไข/เพิ่ม/ลบ กลับเข้าสู่ข้อมูลหลัก
-            # 1. ข้อมูลหลักที่ไม่มีแถวของกลุ่มงานที่กำลังถูกแก้ไข
-            data_without_current_group = st.session_state.log_data[st.session_state.log_data['กลุ่มงาน'] != selected_id]
-           
-            # 2. นำข้อมูลที่แก้ไข/ลบ/เพิ่มใหม่มาเชื่อมต่อ
-            st.session_state.log_data = pd.concat([data_without_current_group, edited_df], ignore_index=True)
-
-    # 4.5 ปุ่มเพิ่มข้อมูลด้านล่าง (Req 2)
-    st.button(
-        "➕ เพิ่มข้อมูลด้านล่างตาราง", 
-        on_click=add_new_row, 
-        key="add_row_btn_bottom", 
-        type="secondary"
-    )
+            # ตรวจสอบว่า edited_df แตกต่างจาก display_df หรือไม่
+            with get_metrics().section('diff'):
+                if not edited_df.equals(display_df):
+                    st.session_state.edited_log = True
+
+                    # Merge ข้อมูลที่แก้ไข/เพิ่ม/ลบ กลับเข้าสู่ข้อมูลหลักในตำแหน่งเดิม (ใช้ได้ทั้งแบบมีและไม่มี Filter)
+                    st.session_state.log_data = merge_group_edits(
+                        st.session_state.log_data, display_df, edited_df, group_index, 'กลุ่มงาน', LOG_CATEGORY_COLUMNS
+                    )
+
+            # snapshot ชุดใหม่ที่ยังไม่ได้รับตอนต้นสคริปต์ (Editor มีการแก้ไขค้างอยู่) รับได้เมื่อการแก้ไขนั้นไม่ได้เปลี่ยนข้อมูล
+            if log_data_outdated(editor_merged=True):
+                hydrate_log_data()
+                st.rerun()
+
+            # 4.5 ปุ่มเพิ่มข้อมูลด้านล่าง (Req 2)
+            st.button(
+                "➕ เพิ่มข้อมูลด้านล่างตาราง", 
+                on_click=add_new_row, 
+                key="add_row_btn_bottom", 
+                type="secondary"
+            )
    
-    def save_log_data_callback():
+            def save_log_data_callback():
+
+                # 1. คำนวณเฉพาะแถวที่ถูกเพิ่ม/แก้ไข/ลบ เทียบกับข้อมูลตั้งต้น (อ้างอิงด้วย rowIndex)
+                with get_metrics().section('diff'):
+                    changeset = build_changeset(
+                        st.session_state.log_data,
+                        st.session_state.log_baseline,
+                        LOG_KEYS,
+                        'กลุ่มงาน'
+                    )
+                if changeset is None:
+                    # ข้อมูลตั้งต้นไม่มี rowIndex (Apps Script รุ่นเก่า): ใช้การเขียนทับทั้ง Sheet
+                    save_full_log_data()
+                    return
+
+                if changeset_is_empty(changeset):
+                    st.toast("ไม่มีข้อมูลที่เปลี่ยนแปลง", icon='ℹ️')
+                    st.session_state.edited_log = False
+                    return
+
+                if STORAGE_BACKEND == 'apps_script' and not API_PATCH_WRITES:
+                    # Apps Script ที่ Deploy แล้วยังไม่รองรับ patch: ใช้การเขียนทับทั้ง Sheet
+                    save_full_log_data()
+                    return
+
+                # 2. เรียก API เพื่อบันทึกเฉพาะส่วนที่เปลี่ยนแปลง
+                # ส่ง version ของข้อมูลตั้งต้นไปด้วย: ถ้า Sheet ถูกแก้ไขไปแล้ว rowIndex อาจชี้ไปผิดแถว จึงต้องปฏิเสธ
+                with st.spinner("กำลังบันทึกข้อมูลขั้นตอนการทำงานไปยัง Google Sheet..."):
+                    response = fetch_sheet_data(
+                        'patch', LOG_SHEET_NAME, changeset, base_version=st.session_state.get('log_version')
+                    )
+
+                if response and response.get('status') == 'success':
+                    st.toast("บันทึกข้อมูลขั้นตอนการทำงานเรียบร้อยแล้ว!", icon='✅')
+                    # 3. ปรับข้อมูลในเครื่องตามผลตอบรับ แทนการโหลดข้อมูลใหม่ทั้งหมด
+                    set_log_data(compact_log_frame(
+                        apply_ack(st.session_state.log_data, changeset, response, 'กลุ่มงาน'), LOG_CATEGORY_COLUMNS
+                    ))
+                    st.session_state.log_baseline = row_hashes(st.session_state.log_data, LOG_KEYS)
+                    st.session_state.edited_log = False
+                    if response.get('version') is not None:
+                        st.session_state.log_version = response['version']
+                    else:
+                        # Apps Script รุ่นเก่าไม่ตอบ version: ถือว่า snapshot ชุดแรกหลังการบันทึกนี้ตรงกับข้อมูลของ Session
+                        st.session_state.log_saved = True
+                elif response and response.get('status') == 'conflict':
+                    # ไม่บันทึกเลยแม้แต่แถวเดียว: เก็บการแก้ไขไว้ให้ผู้ใช้ตัดสินใจโหลดข้อมูลล่าสุด
+                    st.session_state.log_conflict = True
+                    st.session_state.edited_log = True
+                else:
+                    st.error(f"บันทึกข้อมูลล้มเหลว: {response.get('message') if response else 'API Error'}")
+                    st.session_state.edited_log = True
+
+            def save_full_log_data():
+
+                if not st.session_state.log_complete:
+                    st.error("ข้อมูลที่โหลดไม่ครบ จึงไม่สามารถเขียนทับทั้ง Sheet ได้ กรุณาโหลดหน้าใหม่")
+                    return
        
-        df_to_save = st.session_state.log_data.copy()
+                df_to_save = st.session_state.log_data
 
-        # 1. ทำความสะอาดข้อมูล: ลบแถวที่เป็นค่าว่างทั้งหมด (ยึดตาม 'กลุ่มงาน')
-        # แถวว่างที่ผู้ใช้เพิ่มเข้ามาแต่ไม่ได้กรอก 'กลุ่มงาน' จะถูกลบทิ้งก่อนบันทึก
-        df_to_save = df_to_save[df_to_save['กลุ่มงาน'].astype(str).str.strip() != '']
+                # 1. ทำความสะอาดข้อมูล: ลบแถวที่เป็นค่าว่างทั้งหมด (ยึดตาม 'กลุ่มงาน')
+                # แถวว่างที่ผู้ใช้เพิ่มเข้ามาแต่ไม่ได้กรอก 'กลุ่มงาน' จะถูกลบทิ้งก่อนบันทึก
+                df_to_save = df_to_save[df_to_save['กลุ่มงาน'].astype(str).str.strip() != '']
        
-        # 2. แปลงชื่อคอลัมน์จากภาษาไทยกลับเป็นคีย์ API
-        reverse_rename_map = {k: v for k, v in LOG_KEYS.items()} 
-        df_to_save = df_to_save.rename(columns=reverse_rename_map)
+                # 2. แปลงชื่อคอลัมน์จากภาษาไทยกลับเป็นคีย์ API
+                reverse_rename_map = {k: v for k, v in LOG_KEYS.items()} 
+                df_to_save = df_to_save.rename(columns=reverse_rename_map)
        
-        # 3. เลือกเฉพาะคอลัมน์ที่ต้องการตามลำดับที่ Apps Script คาดหวัง
-        columns_to_keep = list(LOG_KEYS.values())
-        if not df_to_save.empty:
-            df_to_save = df_to_save[columns_to_keep]
-
-        # 4. เรียก API เพื่อเขียนข้อมูล (Overwrite: ข้อมูลที่ถูกลบไปแล้วจะไม่ถูกส่งไป)
-        with st.spinner("กำลังบันทึกข้อมูลขั้นตอนการทำงานไปยัง Google Sheet..."):
-            response = fetch_sheet_data('write', LOG_SHEET_NAME, df_to_save)
-
-        if response and response.get('status') == 'success':
-            st.toast("บันทึกข้อมูลขั้นตอนการทำงานเรียบร้อยแล้ว!", icon='✅')
-            # โหลดข้อมูลใหม่ทั้งหมดเพื่อรีเซ็ตสถานะการแก้ไข
-            st.session_state.log_data = load_log_data()
-            st.session_state.initial_log_data = st.session_state.log_data.copy()
-            st.session_state.edited_log = False
-            st.rerun() 
-        else:
-            st.error(f"บันทึกข้อมูลล้มเหลว: {response.get('message') if response else 'API Error'}")
-            st.session_state.edited_log = True
+                # 3. เลือกเฉพาะคอลัมน์ที่ต้องการตามลำดับที่ Apps Script คาดหวัง
+                columns_to_keep = list(LOG_KEYS.values())
+                if not df_to_save.empty:
+                    df_to_save = df_to_save[columns_to_keep]
+
+                # 4. เรียก API เพื่อเขียนข้อมูล (Overwrite: ข้อมูลที่ถูกลบไปแล้วจะไม่ถูกส่งไป)
+                with st.spinner("กำลังบันทึกข้อมูลขั้นตอนการทำงานไปยัง Google Sheet..."):
+                    response = fetch_sheet_data('write', LOG_SHEET_NAME, df_to_save)
+
+                if response and response.get('status') == 'success':
+                    st.toast("บันทึกข้อมูลขั้นตอนการทำงานเรียบร้อยแล้ว!", icon='✅')
+                    # โหลดข้อมูลใหม่ทั้งหมดจาก snapshot (ถูก invalidate แล้ว) เพื่อรีเซ็ตสถานะการแก้ไข
+                    del st.session_state['log_data']
+                    st.session_state.edited_log = False
+                    st.rerun() 
+                else:
+                    st.error(f"บันทึกข้อมูลล้มเหลว: {response.get('message') if response else 'API Error'}")
+                    st.session_state.edited_log = True
          
-    st.button(
-        "💾 บันทึกข้อมูล (Update Google Sheet)", 
-        on_click=save_log_data_callback,
-        disabled=not is_edited,
-        type="primary"
-    )
-    st.caption("ข้อมูลนี้จะถูกบันทึกถาวรใน Google Sheet ของคุณ")
-
-# --- แท็บ 1: คู่มือการประเมินความเสี่ยง ---
-with tab1:
-    st.header("1. คู่มือการประเมินความเสี่ยงจากการทำงาน")
-   
-    # Req 4: เตือนเมื่อมีข้อมูลที่ยังไม่ได้บันทึก
-    if disabled_state:
-        st.warning(f"**{disabled_text}** ก่อนเข้าถึงแท็บนี้")
-   
-    st.link_button(
-        "คลิก เพื่อดาวน์โหลด", 
-        url="https://drive.google.com/file/d/1VQb2pw5La9NPKjLDzKr_KnucMsRy_Wjl/view?usp=sharing",
-        type="primary",
-        disabled=disabled_state
-    )
-
-# --- แท็บ 3: ประเมินความเสี่ยงจากการทำงาน ---
-with tab3:
-    st.header("3. ประเมินความเสี่ยงจากการทำงาน")
-
-    # Req 4: เตือนเมื่อมีข้อมูลที่ยังไม่ได้บันทึก
-    if disabled_state:
-        st.warning(f"**{disabled_text}** ก่อนเข้าถึงแท็บนี้")
+            if st.session_state.get('log_conflict'):
+                st.warning(
+                    "ข้อมูลใน Google Sheet ถูกแก้ไขโดยผู้ใช้อื่นหลังจากที่คุณโหลดข้อมูล จึงยังไม่ได้บันทึกการแก้ไขของคุณ "
+                    "กรุณาจดการแก้ไขไว้ แล้วโหลดข้อมูลล่าสุดเพื่อแก้ไขใหม่อีกครั้ง"
+                )
+                st.button("🔄 โหลดข้อมูลล่าสุด (ยกเลิกการแก้ไขที่ยังไม่ได้บันทึก)", on_click=reload_log_data)
+
+            st.button(
+                "💾 บันทึกข้อมูล (Update Google Sheet)", 
+                on_click=save_log_data_callback,
+                disabled=not is_edited or st.session_state.get('log_loader') is not None,
+                type="primary"
+            )
+            st.caption("ข้อมูลนี้จะถูกบันทึกถาวรใน Google Sheet ของคุณ")
+
+            # สถานะการซิงก์ไป Google Sheet (เฉพาะเมื่อบันทึกแบบ write-behind)
+            if hasattr(get_storage(), 'sync_status'):
+                @st.fragment(run_every=2.0)
+                def show_sync_status():
+                    status = get_storage().sync_status()
+                    if status['pending']:
+                        message = f"🔄 รอซิงก์ไป Google Sheet {status['pending']:,} รายการ"
+                        if status['last_error']:
+                            message += f" (จะลองใหม่อัตโนมัติ: {status['last_error']})"
+                        st.caption(message)
+                    else:
+                        st.caption("✅ ซิงก์กับ Google Sheet แล้ว")
+
+                show_sync_status()
+
+    # --- แท็บ 3: ประเมินความเสี่ยงจากการทำงาน ---
+    with tab3:
+        st.header("3. ประเมินความเสี่ยงจากการทำงาน")
+
+        # Req 4: เตือนเมื่อมีข้อมูลที่ยังไม่ได้บันทึก
+        if disabled_state:
+            st.warning(f"**{disabled_text}** ก่อนเข้าถึงแท็บนี้")
          
-    department_options = ["--- กรุณาเลือกหน่วยงาน ---"] + list(st.session_state.risk_mock_data.keys())
+        department_options = ["--- กรุณาเลือกหน่วยงาน ---"] + get_storage().risk_departments()
    
-    # ปิดการใช้งาน Selectbox หากมีข้อมูลที่ยังไม่ได้บันทึก
-    selected_department = st.selectbox(
-        "เลือกหน่วยงานที่ต้องการประเมิน:",
-        options=department_options,
-        index=0,
-        key="department_select",
-        disabled=disabled_state
-    )
-
-    if selected_department != "--- กรุณาเลือกหน่วยงาน ---" and not disabled_state:
-        st.markdown(f"## ตารางประเมินความเสี่ยง: {selected_department}")
-       
-        risk_df = st.session_state.risk_mock_data[selected_department].copy()
-       
-        st.dataframe(
-            calculate_risk_level(risk_df),
-            hide_index=True,
-            use_container_width=True
-        )
-
-        def save_risk_callback():
-            st.toast(f"บันทึกข้อมูลความเสี่ยงของ {selected_department} (Mock Save) เรียบร้อยแล้ว!", icon='💾')
-
-        st.button(
-            "บันทึกข้อมูล (Mock Save)", 
-            on_click=save_risk_callback,
-            type="secondary",
+        # ปิดการใช้งาน Selectbox หากมีข้อมูลที่ยังไม่ได้บันทึก
+        selected_department = st.selectbox(
+            "เลือกหน่วยงานที่ต้องการประเมิน:",
+            options=department_options,
+            index=0,
+            key="department_select",
             disabled=disabled_state
         )
 
-    elif selected_department == "--- กรุณาเลือกหน่วยงาน ---" and not disabled_state:
-        st.warning("กรุณาเลือกหน่วยงานเพื่อเริ่มต้นการประเมินความเสี่ยง")
+        if selected_department != "--- กรุณาเลือกหน่วยงาน ---" and not disabled_state:
+            st.markdown(f"## ตารางประเมินความเสี่ยง: {selected_department}")
+       
+            with get_metrics().section('risk_score'):
+                risk_df = calculate_risk_level(get_storage().read_risk(selected_department))
+                summary = summarize_risks(risk_df)
+            risk_editor_key = f"risk_editor_{selected_department}"
+
+            # แก้ไข/เพิ่ม/ลบรายการได้ คะแนนและระดับความเสี่ยงคำนวณใหม่หลังบันทึก
+            with get_metrics().section('render'):
+                edited_risk = st.data_editor(
+                    risk_df,
+                    key=risk_editor_key,
+                    column_config=risk_column_config(),
+                    disabled=[SCORE_COLUMN, BAND_COLUMN],
+                    hide_index=True,
+                    width='stretch',
+                    num_rows="dynamic"
+                )
+
+            st.caption(" · ".join(f"{band}: {count}" for band, count in summary['bands'].items()))
+            persists_risk = get_storage().persists_risk
+            if not persists_risk:
+                st.info("ที่เก็บข้อมูลนี้ยังไม่มีที่บันทึกตารางความเสี่ยง ข้อมูลที่บันทึกจะหายเมื่อโปรแกรมเริ่มใหม่ "
+                        "(ตั้งค่า STORAGE_BACKEND เป็น 'sqlite' หรือ 'write_behind' เพื่อบันทึกถาวร)")
+
+            def save_risk_callback(department, edited):
+                try:
+                    response = get_storage().write_risk(department, edited)
+                except Exception as e:
+                    st.error(f"บันทึกข้อมูลความเสี่ยงล้มเหลว: {e}")
+                    return
+                if response.get('status') == 'success':
+                    mock = "" if persists_risk else " (Mock Save)"
+                    st.toast(f"บันทึกข้อมูลความเสี่ยงของ {department}{mock} เรียบร้อยแล้ว!", icon='💾')
+                    # ล้างสถานะของ Editor เพื่อแสดงข้อมูลที่บันทึกแล้วพร้อมคะแนนใหม่
+                    st.session_state.pop(risk_editor_key, None)
+                else:
+                    st.error(f"บันทึกข้อมูลความเสี่ยงล้มเหลว: {response.get('message')}")
+
+            st.button(
+                "บันทึกข้อมูลความเสี่ยง" if persists_risk else "บันทึกข้อมูล (Mock Save)",
+                on_click=save_risk_callback,
+                args=(selected_department, edited_risk),
+                type="secondary",
+                disabled=disabled_state
+            )
+
+        elif selected_department == "--- กรุณาเลือกหน่วยงาน ---" and not disabled_state:
+            st.warning("กรุณาเลือกหน่วยงานเพื่อเริ่มต้นการประเมินความเสี่ยง")
+
+    # --- 5. แผงวัดประสิทธิภาพ (เฉพาะผู้ดูแลระบบ) ---
+    if ADMIN_TOKEN and st.query_params.get('admin') == ADMIN_TOKEN:
+        metrics = get_metrics()
+        with st.sidebar.expander("🛠️ ประสิทธิภาพการรันสคริปต์ (ผู้ดูแลระบบ)"):
+            # ตัวเลือกมีผลตั้งแต่ rerun ถัดไป
+            st.toggle("cProfile ทุก rerun", key='admin_cprofile')
+            set_memory_tracing(st.toggle("tracemalloc (ทั้ง Process)", key='admin_tracemalloc'))
+
+            snapshot = metrics.snapshot()
+            st.caption(
+                f"rerun {snapshot['reruns']['count']:,} ครั้ง · เฉลี่ย {snapshot['reruns']['mean_ms']:.1f} ms"
+                f" · สูงสุด {snapshot['reruns']['max_ms']:.1f} ms"
+            )
+            st.markdown("**เวลาแต่ละส่วน**")
+            st.dataframe(pd.DataFrame.from_dict(snapshot['sections'], orient='index'), width='stretch')
+            if snapshot['http']:
+                st.markdown("**การเรียก Apps Script (HTTP)**")
+                st.dataframe(pd.DataFrame.from_dict(snapshot['http'], orient='index'), width='stretch')
+            st.markdown("**ข้อมูลขั้นตอนการทำงานระดับ Process (snapshot)**")
+            st.json(get_log_snapshot().stats())
+            if snapshot['history']:
+                st.markdown("**rerun ล่าสุด**")
+                st.dataframe(pd.DataFrame(snapshot['history'][-1]['sections']), width='stretch')
+
+            if st.session_state.get('admin_profile_text'):
+                st.markdown("**cProfile (rerun ก่อนหน้า)**")
+                st.code(st.session_state.admin_profile_text)
+            if st.session_state.get('admin_tracemalloc'):
+                st.markdown("**หน่วยความจำที่จองมากที่สุด (tracemalloc)**")
+                st.dataframe(pd.DataFrame(top_allocations()), width='stretch')
+
+            st.download_button(
+                "ดาวน์โหลด JSON", metrics.to_json(log_snapshot=get_log_snapshot().stats()),
+                file_name="rerun_metrics.json", mime="application/json"
+            )
+            st.download_button(
+                "ดาวน์โหลด Prometheus", metrics.to_prometheus(),
+                file_name="rerun_metrics.prom", mime="text/plain"
+            )
+
+finally:
+    get_metrics().end_rerun(rerun_record)
+    if rerun_record.profiler is not None:
+        st.session_state.admin_profile_text = rerun_record.profile_text()
+    if METRICS_TEXTFILE_PATH:
+        get_metrics().write_textfile(METRICS_TEXTFILE_PATH)
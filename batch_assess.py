@@ -0,0 +1,198 @@
+"""ประเมินความเสี่ยงของทุกหน่วยงานแบบ batch (ใช้ได้โดยไม่ต้องเปิด Streamlit)
+
+ให้คะแนนตารางความเสี่ยงของแต่ละหน่วยงานแบบขนานด้วย process/thread pool แล้วเขียนผลต่อท้ายไฟล์ทีละหน่วยงาน
+(ไม่ต้องเก็บทุกหน่วยงานไว้ในหน่วยความจำ) พร้อมไฟล์สรุป:
+- <output>                    : ทะเบียนความเสี่ยงทุกรายการ (เรียงตามคะแนนภายในหน่วยงาน)
+- <output>_top<N>.<ext>       : N รายการที่ความเสี่ยงสูงสุดของทั้งองค์กร
+- <output>_departments.<ext>  : จำนวนรายการในแต่ละระดับ และความเสี่ยงที่ลดลงของแต่ละหน่วยงาน
+
+    python batch_assess.py --output register.csv --top 20
+    python batch_assess.py --source risk_tables/ --output register.parquet --workers 8
+"""
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from risk_data import RESIDUAL_C, RESIDUAL_L, RISK_COLUMNS, read_risk_table, risk_table_sources
+from risk_engine import BAND_COLUMN, DEFAULT_MATRIX, SCORE_COLUMN, score_risks, summarize_risks
+
+DEPARTMENT_COLUMN = 'หน่วยงาน'
+RESIDUAL_SCORE_COLUMN = 'ความเสี่ยงคงเหลือ'
+DELTA_COLUMN = 'ความเสี่ยงที่ลดลง'
+REGISTER_COLUMNS = (
+    [DEPARTMENT_COLUMN] + RISK_COLUMNS + [SCORE_COLUMN, BAND_COLUMN, RESIDUAL_SCORE_COLUMN, DELTA_COLUMN]
+)
+TEXT_COLUMNS = [DEPARTMENT_COLUMN, 'กิจกรรม', 'อันตรายที่อาจเกิดขึ้น', 'มาตรการควบคุมปัจจุบัน', BAND_COLUMN]
+
+
+def assess_department(name, table, matrix=DEFAULT_MATRIX):
+    """ให้คะแนนตารางของหน่วยงานเดียว คืน (ทะเบียนความเสี่ยง, สรุปของหน่วยงาน)
+
+    `table` เป็น DataFrame หรือ path ของไฟล์ CSV/Parquet
+    """
+    df = read_risk_table(table) if isinstance(table, (str, Path)) else table
+    scored = score_risks(df, matrix)
+
+    if RESIDUAL_L in df.columns and RESIDUAL_C in df.columns:
+        residual = score_risks(df, matrix, RESIDUAL_L, RESIDUAL_C)[SCORE_COLUMN]
+    else:
+        residual = pd.array([pd.NA] * len(df), dtype='Int64')
+    scored[RESIDUAL_SCORE_COLUMN] = residual
+    scored[DELTA_COLUMN] = scored[SCORE_COLUMN] - scored[RESIDUAL_SCORE_COLUMN]
+    scored[DEPARTMENT_COLUMN] = name
+
+    summary = summarize_risks(scored, matrix)
+    register = (
+        scored.reindex(columns=REGISTER_COLUMNS)
+        .astype({c: 'string' for c in TEXT_COLUMNS})
+        .astype({c: 'Int64' for c in ['L', 'C', SCORE_COLUMN, RESIDUAL_SCORE_COLUMN, DELTA_COLUMN]})
+        .sort_values(SCORE_COLUMN, ascending=False, na_position='last', kind='stable')
+        .reset_index(drop=True)
+    )
+    deltas = register[DELTA_COLUMN].to_numpy(dtype=np.float64, na_value=np.nan)
+    department = {
+        DEPARTMENT_COLUMN: name,
+        'จำนวนรายการ': summary['count'],
+        **summary['bands'],
+        'คะแนนเฉลี่ย': summary['mean_score'],
+        'คะแนนสูงสุด': summary['max_score'],
+        'ความเสี่ยงที่ลดลงเฉลี่ย': float(np.nanmean(deltas)) if np.isfinite(deltas).any() else None,
+    }
+    return register, department
+
+
+class RegisterWriter:
+    """เขียนทะเบียนความเสี่ยงต่อท้ายไฟล์ CSV หรือ Parquet ทีละชุด"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.format = 'parquet' if self.path.suffix == '.parquet' else 'csv'
+        self.rows = 0
+        self._parquet = None
+        self._started = False
+
+    def write(self, frame):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        else:
+            # ใส่ BOM เฉพาะตอนสร้างไฟล์ เพื่อให้ Excel อ่านภาษาไทยได้
+            frame.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started,
+                         index=False, encoding='utf-8' if self._started else 'utf-8-sig')
+        self._started = True
+        self.rows += len(frame)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        elif not self._started:
+            # ไม่มีหน่วยงานใดเลย: สร้างไฟล์ที่มีเฉพาะหัวตาราง
+            self.write(pd.DataFrame(columns=REGISTER_COLUMNS))
+
+
+def _output_path(output, suffix):
+    output = Path(output)
+    return output.with_name(f"{output.stem}_{suffix}{output.suffix}")
+
+
+def _write_frame(frame, path):
+    if path.suffix == '.parquet':
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def _top_rows(current, register, top_n):
+    if not top_n:
+        return current
+    candidates = register.head(top_n)
+    if current is None:
+        return candidates
+    merged = pd.concat([current, candidates], ignore_index=True)
+    return merged.sort_values(SCORE_COLUMN, ascending=False, na_position='last', kind='stable').head(top_n)
+
+
+def run_batch(sources, output, top_n=20, workers=None, executor='process', matrix=DEFAULT_MATRIX):
+    """ประเมินทุกหน่วยงานใน `sources` (รายการ (ชื่อ, ตาราง/ไฟล์)) แบบขนาน และเขียนผลลงไฟล์
+
+    ส่งงานเข้า pool ทีละไม่เกิน 2 เท่าของจำนวน worker เพื่อจำกัดผลลัพธ์ที่ค้างในหน่วยความจำ
+    คืน dict ของ path ไฟล์ผลลัพธ์ ตารางสรุปรายหน่วยงาน และ N รายการสูงสุด
+    """
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    window = 2 * workers
+    writer = RegisterWriter(output)
+    departments = []
+    top = None
+    pending = set()
+    queue = iter(sources)
+
+    with pool_class(max_workers=workers) as pool:
+
+        def submit_next():
+            for name, table in queue:
+                pending.add(pool.submit(assess_department, name, table, matrix))
+                if len(pending) >= window:
+                    return
+
+        try:
+            submit_next()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    register, department = future.result()
+                    writer.write(register)
+                    top = _top_rows(top, register, top_n)
+                    departments.append(department)
+                submit_next()
+        finally:
+            writer.close()
+
+    departments = pd.DataFrame(departments, columns=[
+        DEPARTMENT_COLUMN, 'จำนวนรายการ', *matrix.bands,
+        'คะแนนเฉลี่ย', 'คะแนนสูงสุด', 'ความเสี่ยงที่ลดลงเฉลี่ย'
+    ])
+    departments = departments.sort_values(
+        ['คะแนนสูงสุด', 'คะแนนเฉลี่ย'], ascending=False, na_position='last'
+    ).reset_index(drop=True)
+    top = (top if top is not None else pd.DataFrame(columns=REGISTER_COLUMNS)).reset_index(drop=True)
+    top.insert(0, 'อันดับ', range(1, len(top) + 1))
+
+    result = {'register': writer.path, 'rows': writer.rows, 'departments': departments, 'top': top}
+    result['departments_path'] = _output_path(output, 'departments')
+    _write_frame(departments, result['departments_path'])
+    if top_n:
+        result['top_path'] = _output_path(output, f'top{top_n}')
+        _write_frame(top, result['top_path'])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ประเมินความเสี่ยงของทุกหน่วยงานแบบ batch")
+    parser.add_argument('--source', help="โฟลเดอร์ของไฟล์ .csv/.parquet ต่อหน่วยงาน (ไม่ระบุ = ข้อมูลจำลอง)")
+    parser.add_argument('--output', default='risk_register.csv', help="ไฟล์ทะเบียนความเสี่ยง (.csv หรือ .parquet)")
+    parser.add_argument('--top', type=int, default=20, help="จำนวนรายการความเสี่ยงสูงสุดที่ต้องการ")
+    parser.add_argument('--workers', type=int, default=None, help="จำนวน worker (ค่าเริ่มต้นตามจำนวน CPU)")
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process')
+    args = parser.parse_args(argv)
+
+    result = run_batch(
+        risk_table_sources(args.source), args.output,
+        top_n=args.top, workers=args.workers, executor=args.executor
+    )
+    print(f"บันทึกทะเบียนความเสี่ยง {result['rows']:,} รายการ ที่ {result['register']}")
+    print(result['departments'].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
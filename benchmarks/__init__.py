@@ -0,0 +1,4 @@
+"""สคริปต์วัดประสิทธิภาพ (benchmark) ของโปรแกรมประเมินความเสี่ยง
+
+รันจากโฟลเดอร์หลักของโปรเจกต์ เช่น `python -m benchmarks.bench_paged_load`
+"""
@@ -0,0 +1,51 @@
+"""บันทึกผล benchmark เป็นค่าอ้างอิง (baseline) และเปรียบเทียบผลรอบใหม่กับค่าอ้างอิง"""
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+
+def environment():
+    """ข้อมูลเครื่อง/เวอร์ชันที่ใช้วัด (ผลจากเครื่องต่างกันเทียบกันได้เพียงคร่าว ๆ)"""
+    import numpy
+    import streamlit
+
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': numpy.__version__,
+        'streamlit': streamlit.__version__,
+    }
+
+
+def save_baseline(results, path, **meta):
+    Path(path).write_text(json.dumps({
+        'environment': environment(),
+        'meta': meta,
+        'results': results.to_dict('records'),
+    }, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+
+def load_baseline(path):
+    return pd.DataFrame(json.loads(Path(path).read_text(encoding='utf-8'))['results'])
+
+
+def compare(results, baseline, keys, metrics, tolerance=0.25):
+    """เพิ่มคอลัมน์ <metric>_ratio (ผลใหม่ / baseline) และ regression เมื่อ ratio ใดเกิน 1 + tolerance
+
+    metric ทั้งหมดต้องเป็นค่าที่ "ยิ่งน้อยยิ่งดี" เช่น latency และหน่วยความจำ
+    """
+    reference = baseline[list(keys) + list(metrics)].rename(columns={m: f"{m}_baseline" for m in metrics})
+    merged = results.merge(reference, on=list(keys), how='left')
+    ratios = []
+    for metric in metrics:
+        column = f"{metric}_ratio"
+        merged[column] = merged[metric] / merged[f"{metric}_baseline"]
+        ratios.append(column)
+    merged['regression'] = (merged[ratios] > 1 + tolerance).any(axis=1)
+    return merged.drop(columns=[f"{m}_baseline" for m in metrics])
@@ -0,0 +1,209 @@
+"""วัดประสิทธิภาพของ app.py แบบ headless ด้วย Streamlit AppTest กับ Apps Script จำลอง (stub server)
+
+Scenario (ทำต่อกันใน Session เดียว ยกเว้น warm_load):
+- cold_first_page : Session แรกหลังล้างแคชระดับ Process จนแสดงหน้าแรก
+- cold_complete   : จนเปิดแท็บ 2 และได้ข้อมูลครบทุกหน้า
+- warm_load       : Session ใหม่ที่เปิดแท็บ 2 ขณะที่ข้อมูลระดับ Process ยังอยู่
+- edit_merge      : แก้ไข 1 เซลล์ เพิ่ม 1 แถว ลบ 1 แถว ใน Editor ของแท็บ 2
+- save            : กดบันทึก (ส่ง patch ไปยัง stub server)
+- filter          : เลือกกลุ่มงานใน Dropdown ของแท็บ 2
+- risk_tab        : เลือกหน่วยงานที่มีรายการความเสี่ยง --hazards รายการในแท็บ 3
+
+peak_mib วัดจากรอบแยกที่เปิด tracemalloc (เวลาใช้เฉพาะรอบที่ไม่เปิด)
+รอบแรกของ Process (import โมดูล/คอมไพล์สคริปต์) รันทิ้งหนึ่งครั้งก่อนเริ่มจับเวลา
+
+    python -m benchmarks.bench_app --sizes 1000 20000 --baseline benchmarks/baseline_app.json
+    python -m benchmarks.bench_app --save-baseline benchmarks/baseline_app.json
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.baseline import compare, load_baseline, save_baseline
+from benchmarks.stub_server import StubAppsScript
+from benchmarks.synthetic import hazard_table, log_rows
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / 'app.py')
+RISK_DEPARTMENT = 'หน่วยงานทดสอบ'
+LOG_TAB = "2. บันทึกขั้นตอนการทำงาน"
+RISK_TAB = "3. ประเมินความเสี่ยงจากการทำงาน"
+SAVE_LABEL = "💾 บันทึกข้อมูล (Update Google Sheet)"
+SCENARIOS = ['cold_first_page', 'cold_complete', 'warm_load', 'edit_merge', 'save', 'filter', 'risk_tab']
+# scenario ที่วัด throughput เป็นจำนวนแถวต่อวินาที (ที่เหลือเป็นจำนวนครั้งต่อวินาที)
+ROW_SCENARIOS = {'cold_complete', 'warm_load'}
+
+
+class Steps:
+    """จับเวลา (และ peak ของ tracemalloc เมื่อเปิด) ของแต่ละขั้น"""
+
+    def __init__(self):
+        self.seconds = {}
+        self.peak = {}
+
+    def measure(self, name, fn):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = fn()
+        self.seconds[name] = time.perf_counter() - start
+        if tracing:
+            self.peak[name] = tracemalloc.get_traced_memory()[1]
+        return result
+
+
+def _check(at):
+    if at.exception:
+        raise RuntimeError(f"app.py error: {at.exception[0].value}")
+    return at
+
+
+def _open_tab(at, tab):
+    """เลือกแท็บสำหรับ rerun ถัดไป (AppTest ไม่จำค่าของแท็บระหว่าง rerun ต้องตั้งทุกครั้ง)"""
+    at.session_state['main_tab'] = tab
+    return at
+
+
+def _loaded(at):
+    state = at.session_state
+    return 'log_data' in state and ('log_loader' not in state or state['log_loader'] is None)
+
+
+def _run_until_loaded(at, timeout):
+    deadline = time.monotonic() + timeout
+    while not _loaded(at):
+        if time.monotonic() > deadline:
+            raise TimeoutError("โหลดหน้าที่เหลือไม่เสร็จภายในเวลาที่กำหนด")
+        time.sleep(0.01)
+        _check(_open_tab(at, LOG_TAB).run())
+    return at
+
+
+def run_flow(n_rows, timeout):
+    """รันทุก scenario หนึ่งรอบ (ต้องตั้งค่า RISK_APP_GAS_URL/RISK_APP_RISK_SOURCE/RISK_APP_PATCH_WRITES ก่อน)"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    st.cache_resource.clear()
+    steps = Steps()
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    steps.measure('cold_first_page', lambda: _check(at.run()))
+    steps.measure('cold_complete', lambda: _run_until_loaded(at, timeout))
+    if len(at.session_state['log_data']) != n_rows:
+        raise RuntimeError(f"โหลดได้ {len(at.session_state['log_data'])} แถว (ควรได้ {n_rows})")
+
+    warm = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    steps.measure('warm_load', lambda: _run_until_loaded(warm, timeout))
+
+    at.session_state['log_editor'] = {
+        'edited_rows': {0: {'ขั้นตอนการทำงาน-ลักษณะงาน': 'แก้ไขโดย benchmark'}},
+        'added_rows': [{'กลุ่มงาน': 'กลุ่มงาน-ใหม่', 'ขั้นตอนการทำงาน-ลักษณะงาน': 'เพิ่มโดย benchmark', 'ตำแหน่งงาน': 'ช่างเทคนิค'}],
+        'deleted_rows': [1],
+    }
+    steps.measure('edit_merge', lambda: _check(_open_tab(at, LOG_TAB).run()))
+    if not at.session_state['edited_log']:
+        raise RuntimeError("Editor ไม่ได้รับการแก้ไข")
+
+    # ปุ่มบันทึกเปิดใช้งานตั้งแต่ rerun ถัดไปหลังการแก้ไข (เหมือนผู้ใช้ที่คลิกครั้งต่อไป)
+    _check(_open_tab(at, LOG_TAB).run())
+    save = next(b for b in at.button if b.label == SAVE_LABEL)
+    _open_tab(at, LOG_TAB)
+    steps.measure('save', lambda: _check(save.click().run()))
+    if at.session_state['edited_log']:
+        raise RuntimeError("บันทึกไม่สำเร็จ")
+
+    group = at.selectbox(key='log_filter_select').options[1]
+    steps.measure('filter', lambda: _check(_open_tab(at, LOG_TAB).selectbox(key='log_filter_select').select(group).run()))
+
+    steps.measure('risk_tab', lambda: _check(_open_tab(at, RISK_TAB).selectbox(key='department_select').select(RISK_DEPARTMENT).run()))
+    return steps
+
+
+def _warm_up(n_rows, n_groups, timeout):
+    stub = StubAppsScript(log_rows(n_rows, n_groups=n_groups))
+    os.environ['RISK_APP_GAS_URL'] = stub.start()
+    try:
+        run_flow(n_rows, timeout)
+    finally:
+        stub.stop()
+
+
+def run(sizes, n_groups, n_hazards, latency, repeat, memory, timeout=300):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        hazard_table(n_hazards).to_parquet(Path(tmp) / f"{RISK_DEPARTMENT}.parquet", index=False)
+        os.environ['RISK_APP_RISK_SOURCE'] = tmp
+        # stub รองรับ patch (scenario save วัดการบันทึกเฉพาะส่วนที่เปลี่ยนแปลง)
+        os.environ['RISK_APP_PATCH_WRITES'] = '1'
+        _warm_up(min(sizes), n_groups, timeout)
+
+        for n_rows in sizes:
+            timings = {name: [] for name in SCENARIOS}
+            peaks = {}
+            for attempt in range(repeat + int(memory)):
+                # rerun ต้องเริ่มจาก Sheet เดิมทุกครั้ง (save แก้ไขข้อมูลใน stub)
+                stub = StubAppsScript(log_rows(n_rows, n_groups=n_groups), latency=latency)
+                os.environ['RISK_APP_GAS_URL'] = stub.start()
+                tracing = memory and attempt == repeat
+                if tracing:
+                    tracemalloc.start()
+                try:
+                    steps = run_flow(n_rows, timeout)
+                finally:
+                    if tracing:
+                        tracemalloc.stop()
+                    stub.stop()
+                if tracing:
+                    peaks = steps.peak
+                else:
+                    for name, seconds in steps.seconds.items():
+                        timings[name].append(seconds)
+
+            for name in SCENARIOS:
+                latency_s = statistics.median(timings[name])
+                results.append({
+                    'scenario': name,
+                    'rows': n_rows,
+                    'latency_ms': 1000 * latency_s,
+                    'latency_max_ms': 1000 * max(timings[name]),
+                    'throughput': (n_rows if name in ROW_SCENARIOS else 1) / latency_s,
+                    'unit': 'rows/s' if name in ROW_SCENARIOS else 'ops/s',
+                    'peak_mib': peaks[name] / (1024 * 1024) if name in peaks else None,
+                })
+    return pd.DataFrame(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 20000])
+    parser.add_argument('--groups', type=int, default=50, help="จำนวนกลุ่มงานในข้อมูลจำลอง")
+    parser.add_argument('--hazards', type=int, default=5000, help="จำนวนรายการความเสี่ยงของหน่วยงานทดสอบ")
+    parser.add_argument('--latency', type=float, default=0.05, help="latency จำลองของ Apps Script (วินาที)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="ไม่ต้องวัด peak memory (ข้ามรอบ tracemalloc)")
+    parser.add_argument('--baseline', help="ไฟล์ baseline ที่ต้องการเปรียบเทียบ")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="สัดส่วนที่ช้าลง/ใช้หน่วยความจำเพิ่มได้ก่อนนับเป็น regression")
+    parser.add_argument('--save-baseline', help="บันทึกผลรอบนี้เป็น baseline")
+    args = parser.parse_args(argv)
+
+    table = run(args.sizes, args.groups, args.hazards, args.latency, args.repeat, not args.no_memory)
+    if args.save_baseline:
+        save_baseline(table, args.save_baseline, groups=args.groups, hazards=args.hazards,
+                      latency=args.latency, repeat=args.repeat)
+    if args.baseline:
+        metrics = ['latency_ms'] + ([] if args.no_memory else ['peak_mib'])
+        table = compare(table, load_baseline(args.baseline), ['scenario', 'rows'], metrics, args.tolerance)
+    print(table.to_string(index=False, float_format='%.2f'))
+    if args.baseline and table['regression'].any():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""วัดการขยายตัวของ batch_assess ตามจำนวน worker ด้วยหน่วยงานจำลอง
+
+สร้างไฟล์ Parquet ของหน่วยงานจำลองในโฟลเดอร์ชั่วคราว แล้วรัน run_batch ด้วยจำนวน worker ต่าง ๆ
+
+    python -m benchmarks.bench_batch_scaling --departments 64 --rows 20000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from batch_assess import run_batch
+from benchmarks.synthetic import write_hazard_tables
+from risk_data import risk_table_sources
+
+
+def run(n_departments, n_rows, worker_counts, executor):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'departments'
+        write_hazard_tables(source, n_departments, n_rows)
+
+        for workers in worker_counts:
+            output = Path(tmp) / f"register_{workers}.parquet"
+            start = time.perf_counter()
+            result = run_batch(risk_table_sources(source), output, top_n=50, workers=workers, executor=executor)
+            elapsed = time.perf_counter() - start
+            results.append({
+                'workers': workers,
+                'seconds': elapsed,
+                'rows_per_s': result['rows'] / elapsed,
+            })
+    df = pd.DataFrame(results)
+    df['speedup'] = df['seconds'].iloc[0] / df['seconds']
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--departments', type=int, default=32)
+    parser.add_argument('--rows', type=int, default=20000, help="จำนวนรายการต่อหน่วยงาน")
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process')
+    args = parser.parse_args(argv)
+    print(f"CPU: {os.cpu_count()}")
+    print(run(args.departments, args.rows, args.workers, args.executor).to_string(index=False, float_format='%.2f'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""วัดเวลาต่อ rerun ของตัวกรองกลุ่มงานในแท็บ 2 และการรวมแถวที่แก้ไขกลับ
+
+แบบเดิม: สแกนทั้งตารางเพื่อสร้างตัวเลือก/กรองแถว และ pd.concat ทั้งตารางเมื่อมีการแก้ไข
+แบบดัชนี: GroupIndex + merge_group_edits
+
+    python -m benchmarks.bench_group_index --rows 100000 --groups 500
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import log_rows
+from log_frame import compact_log_frame, editor_frame, records_to_frame
+from log_index import GroupIndex, merge_group_edits
+
+LOG_KEYS = {'กลุ่มงาน': 'id', 'ขั้นตอนการทำงาน-ลักษณะงาน': 'activity', 'ตำแหน่งงาน': 'position'}
+CATEGORY_COLUMNS = ('กลุ่มงาน', 'ตำแหน่งงาน')
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _edit_one(shown, column='ตำแหน่งงาน', value='แก้ไขแล้ว'):
+    edited = shown.copy()
+    edited.iloc[0, edited.columns.get_loc(column)] = value
+    return edited
+
+
+def _timed_merge(compact, shown, edited, repeat):
+    # merge_group_edits แก้ไข df และดัชนีในที่เดิม จึงเตรียมสำเนาใหม่นอกช่วงจับเวลา
+    merge_times = []
+    for _ in range(repeat):
+        target, fresh = compact.copy(), GroupIndex(compact['กลุ่มงาน'])
+        start = time.perf_counter()
+        merge_group_edits(target, shown, edited, fresh, 'กลุ่มงาน', CATEGORY_COLUMNS)
+        merge_times.append(time.perf_counter() - start)
+    return sum(merge_times) / repeat * 1000
+
+
+def run(n_rows, n_groups, repeat):
+    records = [dict(r, rowIndex=i + 2) for i, r in enumerate(log_rows(n_rows, n_groups))]
+    legacy = pd.DataFrame(records).rename(columns={v: k for k, v in LOG_KEYS.items()})
+    compact = compact_log_frame(records_to_frame(records, LOG_KEYS), CATEGORY_COLUMNS)
+    group = sorted(compact['กลุ่มงาน'].unique())[0]
+
+    def legacy_options():
+        groups = legacy['กลุ่มงาน'].astype(str).str.strip().unique()
+        return sorted(groups[groups != ''].tolist())
+
+    def legacy_view():
+        return legacy[legacy['กลุ่มงาน'] == group]
+
+    legacy_shown = legacy_view()
+    legacy_edited = _edit_one(legacy_shown)
+
+    def legacy_merge():
+        rest = legacy[legacy['กลุ่มงาน'] != group]
+        return pd.concat([rest, legacy_edited], ignore_index=True)
+
+    index = GroupIndex(compact['กลุ่มงาน'])
+
+    def indexed_view():
+        return editor_frame(compact.loc[index.labels(group)], CATEGORY_COLUMNS)
+
+    shown = indexed_view()
+    # คอลัมน์ข้อความ Arrow: สร้างใหม่เฉพาะ chunk ที่แก้ไข
+    # คอลัมน์ categorical ที่ได้ค่าใหม่: add_categories คัดลอก codes ทั้งคอลัมน์หนึ่งครั้ง
+    text_edit = _edit_one(shown, 'ขั้นตอนการทำงาน-ลักษณะงาน', 'แก้ไขแล้ว')
+    category_edit = _edit_one(shown)
+
+    legacy_merge_ms = _timed(legacy_merge, repeat)
+    rows = [
+        ('options', _timed(legacy_options, repeat), _timed(index.options, repeat)),
+        ('filtered view', _timed(legacy_view, repeat), _timed(indexed_view, repeat)),
+        ('merge 1 edit (text)', legacy_merge_ms, _timed_merge(compact, shown, text_edit, repeat)),
+        ('merge 1 edit (new category)', legacy_merge_ms, _timed_merge(compact, shown, category_edit, repeat)),
+        ('build index (once per load)', None, _timed(lambda: GroupIndex(compact['กลุ่มงาน']), repeat)),
+    ]
+    return pd.DataFrame(rows, columns=['step', 'legacy_ms', 'indexed_ms'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+    print(run(args.rows, args.groups, args.repeat).to_string(index=False, float_format='%.3f', na_rep='-'))
+
+
+if __name__ == '__main__':
+    main()
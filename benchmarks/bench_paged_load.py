@@ -0,0 +1,103 @@
+"""วัดเวลาแสดงแถวแรก (time-to-first-rows) และ peak RSS ของการโหลด log sheet
+
+เปรียบเทียบการโหลดทั้ง Sheet ครั้งเดียว (แบบเดิม) กับการโหลดแบบทีละหน้า
+แต่ละกรณีรันใน Process แยก เพื่อให้ค่า peak RSS ไม่ปนกัน
+
+    python -m benchmarks.bench_paged_load --sizes 1000 50000 200000
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.stub_server import StubAppsScript
+from benchmarks.synthetic import log_rows
+
+LOG_KEYS = {'กลุ่มงาน': 'id', 'ขั้นตอนการทำงาน-ลักษณะงาน': 'activity', 'ตำแหน่งงาน': 'position'}
+
+
+def _serve(n_rows, latency, url_queue, stop_event):
+    stub = StubAppsScript(log_rows(n_rows), latency=latency)
+    url_queue.put(stub.start())
+    stop_event.wait()
+    stub.stop()
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure(url, mode, page_size, concurrency, out):
+    from log_frame import PagedLogLoader, drop_blank_rows, has_more_pages, records_to_frame
+    from sheet_client import SheetClient
+
+    client = SheetClient(url, 'bench')
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'full':
+        data = client.read('log').json()['data']
+        df = pd.DataFrame(data).rename(columns={v: k for k, v in LOG_KEYS.items()})
+        first_rows = time.perf_counter() - start
+        total = time.perf_counter() - start
+    else:
+        first = client.read('log', offset=0, limit=page_size).json()
+        seed = drop_blank_rows(records_to_frame(first['data'], LOG_KEYS), 'กลุ่มงาน')
+        first_rows = time.perf_counter() - start
+        df = seed
+        if has_more_pages(first):
+            loader = PagedLogLoader(
+                lambda offset: client.read('log', offset=offset, limit=page_size).json(),
+                first['nextOffset'], LOG_KEYS, 'กลุ่มงาน', seed=seed,
+                total=first.get('total'), page_size=page_size, concurrency=concurrency
+            ).start()
+            loader.join()
+            df = loader.frame()
+        total = time.perf_counter() - start
+    out.put({
+        'rows': len(df),
+        'first_rows_s': first_rows,
+        'total_s': total,
+        'peak_rss_delta_mb': _peak_rss_mb() - baseline_rss,
+    })
+
+
+def run(sizes, page_size, latency, concurrency=1):
+    ctx = mp.get_context('spawn')
+    results = []
+    for n_rows in sizes:
+        url_queue, stop_event = ctx.Queue(), ctx.Event()
+        server = ctx.Process(target=_serve, args=(n_rows, latency, url_queue, stop_event), daemon=True)
+        server.start()
+        url = url_queue.get()
+        for mode in ('full', 'paged'):
+            out = ctx.Queue()
+            worker = ctx.Process(target=_measure, args=(url, mode, page_size, concurrency, out))
+            worker.start()
+            result = out.get()
+            worker.join()
+            if result['rows'] != n_rows:
+                raise RuntimeError(f"{mode}: โหลดได้ {result['rows']} แถว (ควรได้ {n_rows})")
+            results.append(dict(result, size=n_rows, mode=mode))
+        stop_event.set()
+        server.join()
+    return pd.DataFrame(results)[['size', 'mode', 'rows', 'first_rows_s', 'total_s', 'peak_rss_delta_mb']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 50000, 200000])
+    # ค่าเริ่มต้นเท่ากับ LOG_PAGE_SIZE/LOG_PAGE_CONCURRENCY ใน app.py
+    parser.add_argument('--page-size', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=4, help="จำนวนหน้าที่ขอพร้อมกัน")
+    parser.add_argument('--latency', type=float, default=0.0, help="หน่วงเวลาต่อคำขอของ stub (วินาที)")
+    args = parser.parse_args(argv)
+    table = run(args.sizes, args.page_size, args.latency, args.concurrency)
+    print(table.to_string(index=False, float_format='%.3f'))
+
+
+if __name__ == '__main__':
+    main()
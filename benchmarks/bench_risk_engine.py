@@ -0,0 +1,60 @@
+"""เปรียบเทียบการคำนวณ/แสดงผลระดับความเสี่ยง: Styler ลงสีทีละเซลล์ (แบบเดิม) กับ risk_engine
+
+แบบเดิมวัดรวมการ render Styler (สิ่งที่ st.dataframe ต้องทำกับ Styler ทุกครั้ง)
+
+    python -m benchmarks.bench_risk_engine --sizes 1000 10000 50000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import hazard_table
+from risk_engine import score_risks, summarize_risks
+
+
+def legacy_calculate_risk_level(df):
+    """สำเนาของ calculate_risk_level เดิม (ใช้ Styler.map แทน applymap ที่ถูกถอดออกใน pandas 3)"""
+    df['ระดับความเสี่ยง (L x C)'] = df['L'] * df['C']
+
+    def highlight_risk(val):
+        if val >= 15: return 'background-color: #fca5a5; color: #991b1b; font-weight: bold;'
+        elif val >= 8: return 'background-color: #fcd34d; color: #92400e; font-weight: bold;'
+        elif val >= 4: return 'background-color: #fde68a; color: #9a3412;'
+        return 'background-color: #a7f3d0; color: #065f46;'
+
+    styler = df.style
+    apply = getattr(styler, 'map', None) or styler.applymap
+    return apply(highlight_risk, subset=['ระดับความเสี่ยง (L x C)'])
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes, repeat):
+    results = []
+    for n_rows in sizes:
+        df = hazard_table(n_rows)
+        results.append({
+            'size': n_rows,
+            'legacy_styler_ms': _timed(lambda: legacy_calculate_risk_level(df.copy()).to_html(), repeat),
+            'engine_score_ms': _timed(lambda: score_risks(df), repeat),
+            'engine_summary_ms': _timed(lambda: summarize_risks(score_risks(df)), repeat),
+        })
+    return pd.DataFrame(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    print(run(args.sizes, args.repeat).to_string(index=False, float_format='%.2f'))
+
+
+if __name__ == '__main__':
+    main()
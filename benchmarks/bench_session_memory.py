@@ -0,0 +1,81 @@
+"""วัดหน่วยความจำของ log_data ต่อ Session: แบบเดิม (DataFrame + สำเนา initial_log_data)
+เทียบกับแบบ compact (categorical/Arrow string + hash ต่อแถว)
+
+    python -m benchmarks.bench_session_memory --sizes 1000 50000 200000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import log_rows
+from log_changes import row_hashes
+from log_frame import compact_log_frame, editor_frame, records_to_frame
+from log_index import GroupIndex
+
+LOG_KEYS = {'กลุ่มงาน': 'id', 'ขั้นตอนการทำงาน-ลักษณะงาน': 'activity', 'ตำแหน่งงาน': 'position'}
+CATEGORY_COLUMNS = ('กลุ่มงาน', 'ตำแหน่งงาน')
+
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def _timed(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes, n_groups):
+    results = []
+    for n_rows in sizes:
+        records = [dict(r, rowIndex=i + 2) for i, r in enumerate(log_rows(n_rows, n_groups))]
+
+        legacy = pd.DataFrame(records, dtype=object).rename(columns={v: k for k, v in LOG_KEYS.items()})
+        legacy_baseline = legacy.copy()
+
+        def legacy_rerun():
+            current = legacy.copy()
+            current['กลุ่มงาน'].astype(str).str.strip().unique()
+            legacy.copy()
+
+        results.append({
+            'size': n_rows,
+            'layout': 'legacy',
+            'log_data_mb': _mb(legacy),
+            'baseline_mb': _mb(legacy_baseline),
+            'rerun_prep_ms': _timed(legacy_rerun),
+        })
+
+        compact = compact_log_frame(records_to_frame(records, LOG_KEYS), CATEGORY_COLUMNS)
+        baseline = row_hashes(compact, LOG_KEYS)
+        group_index = GroupIndex(compact['กลุ่มงาน'])
+
+        def compact_rerun():
+            group_index.options()
+            editor_frame(compact, CATEGORY_COLUMNS)
+
+        results.append({
+            'size': n_rows,
+            'layout': 'compact',
+            'log_data_mb': _mb(compact),
+            'baseline_mb': baseline.memory_usage(deep=True) / (1024 * 1024),
+            'rerun_prep_ms': _timed(compact_rerun),
+        })
+    df = pd.DataFrame(results)
+    df['session_total_mb'] = df['log_data_mb'] + df['baseline_mb']
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 50000, 200000])
+    parser.add_argument('--groups', type=int, default=50)
+    args = parser.parse_args(argv)
+    print(run(args.sizes, args.groups).to_string(index=False, float_format='%.2f'))
+
+
+if __name__ == '__main__':
+    main()
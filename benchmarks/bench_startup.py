@@ -0,0 +1,147 @@
+"""วัดเวลาเริ่มต้นของ app.py: time-to-first-paint และ time-to-interactive (AppTest + Apps Script จำลอง)
+
+แต่ละรอบรันใน Process ใหม่ (นับรวมการ import โมดูลของแอป เหมือน Session แรกหลังเริ่ม Server)
+ไม่นับเวลา import streamlit เอง (Server เริ่มไว้ก่อนแล้ว)
+
+- first_paint : ตั้งแต่เริ่ม rerun แรกของ Session จนส่งหัวเรื่อง (st.title) ไปยังเบราว์เซอร์
+- tab1_ready  : จน rerun แรกจบ (แท็บ 1 ใช้งานได้)
+- log_visible : จนเปิดแท็บ 2 แล้วตารางแสดงข้อมูล (อย่างน้อยหน้าแรก)
+- log_ready   : จนได้ข้อมูลครบทุกหน้าในตาราง
+
+first_session คือ Session แรกของ Process และ next_session คือ Session ถัดไปหลังรอ --gap วินาที
+
+    python -m benchmarks.bench_startup --rows 20000 --latency 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.stub_server import StubAppsScript
+from benchmarks.synthetic import log_rows
+
+LOG_TAB = "2. บันทึกขั้นตอนการทำงาน"
+METRICS = ['first_paint', 'tab1_ready', 'log_visible', 'log_ready']
+
+
+class PaintClock:
+    """บันทึกเวลาที่ Delta ของหัวเรื่อง (heading) ถูกส่งออกครั้งแรกหลัง reset()"""
+
+    def __init__(self):
+        from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+
+        self.painted_at = None
+        enqueue = ForwardMsgQueue.enqueue
+        clock = self
+
+        def timed_enqueue(queue, msg):
+            if (clock.painted_at is None and msg.WhichOneof('type') == 'delta'
+                    and msg.delta.WhichOneof('type') == 'new_element'
+                    and msg.delta.new_element.WhichOneof('type') == 'heading'):
+                clock.painted_at = time.perf_counter()
+            return enqueue(queue, msg)
+
+        ForwardMsgQueue.enqueue = timed_enqueue
+
+    def reset(self):
+        self.painted_at = None
+
+
+def _log_ready(at):
+    state = at.session_state
+    return 'log_data' in state and (state['log_loader'] if 'log_loader' in state else None) is None
+
+
+def measure_session(app_path, clock, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    clock.reset()
+    start = time.perf_counter()
+    at.run()
+    result = {'first_paint': clock.painted_at - start, 'tab1_ready': time.perf_counter() - start}
+
+    # เปิดแท็บ 2 แล้ว rerun จนข้อมูลครบ (เหมือน fragment ที่ตรวจสอบสถานะทุกช่วงเวลาสั้น ๆ)
+    at.session_state['main_tab'] = LOG_TAB
+    deadline = start + timeout
+    while True:
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"app.py error: {at.exception[0].value}")
+        if 'log_visible' not in result and 'log_data' in at.session_state:
+            result['log_visible'] = time.perf_counter() - start
+        if _log_ready(at):
+            break
+        if time.perf_counter() > deadline:
+            raise TimeoutError("โหลดข้อมูลไม่เสร็จภายในเวลาที่กำหนด")
+        time.sleep(0.05)
+    result['log_ready'] = time.perf_counter() - start
+    result['rows'] = len(at.session_state['log_data'])
+    return result
+
+
+def child(app_path, gap, timeout):
+    """รันใน Process ใหม่: วัด Session แรกและ Session ถัดไป แล้วพิมพ์ผลเป็น JSON"""
+    import streamlit  # noqa: F401 (Server เริ่มไว้ก่อน Session แรกเสมอ)
+    from streamlit.testing.v1 import AppTest  # noqa: F401
+
+    clock = PaintClock()
+    first = measure_session(app_path, clock, timeout)
+    time.sleep(gap)
+    following = measure_session(app_path, clock, timeout)
+    print(json.dumps({'first_session': first, 'next_session': following}))
+
+
+def run(n_rows, n_groups, latency, repeat, gap, app_path, timeout=300):
+    samples = {}
+    for _ in range(repeat):
+        stub = StubAppsScript(log_rows(n_rows, n_groups=n_groups), latency=latency)
+        env = dict(os.environ, RISK_APP_GAS_URL=stub.start())
+        try:
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_startup', '--child',
+                 '--app', app_path, '--gap', str(gap), '--timeout', str(timeout)],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+        finally:
+            stub.stop()
+        for session, result in json.loads(out.strip().splitlines()[-1]).items():
+            if result['rows'] != n_rows:
+                raise RuntimeError(f"{session}: โหลดได้ {result['rows']} แถว (ควรได้ {n_rows})")
+            for metric in METRICS:
+                samples.setdefault((session, metric), []).append(result[metric])
+
+    return pd.DataFrame([
+        {'session': session, 'metric': metric, 'rows': n_rows,
+         'median_ms': 1000 * statistics.median(values), 'max_ms': 1000 * max(values)}
+        for (session, metric), values in samples.items()
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=50, help="จำนวนกลุ่มงานในข้อมูลจำลอง")
+    parser.add_argument('--latency', type=float, default=0.5, help="latency จำลองของ Apps Script (วินาที)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--gap', type=float, default=2.0, help="เวลาระหว่าง Session แรกและ Session ถัดไป (วินาที)")
+    parser.add_argument('--app', default=str(os.path.join(os.path.dirname(__file__), os.pardir, 'app.py')))
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    app_path = os.path.abspath(args.app)
+    if args.child:
+        child(app_path, args.gap, args.timeout)
+        return
+    table = run(args.rows, args.groups, args.latency, args.repeat, args.gap, app_path, args.timeout)
+    print(table.to_string(index=False, float_format='%.0f'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""เปรียบเทียบเวลาอ่าน/เขียนของ storage backend: Apps Script (ผ่าน stub server) กับ SQLite บนเครื่อง
+
+ทั้งสอง backend ได้รับ changeset ชุดเดียวกัน และต้องให้ผลการอ่านตรงกันก่อนจับเวลา
+
+    python -m benchmarks.bench_storage --sizes 1000 20000 --latency 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.stub_server import StubAppsScript
+from benchmarks.synthetic import log_rows
+from sheet_client import SheetClient
+from storage import AppsScriptBackend, SQLiteBackend
+
+FIELDS = ['id', 'activity', 'position']
+SHEET = 'log'
+
+
+def _changeset(n_rows, n_changes, seed):
+    rng = random.Random(seed)
+    rows = rng.sample(range(2, n_rows + 2), 2 * n_changes)
+    return {
+        'updates': [
+            {'rowIndex': r, 'id': 'กลุ่มงาน-แก้ไข', 'activity': f"แก้ไข {r}", 'position': 'หัวหน้างาน'}
+            for r in rows[:n_changes]
+        ],
+        'deletes': sorted(rows[n_changes:]),
+        'inserts': [
+            {'id': 'กลุ่มงาน-ใหม่', 'activity': f"ใหม่ {i}", 'position': 'ช่างเทคนิค'}
+            for i in range(n_changes)
+        ],
+    }
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def _measure(name, backend, n_rows, changes, page_size, repeat):
+    row = {'backend': name, 'rows': n_rows}
+    row['write_ms'], _ = _timed(lambda: backend.write(SHEET, log_rows(n_rows)), 1)
+    row['read_all_ms'], _ = _timed(lambda: backend.read(SHEET, offset=0, limit=n_rows), repeat)
+    row['read_page_ms'], _ = _timed(lambda: backend.read(SHEET, offset=n_rows // 2, limit=page_size), repeat)
+    row['patch_ms'], ack = _timed(lambda: backend.patch(SHEET, changes), 1)
+    return row, ack, backend.read(SHEET, offset=0, limit=n_rows)['data']
+
+
+def run(sizes, n_changes, page_size, latency, repeat):
+    results = []
+    for n_rows in sizes:
+        changes = _changeset(n_rows, n_changes, seed=n_rows)
+        stub = StubAppsScript(latency=latency)
+        client = SheetClient(stub.start(), 'bench')
+        with tempfile.TemporaryDirectory() as tmp:
+            sqlite = SQLiteBackend(os.path.join(tmp, 'bench.db'), FIELDS, 'id')
+            try:
+                remote, remote_ack, remote_rows = _measure(
+                    'apps_script', AppsScriptBackend(client), n_rows, changes, page_size, repeat
+                )
+                local, local_ack, local_rows = _measure('sqlite', sqlite, n_rows, changes, page_size, repeat)
+            finally:
+                sqlite.close()
+                client.close()
+                stub.stop()
+        # ทั้งสอง backend ต้องให้ rowIndex ของแถวใหม่และข้อมูลหลัง patch ตรงกัน
+        if remote_ack['inserted'] != local_ack['inserted'] or remote_rows != local_rows:
+            raise AssertionError(f"ผลของ backend ไม่ตรงกันที่ {n_rows} แถว")
+        results.extend([remote, local])
+    return pd.DataFrame(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 20000])
+    parser.add_argument('--changes', type=int, default=50, help="จำนวนแถวที่แก้ไข/ลบ/เพิ่ม ในแต่ละประเภท")
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.2, help="latency จำลองของ Apps Script (วินาที)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    table = run(args.sizes, args.changes, args.page_size, args.latency, args.repeat)
+    print(table.to_string(index=False, float_format='%.1f'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""วัดเวลาบันทึกที่ผู้ใช้ต้องรอ: ส่ง patch ไป Apps Script โดยตรง กับ write-behind (SQLite + journal)
+
+ใช้ stub server ที่ช้าและล้มเหลวแบบสุ่มได้ หลังซิงก์เสร็จตรวจว่า Sheet จำลองตรงกับข้อมูลในเครื่อง
+และทดสอบการเล่น journal ซ้ำเมื่อ Process ล่มระหว่างบันทึก (--crash)
+
+    python -m benchmarks.bench_write_behind --rows 5000 --saves 20 --latency 0.3 --fail-rate 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.stub_server import StubAppsScript
+from benchmarks.synthetic import log_rows
+from sheet_client import SheetClient
+from storage import AppsScriptBackend, SQLiteBackend
+from write_behind import WriteBehindBackend
+
+FIELDS = ['id', 'activity', 'position']
+SHEET = 'log'
+
+
+def _random_changeset(rng, n_rows, save):
+    rows = rng.sample(range(2, n_rows + 2), 3)
+    return {
+        'updates': [{'rowIndex': rows[0], 'id': 'กลุ่มงาน-แก้ไข', 'activity': f"แก้ไขครั้งที่ {save}", 'position': 'หัวหน้างาน'}],
+        'deletes': sorted(rows[1:]),
+        'inserts': [{'id': 'กลุ่มงาน-ใหม่', 'activity': f"เพิ่มครั้งที่ {save}", 'position': 'ช่างเทคนิค'}],
+    }
+
+
+def _records(backend):
+    return [{k: v for k, v in r.items() if k != 'rowIndex'} for r in backend.read(SHEET)['data']]
+
+
+def _local(tmp, rows):
+    local = SQLiteBackend(os.path.join(tmp, 'local.db'), FIELDS, 'id')
+    local.write(SHEET, rows)
+    return local
+
+
+def run(n_rows, n_saves, latency, fail_rate, crash, seed=0):
+    rows = log_rows(n_rows)
+    rng = random.Random(seed)
+    changesets = []
+    total = n_rows
+    for save in range(n_saves):
+        changesets.append(_random_changeset(rng, total, save))
+        total -= 1
+    results = []
+
+    # 1. บันทึกตรงไปยัง Apps Script (ผู้ใช้รอจนได้คำตอบ และลองใหม่เองเมื่อล้มเหลว)
+    stub = StubAppsScript(rows, latency=latency, fail_rate=fail_rate, seed=seed)
+    direct = AppsScriptBackend(SheetClient(stub.start(), 'bench', retry_writes=True, backoff=0.1, retries=10))
+    waits = []
+    for changes in changesets:
+        start = time.perf_counter()
+        direct.patch(SHEET, changes)
+        waits.append(time.perf_counter() - start)
+    direct.close()
+    stub.stop()
+    results.append({'mode': 'direct', 'save_ms_mean': 1000 * sum(waits) / len(waits),
+                    'save_ms_max': 1000 * max(waits), 'sync_s': sum(waits),
+                    'remote_posts': sum(m == 'POST' for m, _, _ in stub.requests), 'consistent': True})
+
+    # 2. write-behind: บันทึกลง SQLite + journal แล้วซิงก์ใน Background
+    with tempfile.TemporaryDirectory() as tmp:
+        stub = StubAppsScript(rows, latency=latency, fail_rate=fail_rate, seed=seed)
+        remote = AppsScriptBackend(SheetClient(stub.start(), 'bench', backoff=0.1))
+        journal = os.path.join(tmp, 'sync.journal')
+        backend = WriteBehindBackend(_local(tmp, rows), remote, journal, backoff=0.2, max_backoff=2.0)
+        if crash:
+            # จำลอง Process ล่ม: ไม่เริ่ม Worker และเขียน journal รายการสุดท้ายโดยไม่ถึง SQLite
+            for changes in changesets[:-1]:
+                backend.patch(SHEET, changes)
+            backend.local.patch = _crash
+            try:
+                backend.patch(SHEET, changesets[-1])
+            except KeyboardInterrupt:
+                pass
+            backend.local.close()
+            local = SQLiteBackend(os.path.join(tmp, 'local.db'), FIELDS, 'id')
+            start = time.perf_counter()
+            backend = WriteBehindBackend(local, remote, journal, backoff=0.2, max_backoff=2.0).start()
+            waits = [0.0]
+        else:
+            backend.start()
+            waits = []
+            start = time.perf_counter()
+            for changes in changesets:
+                save_start = time.perf_counter()
+                backend.patch(SHEET, changes)
+                waits.append(time.perf_counter() - save_start)
+        synced = backend.wait_synced(timeout=120)
+        sync_s = time.perf_counter() - start
+        consistent = synced and _records(backend) == stub.rows == _records(direct_reference(rows, changesets))
+        results.append({'mode': 'write_behind' + ('_crash_replay' if crash else ''),
+                        'save_ms_mean': 1000 * sum(waits) / len(waits), 'save_ms_max': 1000 * max(waits),
+                        'sync_s': sync_s, 'remote_posts': sum(m == 'POST' for m, _, _ in stub.requests),
+                        'consistent': consistent})
+        backend.close()
+        stub.stop()
+    return pd.DataFrame(results)
+
+
+def _crash(*args, **kwargs):
+    raise KeyboardInterrupt
+
+
+def direct_reference(rows, changesets):
+    """ผลที่ถูกต้องหลังบันทึกทุก changeset ตามลำดับ (คำนวณด้วย SQLite ในหน่วยความจำ)"""
+    reference = SQLiteBackend(':memory:', FIELDS, 'id')
+    reference.write(SHEET, rows)
+    for changes in changesets:
+        reference.patch(SHEET, changes)
+    return reference
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--saves', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.3, help="latency จำลองของ Apps Script (วินาที)")
+    parser.add_argument('--fail-rate', type=float, default=0.2, help="สัดส่วนคำขอที่ stub ตอบ 503")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--crash', action='store_true', help="ทดสอบการเล่น journal ซ้ำหลัง Process ล่ม")
+    args = parser.parse_args(argv)
+    table = run(args.rows, args.saves, args.latency, args.fail_rate, args.crash, args.seed)
+    print(table.to_string(index=False, float_format='%.2f'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Apps Script Web App จำลองสำหรับ benchmark (รันบนเครื่อง ไม่ต้องเชื่อมต่อ Google)
+
+รองรับ action เดียวกับ Apps Script จริง:
+- GET  read  : รองรับ offset/limit (ตอบ nextOffset/total) และ ifVersion (ตอบ notModified)
+- POST write : เขียนทับทั้ง Sheet
+- POST patch : inserts/updates/deletes ตามลำดับที่ log_changes กำหนด และตอบ inserted/version
+               (ตอบ conflict เมื่อ baseVersion ไม่ตรงกับ version ปัจจุบัน)
+ปรับ `latency` (วินาที) และ `fail_rate` (สัดส่วนคำขอที่ตอบ `fail_status` เช่น 503/429) ได้
+และกำหนด `retry_after` (วินาที) เพื่อส่ง header Retry-After มากับคำตอบที่ล้มเหลว
+"""
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubAppsScript:
+    """สถานะของ Sheet จำลอง (rows เป็น list ของ dict คีย์ API โดยไม่มี rowIndex)"""
+
+    def __init__(self, rows=None, latency=0.0, fail_rate=0.0, first_row=2, seed=0, fail_status=503, retry_after=None):
+        self.rows = list(rows or [])
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.first_row = first_row
+        self.requests = []  # (method, action, จำนวน byte ของ body ที่ได้รับ)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._version = None
+
+    def version(self):
+        if self._version is None:
+            digest = hashlib.sha1(json.dumps(self.rows, ensure_ascii=False).encode('utf-8'))
+            self._version = digest.hexdigest()
+        return self._version
+
+    def read(self, params):
+        with self._lock:
+            version = self.version()
+            if params.get('ifVersion') == version:
+                return {'status': 'notModified', 'version': version}
+            total = len(self.rows)
+            offset = int(params.get('offset', 0))
+            limit = int(params['limit']) if 'limit' in params else total
+            records = [
+                dict(r, rowIndex=self.first_row + i)
+                for i, r in enumerate(self.rows[offset:offset + limit], start=offset)
+            ]
+        result = {'status': 'success', 'version': version, 'data': records}
+        if 'limit' in params:
+            result['nextOffset'] = offset + limit if offset + limit < total else None
+            result['total'] = total
+        return result
+
+    def write(self, payload):
+        with self._lock:
+            if payload['action'] == 'write':
+                self.rows = [dict(r) for r in payload.get('data', [])]
+                self._version = None
+                return {'status': 'success', 'version': self.version()}
+            base_version = payload.get('baseVersion')
+            if base_version is not None and base_version != self.version():
+                return {'status': 'conflict', 'message': 'version mismatch', 'version': self.version()}
+            self._version = None
+            changes = payload['changes']
+            for update in changes.get('updates', []):
+                fields = {k: v for k, v in update.items() if k != 'rowIndex'}
+                self.rows[update['rowIndex'] - self.first_row] = fields
+            for row_id in sorted(changes.get('deletes', []), reverse=True):
+                del self.rows[row_id - self.first_row]
+            start = self.first_row + len(self.rows)
+            self.rows.extend(dict(r) for r in changes.get('inserts', []))
+            inserted = list(range(start, self.first_row + len(self.rows)))
+            return {'status': 'success', 'inserted': inserted, 'version': self.version()}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, result=None, headers=()):
+                body = json.dumps(result, ensure_ascii=False).encode('utf-8') if result is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _delay_or_fail(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.fail_rate and stub._random.random() < stub.fail_rate:
+                    headers = [('Retry-After', str(stub.retry_after))] if stub.retry_after is not None else []
+                    self._reply(stub.fail_status, {'status': 'error', 'message': 'injected failure'}, headers)
+                    return True
+                return False
+
+            def do_GET(self):
+                params = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+                stub.requests.append(('GET', params.get('action'), 0))
+                if not self._delay_or_fail():
+                    self._reply(200, stub.read(params))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body_size, body = len(body), gzip.decompress(body)
+                else:
+                    body_size = len(body)
+                payload = json.loads(body)
+                stub.requests.append(('POST', payload.get('action'), body_size))
+                if not self._delay_or_fail():
+                    self._reply(200, stub.write(payload))
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        """เริ่ม HTTP server ใน Background Thread และคืน URL"""
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        # poll ถี่ขึ้นเพื่อให้ stop() ไม่ต้องรอครบ 0.5 วินาทีตามค่าเริ่มต้น
+        threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self.url
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/exec"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
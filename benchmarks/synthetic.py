@@ -0,0 +1,66 @@
+"""ตัวสร้างข้อมูลจำลองสำหรับ benchmark"""
+import random
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ACTIVITIES = [
+    "ตรวจสอบเครื่องจักรก่อนเริ่มงาน", "ยกและเคลื่อนย้ายวัตถุดิบ", "ป้อนชิ้นงานเข้าเครื่องตัด",
+    "ทำความสะอาดพื้นที่ทำงาน", "บันทึกข้อมูลการผลิต", "ขับรถยกสินค้า", "ผสมสารเคมีตามสูตร",
+    "เชื่อมโลหะ", "ซ่อมบำรุงระบบไฟฟ้า", "บรรจุสินค้าลงกล่อง",
+]
+HAZARDS = [
+    "บาดเจ็บหลัง/กล้ามเนื้อ", "นิ้วติด/เศษโลหะกระเด็น", "สัมผัสสารเคมี", "ไฟฟ้าดูด", "ลื่นล้ม",
+    "เสียงดังเกินมาตรฐาน", "ความร้อนสูง", "ถูกวัตถุตกใส่", "ปวดตา/ออฟฟิศซินโดรม", "รถยกชน",
+]
+CONTROLS = [
+    "สวมอุปกรณ์คุ้มครองความปลอดภัย", "มีการ์ดป้องกันเครื่องจักร", "อบรมวิธีการทำงานที่ปลอดภัย",
+    "ตรวจสอบอุปกรณ์ก่อนใช้งาน", "ติดตั้งระบบระบายอากาศ", "ใช้รถเข็นหรือยกสองคน",
+]
+POSITIONS = ["พนักงานฝ่ายผลิต", "ช่างเทคนิค", "หัวหน้างาน", "พนักงานคลังสินค้า", "เจ้าหน้าที่ความปลอดภัย"]
+
+
+def log_rows(n_rows, n_groups=50, seed=0):
+    """สร้างแถวขั้นตอนการทำงาน (คีย์ API: id/activity/position) จำนวน n_rows แถว"""
+    rng = random.Random(seed)
+    return [
+        {
+            'id': f"กลุ่มงาน-{rng.randrange(n_groups):03d}",
+            'activity': f"{rng.choice(ACTIVITIES)} ขั้นที่ {i + 1}",
+            'position': rng.choice(POSITIONS),
+        }
+        for i in range(n_rows)
+    ]
+
+
+def hazard_table(n_rows, seed=0):
+    """สร้างตารางประเมินความเสี่ยงของหนึ่งหน่วยงาน (มี L/C ก่อนและหลังมาตรการควบคุม)"""
+    rng = np.random.default_rng(seed)
+    likelihood = rng.integers(1, 6, n_rows)
+    consequence = rng.integers(1, 6, n_rows)
+    return pd.DataFrame({
+        'กิจกรรม': [f"{ACTIVITIES[i % len(ACTIVITIES)]} ({i + 1})" for i in range(n_rows)],
+        'อันตรายที่อาจเกิดขึ้น': rng.choice(HAZARDS, n_rows),
+        'มาตรการควบคุมปัจจุบัน': rng.choice(CONTROLS, n_rows),
+        'L': likelihood,
+        'C': consequence,
+        'L หลังควบคุม': np.maximum(1, likelihood - rng.integers(0, 3, n_rows)),
+        'C หลังควบคุม': consequence,
+    })
+
+
+def write_hazard_tables(directory, n_departments, n_rows, suffix='.parquet'):
+    """เขียนตารางความเสี่ยงของหน่วยงานจำลองลงโฟลเดอร์ (ไฟล์ละหน่วยงาน) และคืนรายการ path"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(n_departments):
+        path = directory / f"หน่วยงาน-{i:03d}{suffix}"
+        table = hazard_table(n_rows, seed=i)
+        if suffix == '.parquet':
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path, index=False)
+        paths.append(path)
+    return paths
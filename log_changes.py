@@ -0,0 +1,145 @@
+"""คำนวณชุดการเปลี่ยนแปลง (changeset) ของข้อมูลขั้นตอนการทำงาน
+
+เปรียบเทียบข้อมูลปัจจุบันกับ hash ของข้อมูลตั้งต้นโดยอ้างอิงแถวด้วย `rowIndex` ที่ Apps Script ส่งมา
+เพื่อให้ส่งไปบันทึกเฉพาะแถวที่ถูกเพิ่ม/แก้ไข/ลบ แทนการเขียนทับทั้ง Sheet
+
+ลำดับที่ Apps Script ต้องใช้เมื่อรับ action 'patch':
+0. ถ้ามี `baseVersion` และไม่ตรงกับ version ปัจจุบันของ Sheet ให้ตอบ
+   {'status': 'conflict', 'version': <version ปัจจุบัน>} โดยไม่แก้ไขข้อมูล
+   (rowIndex ของ changeset อ้างอิงข้อมูลชุดที่โหลดไว้ ถ้า Sheet เปลี่ยนไปแล้วจะบันทึกผิดแถว)
+1. แก้ไขแถวตาม `updates` (อ้างอิง rowIndex เดิมก่อนการลบ)
+2. ลบแถวตาม `deletes` จากแถวล่างขึ้นบน
+3. ต่อท้ายแถวใน `inserts` และตอบกลับ rowIndex ของแถวใหม่ใน `inserted` ตามลำดับเดียวกัน
+   พร้อม `version` ของ Sheet หลังบันทึก
+"""
+import numpy as np
+import pandas as pd
+
+ROW_ID = 'rowIndex'
+
+
+def _as_text(df, columns):
+    """แปลงคอลัมน์ข้อมูลเป็นข้อความ (ค่าว่าง/NaN เป็น '') เพื่อใช้เปรียบเทียบ"""
+    return df[columns].astype(object).where(df[columns].notna(), '').astype(str)
+
+
+def _row_ids(df):
+    """ดึง rowIndex ของแต่ละแถวเป็นตัวเลข (แถวใหม่ที่ยังไม่มี rowIndex จะเป็น NaN)"""
+    if ROW_ID not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    return pd.to_numeric(df[ROW_ID], errors='coerce')
+
+
+def row_hashes(df, key_map):
+    """hash เนื้อหาของแต่ละแถว (Series ที่มี index เป็น rowIndex) ใช้แทนการเก็บสำเนาข้อมูลตั้งต้นทั้งชุด
+
+    คืนค่า None หากมีแถวที่ไม่มี rowIndex (เช่น Apps Script รุ่นเก่า)
+    """
+    ids = _row_ids(df)
+    if ids.isna().any():
+        return None
+    hashes = pd.util.hash_pandas_object(_as_text(df, list(key_map.keys())), index=False)
+    return pd.Series(hashes.to_numpy(), index=ids.astype('int64').to_numpy())
+
+
+def build_changeset(current, baseline, key_map, key_column):
+    """สร้าง changeset ระหว่าง `current` และ `baseline` (ผลจาก row_hashes ของข้อมูลตั้งต้น)
+
+    แถวที่คอลัมน์ `key_column` ว่างจะไม่ถูกบันทึก (แถวเดิมที่ถูกล้างค่าจะนับเป็นการลบ)
+    คืนค่า None หาก baseline เป็น None (ต้องใช้การเขียนทับทั้ง Sheet แทน)
+    """
+    if baseline is None:
+        return None
+    columns = list(key_map.keys())
+
+    cur_ids = _row_ids(current)
+    cur_text = _as_text(current, columns)
+    filled = cur_text[key_column].str.strip() != ''
+
+    existing = filled & cur_ids.isin(baseline.index)
+    inserted = filled & ~existing
+
+    # แถวเดิม: ส่งเฉพาะแถวที่ hash ของเนื้อหาเปลี่ยนไป
+    existing_text = cur_text[existing].set_axis(cur_ids[existing].astype('int64').to_numpy())
+    existing_hashes = pd.util.hash_pandas_object(existing_text, index=False).to_numpy()
+    changed = existing_hashes != baseline.loc[existing_text.index].to_numpy()
+    updates = existing_text[changed].rename(columns=key_map)
+    updates.insert(0, ROW_ID, updates.index)
+
+    deletes = [int(i) for i in baseline.index.difference(existing_text.index).sort_values()]
+
+    return {
+        'inserts': cur_text[inserted].rename(columns=key_map).to_dict('records'),
+        'updates': updates.to_dict('records'),
+        'deletes': deletes,
+    }
+
+
+def changeset_is_empty(changeset):
+    """ตรวจสอบว่า changeset ไม่มีการเปลี่ยนแปลงใด ๆ"""
+    return not (changeset['inserts'] or changeset['updates'] or changeset['deletes'])
+
+
+def apply_ack(current, changeset, ack, key_column):
+    """นำผลตอบรับจาก Apps Script มาปรับข้อมูลในเครื่อง (แทนการโหลดทั้ง Sheet ใหม่)
+
+    - ตัดแถวที่ `key_column` ว่างออก (เหมือนที่ไม่ถูกส่งไปบันทึก)
+    - เลื่อน rowIndex ของแถวเดิมขึ้นตามจำนวนแถวที่ถูกลบไปก่อนหน้า
+    - กำหนด rowIndex ให้แถวใหม่ตาม `inserted` ที่ได้รับ (หรือต่อท้ายแถวสุดท้ายหากไม่มี)
+    """
+    df = current[current[key_column].astype(object).where(current[key_column].notna(), '')
+                 .astype(str).str.strip() != ''].copy()
+    ids = _row_ids(df)
+
+    deleted = np.asarray(changeset['deletes'], dtype='int64')
+    is_new = ids.isna() | ids.isin(deleted)
+    old = ids[~is_new].astype('int64').to_numpy()
+    shifted = old - np.searchsorted(np.sort(deleted), old)
+
+    new_ids = list((ack or {}).get('inserted') or [])
+    if len(new_ids) != int(is_new.sum()):
+        start = int(shifted.max()) + 1 if len(shifted) else 1
+        new_ids = list(range(start, start + int(is_new.sum())))
+
+    result = pd.Series(pd.NA, index=df.index, dtype='Int64')
+    result[~is_new] = shifted
+    result[is_new] = new_ids
+    df[ROW_ID] = result
+    return df.reset_index(drop=True)
+
+
+def compose_changesets(changesets, total, first_row=2):
+    """รวม changeset หลายชุดที่ส่งต่อกันตามลำดับให้เป็นชุดเดียวที่ให้ผลเหมือนกัน
+
+    `total` คือจำนวนแถวของ Sheet ก่อน changeset แรก rowIndex ใน changeset ถัดไปอ้างอิงผลของชุดก่อนหน้า
+    ผลลัพธ์อ้างอิง rowIndex ของ Sheet ก่อน changeset แรก (แถวใหม่ต่อท้ายเสมอ ลำดับของแถวจึงคงเดิม)
+    """
+    # ตัวตนของแถวตามตำแหน่งปัจจุบัน: >= 0 คือแถวเดิม (ลำดับก่อน changeset แรก), < 0 คือแถวที่เพิ่มใหม่
+    ids = np.arange(total, dtype='int64')
+    contents = {}
+    new_count = 0
+    for changeset in changesets:
+        for update in changeset['updates']:
+            ident = int(ids[int(update[ROW_ID]) - first_row])
+            contents[ident] = {k: v for k, v in update.items() if k != ROW_ID}
+        if changeset['deletes']:
+            positions = np.asarray(changeset['deletes'], dtype='int64') - first_row
+            for ident in ids[positions].tolist():
+                contents.pop(ident, None)
+            ids = np.delete(ids, positions)
+        inserts = changeset['inserts']
+        if inserts:
+            new_ids = -np.arange(new_count + 1, new_count + len(inserts) + 1, dtype='int64')
+            contents.update(zip(new_ids.tolist(), inserts))
+            ids = np.concatenate([ids, new_ids])
+            new_count += len(inserts)
+
+    remaining = ids[ids >= 0]
+    return {
+        'inserts': [contents[ident] for ident in ids[ids < 0].tolist()],
+        'updates': [
+            dict(contents[ident], **{ROW_ID: ident + first_row})
+            for ident in sorted(i for i in contents if i >= 0)
+        ],
+        'deletes': (np.setdiff1d(np.arange(total, dtype='int64'), remaining) + first_row).tolist(),
+    }
@@ -0,0 +1,434 @@
+"""การสร้าง DataFrame ของข้อมูลขั้นตอนการทำงานแบบทีละหน้า (paged)
+
+แต่ละหน้าที่ได้จาก Apps Script จะถูกแปลงเป็นคอลัมน์ที่กำหนด dtype ไว้แล้วทันที
+แล้วทิ้ง list ของ dict ของหน้านั้นไป เพื่อไม่ให้ต้องเก็บข้อมูลดิบทั้ง Sheet ไว้ในหน่วยความจำพร้อมกัน
+
+รูปแบบการตอบกลับของ action 'read' เมื่อส่ง offset/limit:
+    {'status': 'success', 'data': [...], 'nextOffset': 500 | None, 'total': 1234, 'version': '...'}
+หากไม่มีคีย์ 'nextOffset' ถือว่า Apps Script ส่งข้อมูลทั้งหมดมาในครั้งเดียว
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+from log_changes import ROW_ID, apply_ack
+
+try:
+    import pyarrow as pa  # ติดตั้งมาพร้อม streamlit
+    TEXT_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    pa = None
+    TEXT_DTYPE = pd.StringDtype()
+
+# จำนวนแถวต่อ chunk ของคอลัมน์ข้อความ Arrow (การแก้ไขเซลล์สร้างใหม่เฉพาะ chunk ที่มีเซลล์นั้น)
+TEXT_CHUNK_ROWS = 4096
+
+
+def records_to_frame(records, key_map):
+    """แปลง records (คีย์ API) เป็น DataFrame คอลัมน์ภาษาไทยพร้อม dtype ที่กำหนด"""
+    columns = {}
+    for column, key in key_map.items():
+        values = ['' if r.get(key) is None else str(r.get(key)) for r in records]
+        columns[column] = pd.array(values, dtype=TEXT_DTYPE)
+    row_ids = pd.to_numeric(pd.Series([r.get(ROW_ID) for r in records], dtype=object), errors='coerce')
+    columns[ROW_ID] = pd.array(row_ids, dtype='Int64')
+    return pd.DataFrame(columns)
+
+
+def compact_log_frame(df, category_columns):
+    """แปลงคอลัมน์ที่มีค่าซ้ำกันมาก (เช่น กลุ่มงาน/ตำแหน่งงาน) เป็น categorical เพื่อลดหน่วยความจำ
+
+    คอลัมน์ข้อความอื่นเก็บเป็น string ที่ใช้ Arrow (ถ้ามี pyarrow)
+    """
+    converted = {}
+    for column in df.columns:
+        if column in category_columns:
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                converted[column] = df[column].fillna('').astype(str).astype('category')
+        elif df[column].dtype == object or (isinstance(df[column].dtype, pd.StringDtype) and df[column].dtype != TEXT_DTYPE):
+            converted[column] = df[column].fillna('').astype(TEXT_DTYPE)
+    return df.assign(**converted) if converted else df
+
+
+def _decode_categorical(series):
+    """แปลง categorical เป็นข้อความด้วยการ take จาก categories (เร็วกว่า astype ทีละค่า)"""
+    categories = pd.array(series.cat.categories.astype(str), dtype=TEXT_DTYPE)
+    values = categories.take(series.cat.codes.to_numpy(), allow_fill=True)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def editor_frame(df, category_columns):
+    """แปลงคอลัมน์ categorical กลับเป็นข้อความสำหรับ st.data_editor (ให้พิมพ์ค่าใหม่ได้อิสระ)"""
+    converted = {
+        column: _decode_categorical(df[column])
+        for column in category_columns
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype)
+    }
+    return df.assign(**converted) if converted else df
+
+
+def _split_chunks(chunked):
+    """แบ่ง chunk ที่ยาวเกิน TEXT_CHUNK_ROWS เป็น slice ย่อย (zero-copy)"""
+    chunks = []
+    for chunk in chunked.chunks:
+        for start in range(0, max(len(chunk), 1), TEXT_CHUNK_ROWS):
+            chunks.append(chunk.slice(start, TEXT_CHUNK_ROWS))
+    return chunks
+
+
+def replace_text(df, labels, column, values):
+    """เขียนค่า `values` ลงคอลัมน์ข้อความ `column` ของแถว `labels`
+
+    คอลัมน์ Arrow เขียนทับในที่เดิมไม่ได้ (`df.loc` สร้างคอลัมน์ใหม่ทั้งคอลัมน์)
+    จึงแบ่งคอลัมน์เป็น chunk ละ TEXT_CHUNK_ROWS แถวและสร้างใหม่เฉพาะ chunk ที่มีแถวที่แก้ไข
+    chunk อื่นใช้ buffer เดิมร่วมกัน
+    """
+    if pa is None or df[column].dtype != TEXT_DTYPE:
+        df.loc[labels, column] = values
+        return df
+    positions = df.index.get_indexer(labels)
+    values = pd.Series(values, dtype=object)
+    values = values.where(values.notna(), None).tolist()
+    chunked = df[column].array.__arrow_array__()
+    chunks = _split_chunks(chunked)
+    starts = [0]
+    for chunk in chunks:
+        starts.append(starts[-1] + len(chunk))
+
+    pending = {}
+    for position, value in zip(positions.tolist(), values):
+        i = bisect_right(starts, position) - 1
+        pending.setdefault(i, {})[position - starts[i]] = value
+    for i, cells in pending.items():
+        chunk = chunks[i].to_pylist()
+        for offset, value in cells.items():
+            chunk[offset] = value
+        chunks[i] = pa.array(chunk, type=chunks[i].type)
+
+    df[column] = pd.Series(pd.arrays.ArrowStringArray(pa.chunked_array(chunks, type=chunked.type)),
+                           index=df.index, name=column)
+    return df
+
+
+def empty_log_frame(key_map):
+    """DataFrame ว่างที่มีคอลัมน์และ dtype เหมือนข้อมูลจริง"""
+    return records_to_frame([], key_map)
+
+
+def drop_blank_rows(df, key_column):
+    """กรองแถวที่คอลัมน์หลัก (เช่น 'กลุ่มงาน') ว่างออก"""
+    return df[df[key_column].fillna('').astype(str).str.strip() != ''].reset_index(drop=True)
+
+
+def apply_changeset(df, changeset, ack, key_map, key_column):
+    """ข้อมูลหลัง Sheet บันทึก changeset แล้ว (ผลเหมือนอ่าน Sheet ใหม่ทั้งชุด) คอลัมน์ categorical กลับเป็นข้อความ
+
+    คืนค่า None เมื่อ changeset อ้างอิง rowIndex ที่ไม่มีใน df
+    """
+    current = editor_frame(df, [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)])
+    row_ids = pd.Index(current[ROW_ID])
+    updates = records_to_frame(changeset['updates'], key_map)
+    positions = row_ids.get_indexer(updates[ROW_ID])
+    deleted = row_ids.get_indexer(pd.Index(changeset['deletes'], dtype='Int64'))
+    if (positions < 0).any() or (deleted < 0).any():
+        return None
+
+    changed = {}
+    for column in key_map:
+        values = current[column].to_numpy(dtype=object, na_value='')
+        values[positions] = updates[column].to_numpy(dtype=object)
+        if column == key_column:
+            # แถวที่ถูกลบ: ล้างคอลัมน์หลักให้ apply_ack ตัดออก
+            values[deleted] = ''
+        changed[column] = pd.array(values, dtype=TEXT_DTYPE)
+    current = current.assign(**changed)
+
+    inserts = records_to_frame(changeset['inserts'], key_map)
+    current = pd.concat([current, inserts.astype(current.dtypes.to_dict())], ignore_index=True)
+    return apply_ack(current, changeset, ack, key_column)
+
+
+def has_more_pages(result):
+    """ตรวจสอบว่าผลการอ่านมีหน้าถัดไปหรือไม่"""
+    return result.get('nextOffset') is not None
+
+
+class PagedLogLoader:
+    """โหลดหน้าที่เหลือของ Sheet ใน Background Thread
+
+    `fetch_page(offset)` ต้องคืนผล JSON ของหน้านั้น (หรือ raise เมื่อผิดพลาด)
+    เมื่อทราบ `total` และ `page_size` จะขอหน้าถัด ๆ ไปพร้อมกันสูงสุด `concurrency` คำขอ
+    (latency ของ Apps Script ต่อคำขอสูง การรอทีละหน้าทำให้เวลารวมเพิ่มตามจำนวนหน้า)
+    UI อ่านสถานะผ่าน `done`, `error`, `rows_loaded` และรับผลด้วย `frame()` เมื่อโหลดเสร็จ
+    """
+
+    def __init__(self, fetch_page, start_offset, key_map, key_column, seed=None, total=None, version=None,
+                 page_size=None, concurrency=1):
+        self._fetch_page = fetch_page
+        self._offset = start_offset
+        self._key_map = key_map
+        self._key_column = key_column
+        self._page_size = page_size
+        self._concurrency = concurrency
+        self.total = total
+        self.version = version
+        self.seed_rows = len(seed) if seed is not None else 0
+        self.rows_loaded = self.seed_rows
+        self.done = False
+        self.error = None
+        self._has_seed = seed is not None
+        self._chunks = [seed] if self._has_seed else []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='paged-log-loader', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            offset = self._offset
+            if self._concurrency > 1 and self.total is not None and self._page_size:
+                offset = self._fetch_concurrently(offset)
+            # โหลดทีละหน้าตาม nextOffset (เมื่อไม่ทราบจำนวนแถว หรือ Sheet มีแถวเพิ่มระหว่างโหลด)
+            while offset is not None:
+                offset = self._add_page(self._fetch_page(offset))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+    def _fetch_concurrently(self, start):
+        """ขอทุกหน้าจนถึง total พร้อมกัน (ค้างไว้ไม่เกิน concurrency หน้า) และรวมผลตามลำดับหน้า
+
+        คืน nextOffset ของหน้าสุดท้าย
+        """
+        offsets = iter(range(start, self.total, self._page_size))
+        executor = ThreadPoolExecutor(self._concurrency, thread_name_prefix='paged-log-page')
+        try:
+            pending = deque(executor.submit(self._fetch_page, o) for o in islice(offsets, self._concurrency))
+            offset = start
+            while pending:
+                result = pending.popleft().result()
+                following = next(offsets, None)
+                if following is not None:
+                    pending.append(executor.submit(self._fetch_page, following))
+                offset = self._add_page(result)
+            return offset
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _add_page(self, result):
+        """แปลงผลของหนึ่งหน้าเป็นคอลัมน์แล้วต่อท้าย คืน nextOffset"""
+        if not result or result.get('status') != 'success':
+            raise RuntimeError(result.get('message') if result else 'API Error')
+        chunk = drop_blank_rows(records_to_frame(result.get('data', []), self._key_map), self._key_column)
+        with self._lock:
+            self._chunks.append(chunk)
+            self.rows_loaded += len(chunk)
+        return result.get('nextOffset')
+
+    def frame(self):
+        """รวมทุกหน้าที่โหลดแล้ว (รวมหน้าแรกที่ส่งมาเป็น seed) เป็น DataFrame เดียว"""
+        with self._lock:
+            return self._concat(self._chunks)
+
+    def remaining_frame(self):
+        """รวมเฉพาะหน้าที่โหลดใน Background (ไม่รวม seed)"""
+        with self._lock:
+            return self._concat(self._chunks[1:] if self._has_seed else self._chunks)
+
+    def _concat(self, chunks):
+        if not chunks:
+            return empty_log_frame(self._key_map)
+        return pd.concat(chunks, ignore_index=True)
+
+
+class LogSnapshot:
+    """ข้อมูลขั้นตอนการทำงานล่าสุดระดับ Process (ใช้ร่วมกันทุก Session) โหลดและรีเฟรชใน Background Thread
+
+    `fetch_page(offset, if_version)` ต้องคืนผล JSON ของหน้านั้น และ `prepare(df)` แปลงข้อมูลก่อนแจกให้ Session
+    ระหว่างโหลดครั้งแรก (หรือหลัง invalidate) current() คืนหน้าแรกพร้อม PagedLogLoader ของหน้าที่เหลือ
+    การรีเฟรชตามรอบส่ง ifVersion ไปด้วย และแทนที่ข้อมูลเดิมเมื่อโหลดครบทุกหน้าแล้วเท่านั้น
+    การบันทึกของ Session ปรับข้อมูลที่แจกอยู่ด้วย apply() แทนการโหลดทั้ง Sheet ใหม่
+    (เป็นแคชการอ่านระดับ Process ของ Sheet นี้ สถิติการโหลด/notModified/apply ดูได้จาก stats())
+    """
+
+    def __init__(self, fetch_page, key_map, key_column, prepare=None, interval=60.0, retry_interval=5.0,
+                 concurrency=1):
+        self._fetch_page = fetch_page
+        self._key_map = key_map
+        self._key_column = key_column
+        self._prepare = prepare or (lambda df: df)
+        self._concurrency = concurrency
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.loaded_at = None
+        self.error = None
+        # True เมื่อข้อมูลที่แจกอยู่อาจเก่ากว่า Sheet (รอการรีเฟรชที่สั่งด้วย refresh())
+        self.stale = False
+        self._counts = {'loads': 0, 'not_modified': 0, 'applied': 0, 'refreshes': 0, 'invalidations': 0}
+        self._state = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log-snapshot', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def current(self):
+        """(frame, loader, version) ล่าสุด หรือ None เมื่อยังไม่มีข้อมูล (loader เป็น None เมื่อ frame ครบทุกหน้าแล้ว)"""
+        with self._lock:
+            return self._state
+
+    def invalidate(self):
+        """ข้อมูลใน Sheet เปลี่ยนแล้ว: หยุดแจกข้อมูลเดิมและโหลดใหม่ทันที"""
+        with self._lock:
+            self._generation += 1
+            self._state = None
+            self._counts['invalidations'] += 1
+        self._wake.set()
+
+    def refresh(self):
+        """ยกเลิกการโหลดที่ทำอยู่ (อาจได้ข้อมูลก่อนการบันทึกล่าสุด) และรีเฟรชทันทีโดยยังแจกข้อมูลเดิมระหว่างโหลด"""
+        with self._lock:
+            self._generation += 1
+            self.stale = self._state is not None
+            self._counts['refreshes'] += 1
+        self._wake.set()
+
+    def apply(self, changeset, ack, base_version):
+        """ปรับข้อมูลที่แจกอยู่ตาม changeset ที่ Sheet ตอบรับแล้ว (`ack` มี inserted/version)
+
+        ใช้ได้เมื่อข้อมูลที่แจกอยู่ครบทุกหน้าและเป็นชุด `base_version` เท่านั้น
+        กรณีอื่นจะรีเฟรชแทน (refresh) คืน True เมื่อปรับข้อมูลได้
+        """
+        state = self.current()
+        if (state is None or state[1] is not None or base_version is None or state[2] != base_version
+                or ack.get('version') is None):
+            self.refresh()
+            return False
+        frame = apply_changeset(state[0], changeset, ack, self._key_map, self._key_column)
+        frame = self._prepare(frame) if frame is not None else None
+        with self._lock:
+            if frame is not None and self._state is state:
+                # ยกเลิกการรีเฟรชที่กำลังโหลดข้อมูลชุดก่อนการบันทึกนี้
+                self._generation += 1
+                self._state = (frame, None, ack['version'])
+                self.loaded_at = time.time()
+                self.stale = False
+                self._counts['applied'] += 1
+                return True
+        self.refresh()
+        return False
+
+    def stats(self):
+        """สถานะสำหรับแผงผู้ดูแลระบบ: version/จำนวนแถวที่แจกอยู่ อายุของข้อมูล และจำนวนครั้งที่โหลด/ปรับข้อมูล"""
+        with self._lock:
+            state, loaded_at = self._state, self.loaded_at
+            stats = dict(self._counts, stale=self.stale, error=None if self.error is None else str(self.error))
+        stats.update(
+            version=state[2] if state else None,
+            rows=len(state[0]) if state else 0,
+            complete=state is not None and state[1] is None,
+            age_seconds=None if loaded_at is None else round(time.time() - loaded_at, 1),
+        )
+        return stats
+
+    def wait(self, timeout=None):
+        """รอจนมีข้อมูลครบทุกหน้า คืน True เมื่อพร้อม"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self.current()
+            if state is not None and state[1] is None:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def _publish(self, generation, state, partial=False):
+        with self._lock:
+            if generation != self._generation:
+                # ถูก invalidate ระหว่างโหลด: ข้อมูลชุดนี้อาจเก่ากว่าที่บันทึกล่าสุด
+                return False
+            if partial and self._state is not None:
+                return True
+            self._state = state
+            if not partial:
+                self.loaded_at = time.time()
+                self.error = None
+                self.stale = False
+                self._counts['loads'] += 1
+            return True
+
+    def _refresh(self):
+        with self._lock:
+            generation, previous = self._generation, self._state
+        complete = previous is not None and previous[1] is None
+        result = self._fetch_page(0, previous[2] if complete else None)
+        if result and result.get('status') == 'notModified' and complete:
+            with self._lock:
+                if generation == self._generation:
+                    self.loaded_at = time.time()
+                    self.error = None
+                    self.stale = False
+                    self._counts['not_modified'] += 1
+            return
+        if not result or result.get('status') != 'success':
+            raise RuntimeError(result.get('message') if result else 'API Error')
+
+        first = self._prepare(drop_blank_rows(records_to_frame(result.get('data', []), self._key_map), self._key_column))
+        version = result.get('version')
+        if not has_more_pages(result):
+            self._publish(generation, (first, None, version))
+            return
+
+        loader = PagedLogLoader(
+            lambda offset: self._fetch_page(offset, None),
+            result['nextOffset'],
+            self._key_map,
+            self._key_column,
+            seed=first,
+            total=result.get('total'),
+            version=version,
+            # หน้าแรกเริ่มที่ offset 0 จึงได้ขนาดหน้าจาก nextOffset
+            page_size=result['nextOffset'],
+            concurrency=self._concurrency
+        ).start()
+        partial = (first, loader, version)
+        if not self._publish(generation, partial, partial=True):
+            return
+        loader.join()
+        if loader.error is not None:
+            with self._lock:
+                if self._state is partial:
+                    self._state = None
+            raise loader.error
+        self._publish(generation, (self._prepare(loader.frame()), None, version))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._refresh()
+                delay = self.interval
+            except Exception as e:
+                self.error = e
+                delay = self.retry_interval
+            # invalidate() ระหว่างโหลดจะปลุกให้โหลดใหม่ทันที
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
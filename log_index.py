@@ -0,0 +1,125 @@
+"""ดัชนีกลุ่มงาน → แถว สำหรับตัวกรองและการรวมข้อมูลที่แก้ไขในแท็บ 2
+
+ดัชนีอ้างอิงแถวด้วย index label ของ log_data (label ไม่เปลี่ยนเมื่อมีการลบแถว และแถวใหม่ได้ label ที่มากกว่าเดิมเสมอ
+ลำดับของ label จึงเท่ากับลำดับของแถวในตาราง) และปรับปรุงทีละแถวเมื่อมีการเพิ่ม/แก้ไข/ลบ
+"""
+import pandas as pd
+
+from log_frame import replace_text
+
+
+def _group_keys(series):
+    """ค่ากลุ่มงานที่ตัดช่องว่างแล้ว (ค่าว่าง/NaN เป็น '') สำหรับใช้เป็นคีย์ของดัชนี"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.Index(series.cat.categories.astype(str).str.strip().tolist() + [''])
+        # code -1 (ค่าว่าง) ชี้ไปที่ '' ตัวสุดท้าย
+        return categories.take(series.cat.codes.to_numpy())
+    return pd.Index(series.astype(object).where(series.notna(), '').astype(str).str.strip())
+
+
+def _group_key(value):
+    return '' if value is None or pd.isna(value) else str(value).strip()
+
+
+class GroupIndex:
+    """เก็บ label ของแถวในแต่ละกลุ่มงาน"""
+
+    def __init__(self, series):
+        self._rows = {
+            key: set(labels)
+            for key, labels in series.index.groupby(_group_keys(series)).items()
+        }
+
+    def options(self):
+        """กลุ่มงานที่ไม่ว่างและยังมีแถวอยู่ (เรียงลำดับ) สำหรับ Dropdown"""
+        return sorted(key for key, labels in self._rows.items() if key and labels)
+
+    def labels(self, group):
+        """label ของแถวในกลุ่มงานตามลำดับในตาราง"""
+        return sorted(self._rows.get(_group_key(group), ()))
+
+    def add(self, label, group):
+        self._rows.setdefault(_group_key(group), set()).add(label)
+
+    def discard(self, label, group):
+        self._rows.get(_group_key(group), set()).discard(label)
+
+    def move(self, label, old_group, new_group):
+        self.discard(label, old_group)
+        self.add(label, new_group)
+
+
+def _text(values):
+    return values.astype(object).where(values.notna(), '').astype(str)
+
+
+def _cells(values):
+    """ค่าของคอลัมน์เป็น numpy object array (ค่าว่างเป็น '') สำหรับเปรียบเทียบทีละเซลล์"""
+    return values.to_numpy(dtype=object, na_value='')
+
+
+def _align_categories(df, values, category_columns):
+    """เพิ่ม categories ใหม่ให้คอลัมน์ categorical ของ df และแปลง values ให้ใช้ dtype เดียวกัน"""
+    for column in category_columns:
+        if column not in values.columns or not isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        incoming = _text(values[column])
+        missing = pd.Index(incoming.unique()).difference(df[column].cat.categories)
+        if len(missing):
+            df[column] = df[column].cat.add_categories(missing)
+        values[column] = incoming.astype(df[column].dtype)
+    return df, values
+
+
+def append_rows(df, rows, index, key_column, category_columns):
+    """ต่อท้ายแถวใหม่ด้วย label ที่ไม่ซ้ำ และเพิ่มแถวเหล่านั้นเข้าดัชนี"""
+    if rows.empty:
+        return df
+    start = int(df.index.max()) + 1 if len(df) else 0
+    rows = rows.reindex(columns=df.columns).set_axis(pd.RangeIndex(start, start + len(rows)))
+    rows = rows.astype({c: df[c].dtype for c in df.columns if c not in category_columns})
+    df, rows = _align_categories(df, rows, category_columns)
+    for label, group in rows[key_column].items():
+        index.add(label, group)
+    return pd.concat([df, rows])
+
+
+def merge_group_edits(df, shown, edited, index, key_column, category_columns):
+    """รวมผลจาก st.data_editor (`edited`) กลับเข้า `df` โดยคงตำแหน่งเดิมของแถว
+
+    `shown` คือข้อมูลที่ส่งให้ Editor แถวที่แก้ไขจะถูกเขียนทับในตำแหน่งเดิม แถวที่ถูกลบจะถูกตัดออก
+    และแถวที่เพิ่มใหม่จะต่อท้ายตาราง (label ของแถวใหม่จาก Editor อาจซ้ำกับกลุ่มอื่นจึงกำหนดใหม่เสมอ)
+
+    คอลัมน์ข้อความสร้างใหม่เฉพาะ chunk ที่มีเซลล์ที่แก้ไข (ดู replace_text) ส่วนคอลัมน์ categorical
+    ที่ได้ค่าใหม่ซึ่งยังไม่มีใน categories จะคัดลอก codes ทั้งคอลัมน์หนึ่งครั้ง (add_categories)
+    """
+    columns = [c for c in shown.columns if c in edited.columns]
+    existing = edited.index.isin(shown.index)
+    kept = edited.index[existing]
+
+    # 1. แก้ไขเฉพาะเซลล์ที่มีค่าเปลี่ยนไป (ทีละคอลัมน์ เพื่อไม่ต้องเขียนคอลัมน์ที่ไม่เปลี่ยน)
+    after, before = edited.loc[kept, columns], shown.loc[kept, columns]
+    for column in columns:
+        diff = _cells(after[column]) != _cells(before[column])
+        if not diff.any():
+            continue
+        changed = kept[diff]
+        updates = after.loc[changed, [column]]
+        df, updates = _align_categories(df, updates, category_columns)
+        if column == key_column:
+            for label in changed:
+                index.move(label, shown.at[label, key_column], updates.at[label, key_column])
+        if column in category_columns:
+            df.loc[changed, column] = updates[column]
+        else:
+            df = replace_text(df, changed, column, updates[column])
+
+    # 2. ลบแถวที่ไม่อยู่ในผลของ Editor แล้ว
+    deleted = shown.index.difference(kept)
+    if len(deleted):
+        for label in deleted:
+            index.discard(label, shown.at[label, key_column])
+        df = df.drop(index=deleted)
+
+    # 3. ต่อท้ายแถวใหม่
+    return append_rows(df, edited[~existing], index, key_column, category_columns)
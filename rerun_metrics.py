@@ -0,0 +1,251 @@
+"""วัดเวลา/หน่วยความจำของแต่ละส่วนในการรันสคริปต์ Streamlit หนึ่งรอบ (rerun) และการเรียก HTTP
+
+- section(name): จับเวลาส่วนของโค้ด (และหน่วยความจำที่เพิ่มขึ้นเมื่อเปิด tracemalloc)
+- begin_rerun/end_rerun: เก็บเวลารวมและรายละเอียดของแต่ละ rerun (ล่าสุด `history` รอบ)
+- observe_http: callback สำหรับ SheetClient(observer=...) เก็บ latency และจำนวน byte ต่อ action
+- ส่งออกเป็น JSON หรือ Prometheus text format (ใช้กับ textfile collector ได้)
+
+ผู้เรียกต้องเรียก end_rerun ใน finally (st.rerun()/st.stop() จบสคริปต์ด้วย exception) มิฉะนั้น cProfile จะเปิดค้าง
+"""
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# ขอบบนของ bucket ใน histogram (วินาที)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """histogram สะสมแบบ Prometheus (ไม่ปลอดภัยต่อหลาย Thread ผู้เรียกต้องล็อกเอง)"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': 1000 * self.sum / self.count if self.count else 0.0,
+            'max_ms': 1000 * self.max,
+            'last_ms': 1000 * self.last,
+        }
+
+
+class RerunRecord:
+    """ข้อมูลของ rerun หนึ่งรอบ"""
+
+    def __init__(self, profile=False):
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.sections = []
+        self.profiler = None
+        if profile:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # มี profiler อื่นทำงานอยู่แล้ว (เช่น Session อื่นเปิด cProfile พร้อมกัน)
+                self.profiler = None
+
+    def profile_text(self, limit=30):
+        """ผล cProfile เรียงตาม cumulative time (None เมื่อไม่ได้เปิด)"""
+        if self.profiler is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+class MetricsRegistry:
+    """ตัวเก็บค่าวัดระดับ Process (ใช้ร่วมกันทุก Session และ Background thread)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, history=50):
+        self.buckets = buckets
+        self.history = deque(maxlen=history)
+        self._sections = {}
+        self._reruns = Histogram(buckets)
+        self._http = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- การจับเวลา ---
+
+    @contextmanager
+    def section(self, name):
+        """จับเวลาส่วนของโค้ดและบันทึกลง rerun ปัจจุบันของ Thread นี้ (ถ้ามี)"""
+        tracing = tracemalloc.is_tracing()
+        memory_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0] - memory_before if tracing else None
+            with self._lock:
+                self._sections.setdefault(name, Histogram(self.buckets)).observe(elapsed)
+            record = getattr(self._local, 'rerun', None)
+            if record is not None:
+                record.sections.append({'section': name, 'ms': 1000 * elapsed, 'memory_bytes': memory})
+
+    def timed(self, name):
+        """decorator: จับเวลาทุกครั้งที่เรียกฟังก์ชันเป็น section ชื่อ `name`"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.section(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def begin_rerun(self, profile=False):
+        record = RerunRecord(profile=profile)
+        self._local.rerun = record
+        return record
+
+    def end_rerun(self, record):
+        """ปิด rerun: หยุด cProfile และเก็บสรุปไว้ในประวัติ"""
+        if record.profiler is not None:
+            record.profiler.disable()
+        elapsed = time.perf_counter() - record.start
+        self._local.rerun = None
+        with self._lock:
+            self._reruns.observe(elapsed)
+            self.history.append({
+                'started_at': record.started_at,
+                'ms': 1000 * elapsed,
+                'sections': record.sections,
+            })
+        return elapsed
+
+    def observe_http(self, action, method, seconds, sent_bytes, received_bytes, status):
+        """callback ของ SheetClient: บันทึกการเรียก HTTP หนึ่งครั้ง (รวมครั้งที่ลองใหม่)"""
+        with self._lock:
+            stats = self._http.get(action)
+            if stats is None:
+                stats = self._http[action] = {
+                    'latency': Histogram(self.buckets), 'sent_bytes': 0, 'received_bytes': 0,
+                    'errors': 0, 'method': method,
+                }
+            stats['latency'].observe(seconds)
+            stats['sent_bytes'] += sent_bytes
+            stats['received_bytes'] += received_bytes
+            if status is None or status >= 400:
+                stats['errors'] += 1
+
+    # --- การส่งออก ---
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'reruns': self._reruns.summary(),
+                'sections': {name: h.summary() for name, h in sorted(self._sections.items())},
+                'http': {
+                    action: dict(
+                        s['latency'].summary(), method=s['method'], sent_bytes=s['sent_bytes'],
+                        received_bytes=s['received_bytes'], errors=s['errors']
+                    )
+                    for action, s in sorted(self._http.items())
+                },
+                'history': list(self.history),
+            }
+
+    def to_json(self, **extra):
+        return json.dumps(dict(self.snapshot(), **extra), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix='risk_app'):
+        """ค่าวัดทั้งหมดใน Prometheus text exposition format"""
+        lines = []
+
+        def histogram(name, help_text, items):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for labels, h in items:
+                sep = ',' if labels else ''
+                for bound, count in h.cumulative():
+                    lines.append(f'{prefix}_{name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+                lines.append(f'{prefix}_{name}_bucket{{{labels}{sep}le="+Inf"}} {h.count}')
+                braces = f"{{{labels}}}" if labels else ''
+                lines.append(f"{prefix}_{name}_sum{braces} {h.sum:.6f}")
+                lines.append(f"{prefix}_{name}_count{braces} {h.count}")
+
+        def counter(name, help_text, items):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in items:
+                lines.append(f"{prefix}_{name}{{{labels}}} {value}")
+
+        with self._lock:
+            histogram('rerun_seconds', 'Duration of a full script rerun.', [('', self._reruns)])
+            histogram('section_seconds', 'Duration of a named section within a rerun.', [
+                (f'section="{_label(name)}"', h) for name, h in sorted(self._sections.items())
+            ])
+            http = sorted(self._http.items())
+            histogram('http_request_seconds', 'Apps Script HTTP request latency.', [
+                (f'action="{_label(action)}"', s['latency']) for action, s in http
+            ])
+            counter('http_bytes_total', 'Apps Script HTTP payload bytes.', [
+                (f'action="{_label(action)}",direction="{direction}"', s[f'{direction}_bytes'])
+                for action, s in http for direction in ('sent', 'received')
+            ])
+            counter('http_errors_total', 'Apps Script HTTP requests that failed.', [
+                (f'action="{_label(action)}"', s['errors']) for action, s in http
+            ])
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path, prefix='risk_app'):
+        """เขียน Prometheus text ลงไฟล์แบบ atomic (สำหรับ node_exporter textfile collector)"""
+        tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp, path)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def set_memory_tracing(enabled, frames=1):
+    """เปิด/ปิด tracemalloc (มีผลทั้ง Process)"""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def top_allocations(limit=15):
+    """ตำแหน่งในโค้ดที่ใช้หน่วยความจำมากที่สุด (ต้องเปิด tracemalloc ก่อน)"""
+    if not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+    return [
+        {'location': f"{s.traceback[0].filename}:{s.traceback[0].lineno}", 'kib': s.size / 1024, 'count': s.count}
+        for s in stats
+    ]
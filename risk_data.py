@@ -0,0 +1,63 @@
+"""ข้อมูลตารางประเมินความเสี่ยงของแต่ละหน่วยงาน (ใช้ได้ทั้งใน UI และงานแบบ batch โดยไม่ต้องใช้ Streamlit)"""
+from pathlib import Path
+
+import pandas as pd
+
+RISK_COLUMNS = ['กิจกรรม', 'อันตรายที่อาจเกิดขึ้น', 'มาตรการควบคุมปัจจุบัน', 'L', 'C']
+# คอลัมน์ L/C หลังใช้มาตรการควบคุม (ถ้ามี) ใช้คำนวณความเสี่ยงคงเหลือ
+RESIDUAL_L = 'L หลังควบคุม'
+RESIDUAL_C = 'C หลังควบคุม'
+RISK_TABLE_SUFFIXES = ('.csv', '.parquet')
+
+
+# จำลองข้อมูลประเมินความเสี่ยง (Mock Data)
+def load_risk_mock_data():
+    """จำลองข้อมูลความเสี่ยงตามหน่วยงาน (ไม่ได้เชื่อมต่อ API)"""
+    return {
+        "แผนกการผลิต": pd.DataFrame({
+            'กิจกรรม': ["ยกกล่องหนัก", "ใช้เครื่องจักรเจาะ"],
+            'อันตรายที่อาจเกิดขึ้น': ["บาดเจ็บหลัง/กล้ามเนื้อ", "นิ้วติด/เศษโลหะกระเด็น"],
+            'มาตรการควบคุมปัจจุบัน': ["ใช้รถเข็นหรือยกสองคน", "สวมถุงมือและแว่นตานิรภัย, มีการ์ดป้องกัน"],
+            'L': [3, 2], 'C': [4, 5]
+        }),
+        "แผนกบัญชี": pd.DataFrame({
+            'กิจกรรม': ["นั่งทำงานหน้าคอมพิวเตอร์นาน"],
+            'อันตรายที่อาจเกิดขึ้น': ["ปวดตา/ปวดหลัง/ออฟฟิศซินโดรม"],
+            'มาตรการควบคุมปัจจุบัน': ["พักสายตา 20-20-20, เก้าอี้ Ergonomic"],
+            'L': [4], 'C': [2]
+        }),
+    }
+
+
+def read_risk_table(path):
+    """อ่านตารางความเสี่ยงหนึ่งหน่วยงานจากไฟล์ CSV หรือ Parquet"""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def load_risk_tables(source=None):
+    """ตารางความเสี่ยงของทุกหน่วยงานเป็น dict {ชื่อหน่วยงาน: DataFrame} (source เหมือน risk_table_sources)"""
+    return {
+        name: read_risk_table(table) if isinstance(table, Path) else table
+        for name, table in risk_table_sources(source)
+    }
+
+
+def risk_table_sources(source=None):
+    """รายการ (ชื่อหน่วยงาน, ตาราง หรือ path ของไฟล์) ของทุกหน่วยงาน
+
+    source=None ใช้ข้อมูลจำลอง, หากเป็นโฟลเดอร์จะใช้ทุกไฟล์ .csv/.parquet (ชื่อไฟล์คือชื่อหน่วยงาน)
+    คืน path แทน DataFrame เพื่อให้ worker อ่านไฟล์เองโดยไม่ต้องโหลดทุกหน่วยงานไว้ในหน่วยความจำพร้อมกัน
+    """
+    if source is None:
+        return list(load_risk_mock_data().items())
+    directory = Path(source)
+    if not directory.is_dir():
+        raise FileNotFoundError(f"ไม่พบโฟลเดอร์ตารางความเสี่ยง: {directory}")
+    return [
+        (path.stem, path)
+        for path in sorted(directory.iterdir())
+        if path.suffix in RISK_TABLE_SUFFIXES
+    ]
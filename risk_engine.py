@@ -0,0 +1,80 @@
+"""คำนวณระดับความเสี่ยง (L x C) แบบ vectorized ด้วย NumPy
+
+ระดับความเสี่ยง (band) กำหนดด้วยตาราง lookup ขนาด L x C จึงใช้ได้ทั้งแบบเกณฑ์คะแนน (เช่น 4/8/15)
+และเมทริกซ์ที่กำหนดเองทีละช่อง ฟังก์ชันทั้งหมดไม่แก้ไข DataFrame ที่ส่งเข้ามา
+"""
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMN = 'ระดับความเสี่ยง (L x C)'
+BAND_COLUMN = 'ระดับ'
+
+
+class RiskMatrix:
+    """เมทริกซ์ความเสี่ยง: lookup[L-1, C-1] คือลำดับของ band ใน `bands`"""
+
+    def __init__(self, lookup, bands):
+        self.lookup = np.asarray(lookup, dtype=np.int8)
+        self.bands = list(bands)
+        if self.lookup.ndim != 2:
+            raise ValueError("lookup ต้องเป็นตาราง 2 มิติ (L x C)")
+        if self.lookup.min() < 0 or self.lookup.max() >= len(self.bands):
+            raise ValueError("ค่าใน lookup ต้องอยู่ในช่วงลำดับของ bands")
+
+    @classmethod
+    def from_thresholds(cls, thresholds, bands, size=5):
+        """สร้างเมทริกซ์ size x size จากเกณฑ์คะแนนขั้นต่ำของแต่ละ band (ไม่รวม band แรก)"""
+        if len(thresholds) != len(bands) - 1:
+            raise ValueError("จำนวนเกณฑ์ต้องน้อยกว่าจำนวน band อยู่ 1")
+        scores = np.outer(np.arange(1, size + 1), np.arange(1, size + 1))
+        return cls(np.searchsorted(np.asarray(thresholds), scores, side='right'), bands)
+
+    @property
+    def shape(self):
+        return self.lookup.shape
+
+    def band_codes(self, likelihood, consequence):
+        """ลำดับ band ของแต่ละแถว (-1 เมื่อ L/C ว่างหรืออยู่นอกเมทริกซ์)"""
+        l_idx = np.asarray(likelihood, dtype=np.float64) - 1
+        c_idx = np.asarray(consequence, dtype=np.float64) - 1
+        valid = (
+            np.isfinite(l_idx) & np.isfinite(c_idx)
+            & (l_idx >= 0) & (l_idx < self.shape[0]) & (c_idx >= 0) & (c_idx < self.shape[1])
+            & (l_idx == np.floor(l_idx)) & (c_idx == np.floor(c_idx))
+        )
+        codes = np.full(len(l_idx), -1, dtype=np.int8)
+        codes[valid] = self.lookup[l_idx[valid].astype(np.intp), c_idx[valid].astype(np.intp)]
+        return codes
+
+
+# ระดับความเสี่ยงเดิมของโปรแกรม: เขียว < 4 <= เหลือง < 8 <= ส้ม < 15 <= แดง
+DEFAULT_BANDS = ['🟢 ต่ำ', '🟡 ปานกลาง', '🟠 สูง', '🔴 สูงมาก']
+DEFAULT_MATRIX = RiskMatrix.from_thresholds([4, 8, 15], DEFAULT_BANDS, size=5)
+
+
+def score_risks(df, matrix=DEFAULT_MATRIX, likelihood='L', consequence='C'):
+    """คืน DataFrame ใหม่ที่มีคอลัมน์คะแนน (L x C) และระดับความเสี่ยง (categorical)"""
+    l_values = pd.to_numeric(df[likelihood], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    c_values = pd.to_numeric(df[consequence], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    codes = matrix.band_codes(l_values, c_values)
+    # คะแนนคิดเฉพาะแถวที่ L/C อยู่ในเมทริกซ์ (แถวอื่นเป็นค่าว่าง)
+    scores = np.where(codes >= 0, l_values * c_values, np.nan)
+    return df.assign(**{
+        SCORE_COLUMN: pd.array(scores, dtype='Int64'),
+        BAND_COLUMN: pd.Categorical.from_codes(codes, categories=matrix.bands),
+    })
+
+
+def summarize_risks(scored, matrix=DEFAULT_MATRIX):
+    """สรุปจำนวนรายการในแต่ละระดับ และค่าสถิติของคะแนนความเสี่ยง"""
+    codes = scored[BAND_COLUMN].cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(matrix.bands))
+    scores = scored[SCORE_COLUMN].to_numpy(dtype=np.float64, na_value=np.nan)
+    has_scores = bool(np.isfinite(scores).any())
+    return {
+        'count': int(len(scored)),
+        'bands': dict(zip(matrix.bands, counts.tolist())),
+        'mean_score': float(np.nanmean(scores)) if has_scores else None,
+        'max_score': float(np.nanmax(scores)) if has_scores else None,
+        'unscored': int((codes < 0).sum()),
+    }
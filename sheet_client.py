@@ -0,0 +1,129 @@
+"""HTTP client สำหรับ Google Apps Script Web App
+
+- ใช้ requests.Session เดียว (keep-alive + connection pool) ร่วมกันทุกการเรียก
+- กำหนด timeout แยกตาม action
+- ลองใหม่แบบ exponential backoff เมื่อได้รับ 429/5xx หรือเชื่อมต่อไม่สำเร็จ (รอแต่ละครั้งไม่เกิน max_delay วินาที)
+- บีบอัด body ของการเขียนด้วย gzip (Apps Script ต้องถอดด้วย Utilities.ungzip)
+- มีเวอร์ชัน asyncio สำหรับอ่านหลาย Sheet พร้อมกัน
+- แจ้ง latency และจำนวน byte ของทุกคำขอให้ `observer` (ถ้ากำหนด) เช่น MetricsRegistry.observe_http
+"""
+import asyncio
+import gzip
+import json
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect timeout, read timeout) เป็นวินาที
+DEFAULT_TIMEOUTS = {
+    'read': (5, 30),
+    'write': (5, 60),
+    'patch': (5, 60),
+}
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class SheetClient:
+    """Client แบบ Thread-safe สำหรับ action read/write/patch ของ Apps Script"""
+
+    def __init__(self, url, spreadsheet_id, timeouts=None, retries=3, backoff=0.5, max_delay=10.0,
+                 pool_size=10, gzip_writes=False, retry_writes=False, sleep=time.sleep, observer=None):
+        self.url = url
+        self.spreadsheet_id = spreadsheet_id
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.retries = retries
+        self.backoff = backoff
+        # เวลารอสูงสุดก่อนลองใหม่ (รวมถึง Retry-After ที่ server ส่งมา) เพื่อไม่ให้ rerun ค้างนาน
+        self.max_delay = max_delay
+        self.gzip_writes = gzip_writes
+        # การเขียนแบบ patch อ้างอิง rowIndex จึงไม่ควรส่งซ้ำเมื่อ 5xx เว้นแต่ Apps Script รองรับ
+        self.retry_writes = retry_writes
+        self._sleep = sleep
+        # observer(action, method, seconds, sent_bytes, received_bytes, status) ถูกเรียกทุกคำขอ (status=None เมื่อเชื่อมต่อไม่สำเร็จ)
+        self.observer = observer
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def read(self, sheet_name, **params):
+        """อ่านข้อมูล Sheet (GET) และคืน requests.Response"""
+        query = {'action': 'read', 'sheet': sheet_name, 'spreadsheetId': self.spreadsheet_id}
+        query.update(params)
+        return self._send('GET', 'read', params=query)
+
+    def post(self, action, sheet_name, **fields):
+        """ส่งคำสั่งเขียน (POST) เช่น write/patch และคืน requests.Response"""
+        payload = {'action': action, 'sheet': sheet_name, 'spreadsheetId': self.spreadsheet_id}
+        payload.update(fields)
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if self.gzip_writes:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        return self._send('POST', action, data=body, headers=headers)
+
+    def _should_retry(self, method, status):
+        if method == 'GET' or status == 429:
+            return True
+        return self.retry_writes
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_delay)
+        return min(self.backoff * (2 ** attempt), self.max_delay)
+
+    def _request(self, method, action, timeout, **kwargs):
+        if self.observer is None:
+            return self.session.request(method, self.url, timeout=timeout, **kwargs)
+        sent = len(kwargs.get('data') or b'')
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self.observer(action, method, time.perf_counter() - start, sent, 0, None)
+            raise
+        self.observer(action, method, time.perf_counter() - start, sent, len(response.content), response.status_code)
+        return response
+
+    def _send(self, method, action, **kwargs):
+        timeout = self.timeouts.get(action, self.timeouts['write'])
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self._request(method, action, timeout, **kwargs)
+            except requests.exceptions.ConnectTimeout:
+                # ยังไม่ได้ส่งคำขอ จึงลองใหม่ได้ทุก method
+                if last_attempt:
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt or not self._should_retry(method, None):
+                    raise
+            else:
+                if (response.status_code not in RETRY_STATUS or last_attempt
+                        or not self._should_retry(method, response.status_code)):
+                    response.raise_for_status()
+                    return response
+                self._sleep(self._delay(attempt, response))
+                continue
+            self._sleep(self._delay(attempt))
+
+    async def read_many(self, sheet_names, max_concurrency=4):
+        """อ่านหลาย Sheet พร้อมกันด้วย asyncio (ใช้ connection pool เดียวกัน)
+
+        คืน dict {sheet_name: ผล JSON หรือ Exception ที่เกิดขึ้น}
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(name):
+            async with semaphore:
+                response = await asyncio.to_thread(self.read, name)
+                return response.json()
+
+        results = await asyncio.gather(*(fetch(name) for name in sheet_names), return_exceptions=True)
+        return dict(zip(sheet_names, results))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,352 @@
+"""ที่เก็บข้อมูล (storage backend) ของโปรแกรม: Google Apps Script หรือ SQLite บนเครื่อง
+
+ทุก backend ใช้สัญญาเดียวกัน:
+- read/write/patch ของ Sheet ตอบเป็น dict รูปแบบเดียวกับ Apps Script
+  (status, data พร้อม rowIndex, version, nextOffset/total เมื่อระบุ limit, notModified เมื่อระบุ ifVersion)
+- patch ที่ระบุ base_version ต้องตอบ conflict (ไม่แก้ไขข้อมูล) เมื่อ version ของ Sheet เปลี่ยนไปแล้ว
+- ตารางความเสี่ยงอ่าน/เขียนทีละหน่วยงานเป็น DataFrame
+- ส่งออก snapshot เป็นไฟล์ Parquet ได้ (export_parquet)
+"""
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from risk_data import RESIDUAL_C, RESIDUAL_L, RISK_COLUMNS
+
+# คอลัมน์ของตารางความเสี่ยงที่เก็บใน backend (คอลัมน์หลังควบคุมเป็นค่าว่างได้)
+RISK_STORE_COLUMNS = RISK_COLUMNS + [RESIDUAL_L, RESIDUAL_C]
+RISK_INTEGER_COLUMNS = ('L', 'C', RESIDUAL_L, RESIDUAL_C)
+RISK_SNAPSHOT_NAME = 'risk'
+
+
+def conflict_response(version):
+    """คำตอบของ patch ที่ base_version ไม่ตรงกับ version ปัจจุบัน (รูปแบบเดียวกับ Apps Script)"""
+    return {
+        'status': 'conflict',
+        'message': 'ข้อมูลใน Sheet ถูกแก้ไขหลังจากที่โหลดไว้ กรุณาโหลดข้อมูลล่าสุดก่อนบันทึก',
+        'version': version,
+    }
+
+
+def _risk_frame(df):
+    """ตารางความเสี่ยงตามคอลัมน์ที่เก็บ (ตัดคอลัมน์ที่คำนวณได้ เช่น คะแนน/ระดับ ออก)"""
+    return df.reindex(columns=[c for c in RISK_STORE_COLUMNS if c in df.columns]).reset_index(drop=True)
+
+
+class StorageBackend:
+    """สัญญาของ backend (คลาสลูกต้อง implement ทุกเมธอดยกเว้น export_parquet/close)"""
+
+    # False เมื่อตารางความเสี่ยงอยู่ในหน่วยความจำเท่านั้น (หายเมื่อ Process เริ่มใหม่)
+    persists_risk = True
+
+    def read(self, sheet_name, **params):
+        raise NotImplementedError
+
+    def write(self, sheet_name, records):
+        """เขียนทับทั้ง Sheet ด้วย records (list ของ dict คีย์ API)"""
+        raise NotImplementedError
+
+    def patch(self, sheet_name, changes, base_version=None):
+        """บันทึก changeset จาก log_changes.build_changeset และตอบ inserted/version
+
+        `base_version` คือ version ของข้อมูลที่ใช้สร้าง changeset (None = ไม่ตรวจสอบ)
+        """
+        raise NotImplementedError
+
+    def risk_departments(self):
+        raise NotImplementedError
+
+    def read_risk(self, department):
+        raise NotImplementedError
+
+    def write_risk(self, department, df):
+        raise NotImplementedError
+
+    def export_parquet(self, directory, sheet_names=()):
+        """เขียน snapshot ของแต่ละ Sheet (<sheet>.parquet) และตารางความเสี่ยงทุกหน่วยงาน (risk.parquet)"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for sheet_name in sheet_names:
+            result = self.read(sheet_name)
+            if result.get('status') != 'success':
+                raise RuntimeError(f"อ่าน Sheet '{sheet_name}' ไม่สำเร็จ: {result.get('message')}")
+            path = directory / f"{sheet_name}.parquet"
+            pd.DataFrame.from_records(result.get('data', [])).to_parquet(path, index=False)
+            paths.append(path)
+
+        tables = [
+            _risk_frame(self.read_risk(name)).assign(หน่วยงาน=name)
+            for name in self.risk_departments()
+        ]
+        risk = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=RISK_STORE_COLUMNS)
+        path = directory / f"{RISK_SNAPSHOT_NAME}.parquet"
+        risk.to_parquet(path, index=False)
+        paths.append(path)
+        return paths
+
+    def close(self):
+        pass
+
+
+class MemoryRiskStore:
+    """ตารางความเสี่ยงใน dict ของ Process (สำหรับ backend ที่ยังไม่มีที่เก็บตารางความเสี่ยง)"""
+
+    persists_risk = False
+
+    def __init__(self, tables=None):
+        self._tables = {name: _risk_frame(df) for name, df in (tables or {}).items()}
+        self._lock = threading.Lock()
+
+    def risk_departments(self):
+        with self._lock:
+            return list(self._tables)
+
+    def read_risk(self, department):
+        with self._lock:
+            df = self._tables.get(department)
+        return df.copy() if df is not None else pd.DataFrame(columns=RISK_COLUMNS)
+
+    def write_risk(self, department, df):
+        with self._lock:
+            self._tables[department] = _risk_frame(df)
+        return {'status': 'success'}
+
+
+class AppsScriptBackend(MemoryRiskStore, StorageBackend):
+    """อ่าน/เขียน Google Sheet ผ่าน Apps Script Web App (ผ่าน SheetClient)
+
+    Apps Script ยังไม่มี Sheet ของตารางความเสี่ยง จึงเก็บตารางความเสี่ยงไว้ในหน่วยความจำของ Process
+    """
+
+    def __init__(self, client, risk_tables=None):
+        MemoryRiskStore.__init__(self, risk_tables)
+        self.client = client
+
+    def read(self, sheet_name, **params):
+        return self.client.read(sheet_name, **params).json()
+
+    def write(self, sheet_name, records):
+        return self.client.post('write', sheet_name, data=records).json()
+
+    def patch(self, sheet_name, changes, base_version=None):
+        fields = {'changes': changes}
+        if base_version is not None:
+            fields['baseVersion'] = base_version
+        return self.client.post('patch', sheet_name, **fields).json()
+
+    def close(self):
+        self.client.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """เก็บ Sheet และตารางความเสี่ยงในไฟล์ SQLite บนเครื่อง (อ่านได้ในระดับมิลลิวินาที)
+
+    แถวของ Sheet เรียงตาม rowIndex เริ่มที่ `first_row` เหมือน Google Sheet (แถวที่ 1 คือหัวตาราง)
+    และการลบแถวจะเลื่อน rowIndex ของแถวถัดไปขึ้นเหมือนกัน version ของแต่ละ Sheet เพิ่มขึ้นทุกครั้งที่เขียน
+    """
+
+    def __init__(self, path, fields, group_field, first_row=2, risk_tables=None):
+        self.path = str(path)
+        self.fields = list(fields)
+        self.group_field = group_field
+        self.first_row = first_row
+        self._lock = threading.Lock()
+        # ใช้ connection เดียวร่วมกันทุก Thread (ป้องกันด้วย lock)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        if self.path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._create_schema()
+        if risk_tables and not self.risk_departments():
+            for name, df in risk_tables.items():
+                self.write_risk(name, df)
+
+    # --- โครงสร้างตาราง ---
+
+    @staticmethod
+    def _quote(name):
+        return '"' + name.replace('"', '""') + '"'
+
+    def _create_schema(self):
+        q = self._quote
+        log_columns = ', '.join(f"{q(f)} TEXT" for f in self.fields)
+        risk_columns = ', '.join(
+            f"{q(c)} {'INTEGER' if c in RISK_INTEGER_COLUMNS else 'TEXT'}"
+            for c in RISK_STORE_COLUMNS
+        )
+        with self._lock:
+            self._db.executescript(f"""
+                CREATE TABLE IF NOT EXISTS sheet_versions (
+                    sheet TEXT PRIMARY KEY, version INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS log_rows (
+                    sheet TEXT NOT NULL, row_index INTEGER NOT NULL, {log_columns}
+                );
+                CREATE INDEX IF NOT EXISTS log_rows_position ON log_rows (sheet, row_index);
+                CREATE INDEX IF NOT EXISTS log_rows_group ON log_rows (sheet, {q(self.group_field)});
+                CREATE TABLE IF NOT EXISTS risk_rows (
+                    department TEXT NOT NULL, seq INTEGER NOT NULL, {risk_columns}
+                );
+                CREATE INDEX IF NOT EXISTS risk_rows_department ON risk_rows (department, seq);
+            """)
+
+    def _version(self, sheet_name):
+        row = self._db.execute('SELECT version FROM sheet_versions WHERE sheet = ?', (sheet_name,)).fetchone()
+        return str(row[0]) if row else '0'
+
+    def _bump_version(self, sheet_name):
+        self._db.execute(
+            'INSERT INTO sheet_versions (sheet, version) VALUES (?, 1) '
+            'ON CONFLICT(sheet) DO UPDATE SET version = version + 1',
+            (sheet_name,)
+        )
+
+    def _insert_rows(self, sheet_name, start, records):
+        placeholders = ', '.join('?' * (len(self.fields) + 2))
+        columns = ', '.join(['sheet', 'row_index'] + [self._quote(f) for f in self.fields])
+        self._db.executemany(
+            f"INSERT INTO log_rows ({columns}) VALUES ({placeholders})",
+            (
+                (sheet_name, start + i, *(_cell(record.get(f)) for f in self.fields))
+                for i, record in enumerate(records)
+            )
+        )
+
+    def has_sheet(self, sheet_name):
+        """True เมื่อเคยเขียน Sheet นี้ลงฐานข้อมูลแล้ว (ใช้ตัดสินใจว่าต้องนำเข้าข้อมูลตั้งต้นหรือไม่)"""
+        with self._lock:
+            return self._version(sheet_name) != '0'
+
+    # --- Sheet ---
+
+    def read(self, sheet_name, **params):
+        with self._lock:
+            version = self._version(sheet_name)
+            if params.get('ifVersion') == version:
+                return {'status': 'notModified', 'version': version}
+            total = self._db.execute(
+                'SELECT COUNT(*) FROM log_rows WHERE sheet = ?', (sheet_name,)
+            ).fetchone()[0]
+            offset = int(params.get('offset', 0))
+            limit = int(params['limit']) if 'limit' in params else total
+            columns = ', '.join(['row_index'] + [self._quote(f) for f in self.fields])
+            rows = self._db.execute(
+                f"SELECT {columns} FROM log_rows WHERE sheet = ? ORDER BY row_index LIMIT ? OFFSET ?",
+                (sheet_name, limit, offset)
+            ).fetchall()
+
+        records = [dict(zip(self.fields, row[1:]), rowIndex=row[0]) for row in rows]
+        result = {'status': 'success', 'version': version, 'data': records}
+        if 'limit' in params:
+            result['nextOffset'] = offset + limit if offset + limit < total else None
+            result['total'] = total
+        return result
+
+    def write(self, sheet_name, records):
+        with self._lock, self._db:
+            self._db.execute('BEGIN')
+            self._db.execute('DELETE FROM log_rows WHERE sheet = ?', (sheet_name,))
+            self._insert_rows(sheet_name, self.first_row, records)
+            self._bump_version(sheet_name)
+            version = self._version(sheet_name)
+        return {'status': 'success', 'version': version}
+
+    def patch(self, sheet_name, changes, base_version=None):
+        """บันทึก changeset ตามลำดับเดียวกับ Apps Script: ตรวจ version → แก้ไข → ลบ (เลื่อนแถวถัดไปขึ้น) → ต่อท้าย"""
+        updates = changes.get('updates', [])
+        deletes = sorted(int(r) for r in changes.get('deletes', []))
+        inserts = changes.get('inserts', [])
+        assignments = ', '.join(f"{self._quote(f)} = ?" for f in self.fields)
+
+        with self._lock, self._db:
+            version = self._version(sheet_name)
+            if base_version is not None and str(base_version) != version:
+                return conflict_response(version)
+            self._db.execute('BEGIN')
+            self._db.executemany(
+                f"UPDATE log_rows SET {assignments} WHERE sheet = ? AND row_index = ?",
+                (
+                    (*(_cell(u.get(f)) for f in self.fields), sheet_name, int(u['rowIndex']))
+                    for u in updates
+                )
+            )
+            if deletes:
+                self._db.execute('CREATE TEMP TABLE IF NOT EXISTS deleted_rows (row_index INTEGER PRIMARY KEY)')
+                self._db.execute('DELETE FROM deleted_rows')
+                self._db.executemany('INSERT INTO deleted_rows VALUES (?)', ((r,) for r in deletes))
+                self._db.execute(
+                    'DELETE FROM log_rows WHERE sheet = ? AND row_index IN (SELECT row_index FROM deleted_rows)',
+                    (sheet_name,)
+                )
+                # rowIndex ใหม่ = rowIndex เดิม - จำนวนแถวที่ถูกลบก่อนหน้า
+                self._db.execute(
+                    'UPDATE log_rows SET row_index = row_index - '
+                    '(SELECT COUNT(*) FROM deleted_rows d WHERE d.row_index < log_rows.row_index) '
+                    'WHERE sheet = ? AND row_index > ?',
+                    (sheet_name, deletes[0])
+                )
+            last = self._db.execute(
+                'SELECT MAX(row_index) FROM log_rows WHERE sheet = ?', (sheet_name,)
+            ).fetchone()[0]
+            start = self.first_row if last is None else last + 1
+            self._insert_rows(sheet_name, start, inserts)
+            self._bump_version(sheet_name)
+            version = self._version(sheet_name)
+        return {'status': 'success', 'inserted': list(range(start, start + len(inserts))), 'version': version}
+
+    # --- ตารางความเสี่ยง ---
+
+    def risk_departments(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT department FROM risk_rows GROUP BY department ORDER BY MIN(rowid)'
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def read_risk(self, department):
+        columns = ', '.join(self._quote(c) for c in RISK_STORE_COLUMNS)
+        with self._lock:
+            df = pd.read_sql_query(
+                f"SELECT {columns} FROM risk_rows WHERE department = ? ORDER BY seq",
+                self._db, params=(department,)
+            )
+        # คอลัมน์หลังควบคุมที่ไม่มีข้อมูลเลย ไม่แสดงในตาราง
+        empty = [c for c in (RESIDUAL_L, RESIDUAL_C) if df[c].isna().all()]
+        df = df.drop(columns=empty)
+        return df.astype({c: 'Int64' for c in RISK_INTEGER_COLUMNS if c in df.columns})
+
+    def write_risk(self, department, df):
+        df = _risk_frame(df).reindex(columns=RISK_STORE_COLUMNS)
+        columns = ', '.join(['department', 'seq'] + [self._quote(c) for c in RISK_STORE_COLUMNS])
+        placeholders = ', '.join('?' * (len(RISK_STORE_COLUMNS) + 2))
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        with self._lock, self._db:
+            self._db.execute('BEGIN')
+            self._db.execute('DELETE FROM risk_rows WHERE department = ?', (department,))
+            self._db.executemany(
+                f"INSERT INTO risk_rows ({columns}) VALUES ({placeholders})",
+                ((department, seq, *(_cell(v) for v in row)) for seq, row in enumerate(rows))
+            )
+        return {'status': 'success'}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _cell(value):
+    """ค่าที่ SQLite เก็บได้ (ค่าว่างเป็น None, ตัวเลขของ NumPy เป็นตัวเลขของ Python)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def copy_sheet(source, target, sheet_name):
+    """นำเข้าข้อมูลทั้ง Sheet จาก backend หนึ่งไปอีก backend หนึ่ง (เช่น Apps Script → SQLite)"""
+    result = source.read(sheet_name)
+    if result.get('status') != 'success':
+        return result
+    records = [{k: v for k, v in r.items() if k != 'rowIndex'} for r in result.get('data', [])]
+    return target.write(sheet_name, records)
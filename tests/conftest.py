@@ -0,0 +1,43 @@
+"""fixture ที่ใช้ร่วมกัน: Apps Script จำลอง (benchmarks.stub_server) พร้อม client/backend ที่ชี้ไปที่ stub"""
+import pytest
+
+from benchmarks.stub_server import StubAppsScript
+from sheet_client import SheetClient
+from storage import AppsScriptBackend
+
+
+class ServedStub:
+    """stub ที่เริ่ม HTTP server แล้ว สร้าง SheetClient/AppsScriptBackend ที่ชี้ไปที่ stub ได้หลายตัว
+
+    client ที่สร้างบันทึกเวลารอระหว่างลองใหม่ไว้ใน `sleeps` แทนการรอจริง
+    """
+
+    def __init__(self, stub, closing):
+        self.stub = stub
+        self.url = stub.start()
+        self.sleeps = []
+        self._closing = closing
+
+    def client(self, **kwargs):
+        kwargs.setdefault('sleep', self.sleeps.append)
+        client = SheetClient(self.url, 'test', **kwargs)
+        self._closing.append(client)
+        return client
+
+    def backend(self, risk_tables=None, **kwargs):
+        return AppsScriptBackend(self.client(**kwargs), risk_tables=risk_tables)
+
+
+@pytest.fixture
+def serve():
+    """เริ่ม StubAppsScript(rows, **options) และคืน ServedStub (ปิด stub และ client ทั้งหมดเมื่อจบการทดสอบ)"""
+    closing = []
+
+    def start(rows=(), **options):
+        stub = StubAppsScript(rows, **options)
+        closing.append(stub)
+        return ServedStub(stub, closing)
+
+    yield start
+    for item in reversed(closing):
+        item.stop() if isinstance(item, StubAppsScript) else item.close()
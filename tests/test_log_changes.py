@@ -0,0 +1,100 @@
+"""changeset ของข้อมูลขั้นตอนการทำงาน กับ Apps Script จำลอง (benchmarks.stub_server)"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import log_rows
+from log_changes import ROW_ID, apply_ack, build_changeset, row_hashes
+from log_frame import records_to_frame
+
+LOG_KEYS = {'กลุ่มงาน': 'id', 'ขั้นตอนการทำงาน-ลักษณะงาน': 'activity', 'ตำแหน่งงาน': 'position'}
+ACTIVITY = 'ขั้นตอนการทำงาน-ลักษณะงาน'
+SHEET = 'log'
+
+
+@pytest.fixture
+def sheet(serve):
+    """คืนฟังก์ชันสร้าง (stub, backend) ตามจำนวนแถว"""
+    def start(n_rows):
+        served = serve(log_rows(n_rows))
+        return served.stub, served.backend()
+
+    return start
+
+
+def _load(backend):
+    """โหลดข้อมูลแบบที่ Session ทำ: DataFrame, hash ของแต่ละแถว และ version"""
+    result = backend.read(SHEET)
+    df = records_to_frame(result['data'], LOG_KEYS)
+    return df, row_hashes(df, LOG_KEYS), result['version']
+
+
+def _edit(df, rows):
+    edited = df.copy()
+    column = edited.columns.get_loc(ACTIVITY)
+    for i in rows:
+        edited.iloc[i, column] = f"แก้ไขแถว {i}"
+    return edited
+
+
+def _patch_bytes(sheet, n_rows, n_edits):
+    stub, backend = sheet(n_rows)
+    df, baseline, version = _load(backend)
+    changeset = build_changeset(_edit(df, range(n_edits)), baseline, LOG_KEYS, 'กลุ่มงาน')
+    assert backend.patch(SHEET, changeset, base_version=version)['status'] == 'success'
+    method, action, body_bytes = stub.requests[-1]
+    assert (method, action) == ('POST', 'patch')
+    return body_bytes
+
+
+def test_patch_payload_scales_with_edits_not_sheet_size(sheet):
+    small_sheet = _patch_bytes(sheet, 1000, 10)
+    large_sheet = _patch_bytes(sheet, 50000, 10)
+    more_edits = _patch_bytes(sheet, 1000, 100)
+
+    assert abs(large_sheet - small_sheet) < 0.05 * small_sheet
+    assert more_edits > 5 * small_sheet
+
+
+def test_apply_ack_matches_sheet_after_patch(sheet):
+    stub, backend = sheet(200)
+    df, baseline, version = _load(backend)
+    edited = _edit(df, [5, 150]).drop(index=[3, 100])
+    new_row = pd.DataFrame({'กลุ่มงาน': ['กลุ่มงาน-ใหม่'], ACTIVITY: ['เพิ่มใหม่'], 'ตำแหน่งงาน': ['ช่างเทคนิค']})
+    edited = pd.concat([edited, new_row], ignore_index=True)
+
+    changeset = build_changeset(edited, baseline, LOG_KEYS, 'กลุ่มงาน')
+    assert (len(changeset['updates']), len(changeset['deletes']), len(changeset['inserts'])) == (2, 2, 1)
+    ack = backend.patch(SHEET, changeset, base_version=version)
+    assert ack['status'] == 'success' and ack['version'] != version
+
+    local = apply_ack(edited, changeset, ack, 'กลุ่มงาน')
+    reloaded, _, reloaded_version = _load(backend)
+    assert reloaded_version == ack['version']
+    pd.testing.assert_frame_equal(
+        local[list(LOG_KEYS) + [ROW_ID]].astype(str), reloaded[list(LOG_KEYS) + [ROW_ID]].astype(str)
+    )
+
+
+def test_patch_from_stale_version_is_rejected(sheet):
+    stub, backend = sheet(30)
+    session_a, baseline_a, version_a = _load(backend)
+    session_b, baseline_b, version_b = _load(backend)
+
+    # Session B ลบแถว rowIndex 3 แล้วบันทึก: แถวถัดไปเลื่อนขึ้นหนึ่งแถว
+    deleted = build_changeset(session_b.drop(index=1), baseline_b, LOG_KEYS, 'กลุ่มงาน')
+    assert backend.patch(SHEET, deleted, base_version=version_b)['status'] == 'success'
+    after_b = [dict(r) for r in stub.rows]
+
+    # Session A แก้ไขแถว rowIndex 12 จากข้อมูลชุดเดิม: ต้องถูกปฏิเสธโดยไม่แก้ไขแถวใด
+    changeset = build_changeset(_edit(session_a, [10]), baseline_a, LOG_KEYS, 'กลุ่มงาน')
+    response = backend.patch(SHEET, changeset, base_version=version_a)
+    assert response['status'] == 'conflict'
+    assert stub.rows == after_b
+
+    # โหลดข้อมูลล่าสุดแล้วแก้ไขแถวเดิม (ตอนนี้อยู่ที่ตำแหน่ง 9) ใหม่
+    reloaded, baseline, version = _load(backend)
+    target = reloaded.index[reloaded[ACTIVITY] == session_a.at[10, ACTIVITY]][0]
+    changeset = build_changeset(_edit(reloaded, [target]), baseline, LOG_KEYS, 'กลุ่มงาน')
+    assert backend.patch(SHEET, changeset, base_version=version)['status'] == 'success'
+    assert [r['activity'] for r in stub.rows].count("แก้ไขแถว 9") == 1
+    assert len(stub.rows) == 29
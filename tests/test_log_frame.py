@@ -0,0 +1,166 @@
+"""การโหลดข้อมูลขั้นตอนการทำงานทีละหน้า (PagedLogLoader) และ snapshot ระดับ Process (LogSnapshot) จาก Apps Script จำลอง"""
+import threading
+import time
+
+import pytest
+
+from benchmarks.synthetic import log_rows
+from log_frame import LogSnapshot, PagedLogLoader, apply_changeset, compact_log_frame, records_to_frame
+
+LOG_KEYS = {'กลุ่มงาน': 'id', 'ขั้นตอนการทำงาน-ลักษณะงาน': 'activity', 'ตำแหน่งงาน': 'position'}
+PAGE_SIZE = 700
+CATEGORY_COLUMNS = ('กลุ่มงาน', 'ตำแหน่งงาน')
+SHEET = 'log'
+
+
+def _page(backend, offset):
+    return backend.read(SHEET, offset=offset, limit=PAGE_SIZE)
+
+
+def _loader(backend, concurrency, fetch=None):
+    fetch = fetch or (lambda offset: _page(backend, offset))
+    first = fetch(0)
+    seed = records_to_frame(first['data'], LOG_KEYS)
+    return PagedLogLoader(
+        fetch, first['nextOffset'], LOG_KEYS, 'กลุ่มงาน', seed=seed,
+        total=first['total'], page_size=PAGE_SIZE, concurrency=concurrency
+    )
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_loads_every_page_in_sheet_order(concurrency, serve):
+    served = serve(log_rows(5000))
+    stub, backend = served.stub, served.backend()
+    loader = _loader(backend, concurrency).start()
+    loader.join(10)
+
+    assert loader.done and loader.error is None
+    df = loader.frame()
+    assert loader.rows_loaded == len(df) == 5000
+    assert df['rowIndex'].tolist() == list(range(2, 5002))
+    assert df['ขั้นตอนการทำงาน-ลักษณะงาน'].tolist() == [r['activity'] for r in stub.rows]
+
+
+def test_concurrent_pages_overlap_and_stay_bounded(serve):
+    backend = serve(log_rows(10 * PAGE_SIZE)).backend()
+    lock = threading.Lock()
+    in_flight, peak = 0, 0
+
+    def slow_fetch(offset):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        return _page(backend, offset)
+
+    loader = _loader(backend, 3, slow_fetch)
+    start = time.perf_counter()
+    loader.start().join(10)
+
+    assert loader.error is None and len(loader.frame()) == 10 * PAGE_SIZE
+    assert peak == 3
+    # 9 หน้าที่เหลือ ครั้งละ 3 คำขอ: ใช้เวลาประมาณ 3 รอบ ไม่ใช่ 9 รอบ
+    assert time.perf_counter() - start < 9 * 0.05
+
+
+def test_rows_added_while_loading_are_fetched_by_next_offset(serve):
+    served = serve(log_rows(3000))
+    stub, backend = served.stub, served.backend()
+    loader = _loader(backend, 4)
+    stub.rows.extend(log_rows(1000, seed=1))
+    loader.start().join(10)
+
+    assert loader.error is None and len(loader.frame()) == 4000
+
+
+def test_failed_page_stops_loading_with_error(serve):
+    backend = serve(log_rows(5000)).backend()
+
+    def fetch(offset):
+        if offset == 3 * PAGE_SIZE:
+            return {'status': 'error', 'message': 'quota exceeded'}
+        return _page(backend, offset)
+
+    loader = _loader(backend, 4, fetch).start()
+    loader.join(10)
+
+    assert loader.done and str(loader.error) == 'quota exceeded'
+    assert loader.rows_loaded == 3 * PAGE_SIZE
+
+
+CHANGESET = {
+    'updates': [{'rowIndex': 5, 'id': 'กลุ่มงาน-แก้ไข', 'activity': 'แก้ไขแล้ว', 'position': 'หัวหน้างาน'}],
+    'deletes': [2, 7],
+    'inserts': [{'id': 'กลุ่มงาน-ใหม่', 'activity': 'เพิ่มใหม่', 'position': 'ตำแหน่งใหม่'}],
+}
+
+
+def _snapshot(backend):
+    def fetch_page(offset, if_version=None):
+        params = {'ifVersion': if_version} if if_version else {}
+        return backend.read(SHEET, offset=offset, limit=PAGE_SIZE, **params)
+
+    snapshot = LogSnapshot(
+        fetch_page, LOG_KEYS, 'กลุ่มงาน', prepare=lambda df: compact_log_frame(df, CATEGORY_COLUMNS), interval=60
+    ).start()
+    assert snapshot.wait(10)
+    return snapshot
+
+
+def _text(df):
+    return df.astype(object).to_dict('records')
+
+
+def test_apply_changeset_matches_a_fresh_read(serve):
+    backend = serve(log_rows(50, 5)).backend()
+    before = compact_log_frame(records_to_frame(backend.read(SHEET)['data'], LOG_KEYS), CATEGORY_COLUMNS)
+    ack = backend.patch(SHEET, CHANGESET)
+
+    applied = apply_changeset(before, CHANGESET, ack, LOG_KEYS, 'กลุ่มงาน')
+    assert _text(applied) == _text(records_to_frame(backend.read(SHEET)['data'], LOG_KEYS))
+    assert apply_changeset(before, dict(CHANGESET, deletes=[999]), ack, LOG_KEYS, 'กลุ่มงาน') is None
+
+
+def test_snapshot_applies_acked_changeset_without_reloading(serve):
+    served = serve(log_rows(3 * PAGE_SIZE, 5))
+    stub, backend = served.stub, served.backend()
+    snapshot = _snapshot(backend)
+    try:
+        base_version = snapshot.current()[2]
+        ack = backend.patch(SHEET, CHANGESET, base_version=base_version)
+        requests_before = len(stub.requests)
+
+        assert snapshot.apply(CHANGESET, ack, base_version)
+        frame, loader, version = snapshot.current()
+        assert loader is None and version == ack['version'] == stub.version()
+        # snapshot ไม่ส่งคำขอโหลดใหม่
+        assert len(stub.requests) == requests_before
+        assert _text(frame) == _text(compact_log_frame(records_to_frame(backend.read(SHEET)['data'], LOG_KEYS), CATEGORY_COLUMNS))
+        assert snapshot.stats()['applied'] == 1
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_refreshes_when_base_version_differs(serve):
+    served = serve(log_rows(3 * PAGE_SIZE, 5))
+    stub, backend = served.stub, served.backend()
+    snapshot = _snapshot(backend)
+    try:
+        state = snapshot.current()
+        # Session บันทึกจากข้อมูลชุดที่ใหม่กว่าที่ snapshot แจกอยู่
+        base_version = backend.patch(SHEET, {'updates': [], 'deletes': [2], 'inserts': []})['version']
+        ack = backend.patch(SHEET, CHANGESET, base_version=base_version)
+
+        assert not snapshot.apply(CHANGESET, ack, base_version)
+        # ระหว่างรีเฟรชยังแจกข้อมูลเดิม (Session ใหม่ไม่ต้องรอ)
+        assert snapshot.current() is state or snapshot.current()[2] == stub.version()
+        deadline = time.monotonic() + 10
+        while snapshot.current()[2] != stub.version() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert snapshot.current()[2] == stub.version() and not snapshot.stale
+        assert len(snapshot.current()[0]) == len(stub.rows)
+    finally:
+        snapshot.close()
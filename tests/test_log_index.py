@@ -0,0 +1,81 @@
+"""การรวมผลแก้ไขจาก Editor กลับเข้าข้อมูลทั้งตาราง (merge_group_edits)"""
+import pandas as pd
+
+from benchmarks.synthetic import log_rows
+from log_frame import TEXT_CHUNK_ROWS, compact_log_frame, editor_frame, records_to_frame
+from log_index import GroupIndex, merge_group_edits
+
+LOG_KEYS = {'กลุ่มงาน': 'id', 'ขั้นตอนการทำงาน-ลักษณะงาน': 'activity', 'ตำแหน่งงาน': 'position'}
+CATEGORY_COLUMNS = ('กลุ่มงาน', 'ตำแหน่งงาน')
+TEXT = 'ขั้นตอนการทำงาน-ลักษณะงาน'
+
+
+def _frame(n_rows, n_groups):
+    records = [dict(r, rowIndex=i + 2) for i, r in enumerate(log_rows(n_rows, n_groups))]
+    return compact_log_frame(records_to_frame(records, LOG_KEYS), CATEGORY_COLUMNS)
+
+
+def _expected(df, edits):
+    expected = editor_frame(df, CATEGORY_COLUMNS).astype(object)
+    for label, column, value in edits:
+        expected.at[label, column] = value
+    return expected
+
+
+def test_merge_writes_cells_across_text_chunks():
+    df = _frame(3 * TEXT_CHUNK_ROWS, 5)
+    index = GroupIndex(df['กลุ่มงาน'])
+    group = index.options()[0]
+    shown = editor_frame(df.loc[index.labels(group)], CATEGORY_COLUMNS)
+    # แถวแรกและแถวสุดท้ายของกลุ่มอยู่คนละ chunk
+    first, last = shown.index[0], shown.index[-1]
+    edits = [(first, TEXT, 'แก้ไข 1'), (last, TEXT, 'แก้ไข 2'), (last, 'ตำแหน่งงาน', 'ตำแหน่งใหม่')]
+    edited = shown.copy()
+    for label, column, value in edits:
+        edited.at[label, column] = value
+
+    expected = _expected(df, edits)
+    merged = merge_group_edits(df, shown, edited, index, 'กลุ่มงาน', CATEGORY_COLUMNS)
+
+    assert merged[TEXT].dtype == df[TEXT].dtype
+    assert merged.index.equals(expected.index)
+    assert editor_frame(merged, CATEGORY_COLUMNS).astype(object).equals(expected)
+
+
+def test_merge_rewrites_only_the_edited_chunk():
+    df = _frame(4 * TEXT_CHUNK_ROWS, 5)
+    index = GroupIndex(df['กลุ่มงาน'])
+    shown = editor_frame(df.iloc[:10], CATEGORY_COLUMNS)
+    edited = shown.copy()
+    edited.iloc[0, edited.columns.get_loc(TEXT)] = 'แก้ไขแล้ว'
+
+    merged = merge_group_edits(df, shown, edited, index, 'กลุ่มงาน', CATEGORY_COLUMNS)
+    before = merged[TEXT].array.__arrow_array__().chunks
+
+    edited.iloc[0, edited.columns.get_loc(TEXT)] = 'แก้ไขอีกครั้ง'
+    merged = merge_group_edits(merged, shown, edited, index, 'กลุ่มงาน', CATEGORY_COLUMNS)
+    after = merged[TEXT].array.__arrow_array__().chunks
+
+    assert len(after) == len(before) == 4
+    assert after[0] is not before[0] and after[0][0].as_py() == 'แก้ไขอีกครั้ง'
+    # chunk ที่ไม่มีเซลล์ที่แก้ไขใช้ buffer เดิม
+    assert all(a.buffers()[2].address == b.buffers()[2].address for a, b in zip(after[1:], before[1:]))
+
+
+def test_merge_deletes_and_appends_rows():
+    df = _frame(200, 4)
+    index = GroupIndex(df['กลุ่มงาน'])
+    group = index.options()[1]
+    shown = editor_frame(df.loc[index.labels(group)], CATEGORY_COLUMNS)
+    edited = shown.drop(index=shown.index[:2])
+    added = shown.iloc[:1].set_axis([10**6])
+    added.iloc[0, added.columns.get_loc(TEXT)] = 'แถวใหม่'
+    edited = pd.concat([edited, added])
+
+    merged = merge_group_edits(df, shown, edited, index, 'กลุ่มงาน', CATEGORY_COLUMNS)
+
+    assert len(merged) == len(df) - 1
+    assert not merged.index.isin(shown.index[:2]).any()
+    assert merged[TEXT].iloc[-1] == 'แถวใหม่'
+    assert index.labels(group)[-1] == merged.index[-1]
+    assert set(index.labels(group)) == set(merged.index[merged['กลุ่มงาน'] == group])
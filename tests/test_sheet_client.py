@@ -0,0 +1,137 @@
+"""SheetClient กับ Apps Script จำลองที่หน่วงเวลาและตอบผิดพลาดตามที่กำหนด"""
+import asyncio
+import time
+
+import pytest
+import requests
+
+from benchmarks.synthetic import log_rows
+
+SHEET = 'log'
+ROWS = log_rows(20)
+SHEETS = ['log', 'risk', 'users', 'audit']
+
+
+def test_read_retries_with_exponential_backoff(serve):
+    served = serve(ROWS, fail_rate=1.0)
+    with pytest.raises(requests.HTTPError) as error:
+        served.client(retries=3, backoff=0.5).read(SHEET)
+    assert error.value.response.status_code == 503
+    assert len(served.stub.requests) == 4
+    assert served.sleeps == [0.5, 1.0, 2.0]
+
+
+def test_read_recovers_from_intermittent_failures(serve):
+    # seed คงที่: คำขอล้มเหลวประมาณ 30% และติดกันไม่เกิน 3 ครั้ง
+    served = serve(ROWS, fail_rate=0.3, seed=1)
+    sheet_client = served.client(retries=3)
+    for _ in range(20):
+        assert len(sheet_client.read(SHEET).json()['data']) == 20
+    assert len(served.stub.requests) > 20
+    assert len(served.sleeps) == len(served.stub.requests) - 20
+
+
+def test_backoff_is_capped(serve):
+    served = serve(ROWS, fail_rate=1.0)
+    with pytest.raises(requests.HTTPError):
+        served.client(retries=5, backoff=1.0, max_delay=4.0).read(SHEET)
+    assert served.sleeps == [1.0, 2.0, 4.0, 4.0, 4.0]
+
+
+@pytest.mark.parametrize('retry_after, expected', [(2, 2.0), (3600, 10.0)])
+def test_retry_after_is_honoured_up_to_max_delay(serve, retry_after, expected):
+    served = serve(ROWS, fail_rate=1.0, fail_status=429, retry_after=retry_after)
+    with pytest.raises(requests.HTTPError):
+        served.client(retries=2, max_delay=10.0).read(SHEET)
+    assert served.sleeps == [expected, expected]
+
+
+def test_writes_are_not_retried_after_server_error(serve):
+    served = serve(ROWS, fail_rate=1.0)
+    with pytest.raises(requests.HTTPError):
+        served.client(retries=3).post('patch', SHEET, changes={'updates': [], 'deletes': [], 'inserts': []})
+    assert len(served.stub.requests) == 1
+    assert served.sleeps == []
+
+
+def test_writes_are_retried_when_enabled_or_rate_limited(serve):
+    served = serve(ROWS, fail_rate=1.0)
+    with pytest.raises(requests.HTTPError):
+        served.client(retries=2, retry_writes=True).post('write', SHEET, data=[])
+    assert len(served.stub.requests) == 3
+
+    # 429 หมายถึง server ยังไม่ได้ประมวลผลคำขอ จึงลองใหม่ได้แม้เป็นการเขียน
+    limited = serve(ROWS, fail_rate=1.0, fail_status=429)
+    with pytest.raises(requests.HTTPError):
+        limited.client(retries=2).post('write', SHEET, data=[])
+    assert len(limited.stub.requests) == 3
+
+
+def test_read_timeout_is_retried_but_write_timeout_is_not(serve):
+    served = serve(ROWS, latency=0.5)
+    sheet_client = served.client(retries=2, timeouts={'read': (1, 0.1), 'write': (1, 0.1)})
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        sheet_client.read(SHEET)
+    assert len(served.stub.requests) == 3
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        sheet_client.post('write', SHEET, data=[])
+    assert len(served.stub.requests) == 4
+
+
+def test_observer_receives_latency_bytes_and_status(serve):
+    served = serve(ROWS, latency=0.1)
+    calls = []
+    sheet_client = served.client(gzip_writes=True, observer=lambda *args: calls.append(args))
+    sheet_client.read(SHEET)
+    sheet_client.post('write', SHEET, data=log_rows(200))
+
+    (read_action, read_method, read_seconds, _, read_bytes, read_status), write = calls
+    assert (read_action, read_method, read_status) == ('read', 'GET', 200)
+    assert read_seconds >= 0.1 and read_bytes > 0
+    # body ที่ส่งถูกบีบอัดด้วย gzip และ stub ถอดได้ถูกต้อง
+    assert write[3] == served.stub.requests[-1][2]
+    assert len(served.stub.rows) == 200
+
+
+def _peak(intervals):
+    """จำนวนคำขอที่ทำงานซ้อนกันมากที่สุด จากช่วงเวลา (เริ่ม, จบ) ของแต่ละคำขอ"""
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    running = peak = 0
+    for _, step in events:
+        running += step
+        peak = max(peak, running)
+    return peak
+
+
+@pytest.mark.parametrize('max_concurrency, rounds', [(4, 1), (2, 2)])
+def test_read_many_overlaps_requests_up_to_max_concurrency(serve, max_concurrency, rounds):
+    served = serve(ROWS, latency=0.2)
+    intervals = []
+
+    def observe(action, method, seconds, *_):
+        end = time.perf_counter()
+        intervals.append((end - seconds, end))
+
+    sheet_client = served.client(observer=observe)
+    start = time.perf_counter()
+    results = asyncio.run(sheet_client.read_many(SHEETS, max_concurrency=max_concurrency))
+    elapsed = time.perf_counter() - start
+
+    assert list(results) == SHEETS
+    assert all(len(result['data']) == 20 for result in results.values())
+    assert _peak(intervals) == max_concurrency
+    # 4 Sheet ครั้งละ max_concurrency คำขอ: ใช้เวลาประมาณ rounds รอบ ไม่ใช่ 4 รอบ
+    assert rounds * 0.2 <= elapsed < (rounds + 1) * 0.2
+
+
+def test_read_many_returns_failed_sheet_as_exception(serve):
+    # seed คงที่: ล้มเหลว 1 ใน 4 คำขอ
+    served = serve(ROWS, fail_rate=0.2, seed=1)
+    results = asyncio.run(served.client(retries=0).read_many(SHEETS))
+
+    failed = [name for name, result in results.items() if isinstance(result, Exception)]
+    assert len(failed) == 1
+    assert results[failed[0]].response.status_code == 503
+    assert all(len(results[name]['data']) == 20 for name in SHEETS if name not in failed)
+    assert len(served.stub.requests) == len(SHEETS)
@@ -0,0 +1,161 @@
+"""สัญญาของ StorageBackend: ทุก backend ต้องตอบเหมือนกัน (Apps Script จำลอง, SQLite, write-behind)"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import log_rows
+from risk_data import RISK_COLUMNS, load_risk_mock_data
+from storage import RISK_SNAPSHOT_NAME, AppsScriptBackend, SQLiteBackend
+from write_behind import WriteBehindBackend
+
+FIELDS = ['id', 'activity', 'position']
+SHEET = 'log'
+ROWS = log_rows(12, 3)
+
+
+@pytest.fixture(params=['apps_script', 'sqlite', 'write_behind'])
+def backend(request, tmp_path, serve):
+    """backend ที่มี Sheet ข้อมูลตั้งต้น ROWS และตารางความเสี่ยงจำลอง"""
+    risk_tables = load_risk_mock_data()
+    served = serve()
+    if request.param == 'apps_script':
+        instance = served.backend(risk_tables, retries=0)
+    elif request.param == 'sqlite':
+        instance = SQLiteBackend(tmp_path / 'local.db', FIELDS, 'id', risk_tables=risk_tables)
+    else:
+        local = SQLiteBackend(tmp_path / 'local.db', FIELDS, 'id', risk_tables=risk_tables)
+        instance = WriteBehindBackend(
+            local, served.backend(retries=0), tmp_path / 'sync.journal', flush_interval=0.01
+        ).start()
+    assert instance.write(SHEET, ROWS)['status'] == 'success'
+    yield instance
+    instance.close()
+
+
+def _records(result):
+    return [{k: v for k, v in r.items() if k != 'rowIndex'} for r in result['data']]
+
+
+def test_read_returns_rows_with_row_index_and_version(backend):
+    result = backend.read(SHEET)
+    assert result['status'] == 'success'
+    assert _records(result) == ROWS
+    assert [r['rowIndex'] for r in result['data']] == list(range(2, len(ROWS) + 2))
+    assert result['version']
+
+
+def test_write_ack_carries_the_new_version(backend):
+    ack = backend.write(SHEET, ROWS[:5])
+    assert ack['status'] == 'success'
+    assert ack['version'] == backend.read(SHEET)['version']
+
+
+def test_read_with_current_version_is_not_modified(backend):
+    version = backend.read(SHEET)['version']
+    assert backend.read(SHEET, ifVersion=version) == {'status': 'notModified', 'version': version}
+
+    backend.write(SHEET, ROWS[:5])
+    result = backend.read(SHEET, ifVersion=version)
+    assert result['status'] == 'success'
+    assert len(result['data']) == 5
+
+
+@pytest.mark.parametrize('offset, limit, rows, next_offset', [
+    (0, 5, ROWS[:5], 5),
+    (10, 5, ROWS[10:], None),
+    (len(ROWS), 5, [], None),
+    (len(ROWS) + 10, 5, [], None),
+    (0, 0, [], 0),
+])
+def test_paged_read(backend, offset, limit, rows, next_offset):
+    result = backend.read(SHEET, offset=offset, limit=limit)
+    assert result['status'] == 'success'
+    assert _records(result) == rows
+    assert result['nextOffset'] == next_offset
+    assert result['total'] == len(ROWS)
+
+
+def test_patch_updates_deletes_then_appends(backend):
+    version = backend.read(SHEET)['version']
+    changes = {
+        'updates': [dict(ROWS[3], rowIndex=5, activity='แก้ไขแล้ว')],
+        'deletes': [2, 4],
+        'inserts': [{'id': 'กลุ่มงาน-ใหม่', 'activity': 'เพิ่มใหม่', 'position': 'ช่างเทคนิค'}],
+    }
+    ack = backend.patch(SHEET, changes, base_version=version)
+
+    expected = [ROWS[1], dict(ROWS[3], activity='แก้ไขแล้ว')] + ROWS[4:] + changes['inserts']
+    result = backend.read(SHEET)
+    assert ack['status'] == 'success'
+    assert ack['inserted'] == [len(expected) + 1]
+    assert ack['version'] == result['version'] != version
+    assert _records(result) == expected
+
+
+def test_patch_from_stale_version_is_rejected(backend):
+    stale = backend.read(SHEET)['version']
+    backend.patch(SHEET, {'updates': [], 'deletes': [2], 'inserts': []}, base_version=stale)
+    before = backend.read(SHEET)
+
+    ack = backend.patch(SHEET, {'updates': [], 'deletes': [2], 'inserts': []}, base_version=stale)
+    assert ack['status'] == 'conflict'
+    assert ack['version'] == before['version']
+    assert backend.read(SHEET) == before
+
+
+def test_risk_tables_round_trip(backend):
+    tables = load_risk_mock_data()
+    assert backend.risk_departments() == list(tables)
+    for name, df in tables.items():
+        pd.testing.assert_frame_equal(
+            backend.read_risk(name)[RISK_COLUMNS].astype(object), df[RISK_COLUMNS].astype(object)
+        )
+
+    edited = tables['แผนกบัญชี'].iloc[:1].assign(L=5)
+    assert backend.write_risk('แผนกบัญชี', edited)['status'] == 'success'
+    assert backend.write_risk('แผนกใหม่', edited)['status'] == 'success'
+    assert backend.risk_departments() == list(tables) + ['แผนกใหม่']
+    for name in ('แผนกบัญชี', 'แผนกใหม่'):
+        pd.testing.assert_frame_equal(
+            backend.read_risk(name)[RISK_COLUMNS].astype(object), edited[RISK_COLUMNS].astype(object)
+        )
+
+
+def test_export_parquet(backend, tmp_path):
+    paths = backend.export_parquet(tmp_path / 'export', [SHEET])
+    assert [p.name for p in paths] == [f'{SHEET}.parquet', f'{RISK_SNAPSHOT_NAME}.parquet']
+
+    sheet = pd.read_parquet(paths[0])
+    assert sheet[FIELDS].to_dict('records') == ROWS
+    risk = pd.read_parquet(paths[1])
+    assert len(risk) == sum(len(df) for df in load_risk_mock_data().values())
+    assert list(risk['หน่วยงาน'].unique()) == backend.risk_departments()
+
+
+@pytest.mark.parametrize('remote_patch', [True, False])
+def test_write_behind_syncs_to_remote(tmp_path, serve, remote_patch):
+    served = serve()
+    stub = served.stub
+    local = SQLiteBackend(tmp_path / 'local.db', FIELDS, 'id')
+    backend = WriteBehindBackend(
+        local, served.backend(retries=0), tmp_path / 'sync.journal', flush_interval=0.01, remote_patch=remote_patch
+    ).start()
+    try:
+        backend.write(SHEET, ROWS)
+        for save in range(3):
+            version = backend.read(SHEET)['version']
+            backend.patch(SHEET, {
+                'updates': [dict(ROWS[save], rowIndex=3, activity=f'แก้ไขครั้งที่ {save}')],
+                'deletes': [2],
+                'inserts': [{'id': 'กลุ่มงาน-ใหม่', 'activity': f'เพิ่มครั้งที่ {save}', 'position': ''}],
+            }, base_version=version)
+        assert backend.wait_synced(10)
+        assert stub.rows == _records(backend.read(SHEET))
+        assert backend.sync_status()['pending'] == 0
+        # remote ที่ไม่รองรับ patch ได้รับเฉพาะการเขียนทับทั้ง Sheet
+        assert ('patch' in {action for _, action, _ in stub.requests}) == remote_patch
+    finally:
+        backend.close()
+
+
+def test_memory_risk_store_does_not_persist(backend):
+    assert backend.persists_risk == (not isinstance(backend, AppsScriptBackend))
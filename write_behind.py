@@ -0,0 +1,312 @@
+"""บันทึกแบบ write-behind: เขียนลงที่เก็บในเครื่องทันที แล้วซิงก์ไปยัง Google Sheet ใน Background
+
+- ทุกการบันทึกถูกต่อท้าย journal (JSON lines + fsync) ก่อนเขียนลงที่เก็บในเครื่อง (SQLiteBackend)
+- Worker thread รวมรายการที่รอของแต่ละ Sheet เป็นคำขอเดียว (compose_changesets) และลองใหม่แบบ backoff
+- เมื่อ Process เริ่มใหม่ รายการที่ยังไม่ซิงก์จะถูกเล่นซ้ำลงที่เก็บในเครื่อง (ถ้ายังไม่ได้เขียน) แล้วส่งต่อ
+
+- patch ที่ระบุ base_version ตรวจกับ version ของที่เก็บในเครื่อง (การซิงก์ไป remote จึงไม่ส่ง baseVersion)
+
+สมมติว่า Sheet ถูกแก้ไขผ่านโปรแกรมนี้เท่านั้น (rowIndex ของในเครื่องและใน Sheet ต้องตรงกัน)
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from log_changes import compose_changesets
+from storage import StorageBackend, conflict_response
+
+
+class SyncError(Exception):
+    """remote ตอบกลับว่าบันทึกไม่สำเร็จ"""
+
+
+class Journal:
+    """บันทึกรายการที่รอซิงก์แบบต่อท้ายไฟล์ (ไม่ปลอดภัยต่อหลาย Thread ผู้เรียกต้องล็อกเอง)
+
+    บรรทัดของไฟล์:
+    - {"seq", "sheet", "action", "payload", "rows", "version"} : รายการบันทึก
+    - {"synced": seq, "sheet": ...} : ซิงก์รายการของ Sheet นั้นถึง seq แล้ว (sheet=null คือทุก Sheet)
+    - {"dropped": seq} : รายการที่เขียนลงที่เก็บในเครื่องไม่สำเร็จ (ไม่ต้องซิงก์)
+    """
+
+    def __init__(self, path, compact_bytes=1024 * 1024):
+        self.path = Path(path)
+        self.compact_bytes = compact_bytes
+        self.pending = []
+        self.last_seq = 0
+        self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        raw = self.path.read_bytes()
+        if raw and not raw.endswith(b'\n'):
+            # บรรทัดสุดท้ายเขียนไม่ครบเพราะ Process ล่ม: ตัดทิ้งก่อนต่อท้ายรายการใหม่
+            raw = raw[:raw.rfind(b'\n') + 1]
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(raw))
+
+        entries = {}
+        for line in raw.decode('utf-8').splitlines():
+            record = json.loads(line)
+            if 'synced' in record:
+                sheet, seq = record['sheet'], record['synced']
+                entries = {
+                    k: e for k, e in entries.items()
+                    if k > seq or (sheet is not None and e['sheet'] != sheet)
+                }
+                self.last_seq = max(self.last_seq, seq)
+            elif 'dropped' in record:
+                entries.pop(record['dropped'], None)
+            else:
+                entries[record['seq']] = record
+                self.last_seq = max(self.last_seq, record['seq'])
+        self.pending = [entries[k] for k in sorted(entries)]
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, entry):
+        """ต่อท้ายรายการใหม่ (กำหนด seq ให้) และคืนรายการนั้น"""
+        entry = dict(entry, seq=self.last_seq + 1)
+        self._write(entry)
+        self.last_seq = entry['seq']
+        self.pending.append(entry)
+        return entry
+
+    def drop(self, entry):
+        self._write({'dropped': entry['seq']})
+        self.pending = [e for e in self.pending if e['seq'] != entry['seq']]
+
+    def mark_synced(self, sheet, seq):
+        self._write({'synced': seq, 'sheet': sheet})
+        self.pending = [e for e in self.pending if e['sheet'] != sheet or e['seq'] > seq]
+        if not self.pending and self._file.tell() > self.compact_bytes:
+            self._compact()
+
+    def _compact(self):
+        """เขียนไฟล์ใหม่ให้เหลือเฉพาะ seq ล่าสุด (เรียกเมื่อไม่มีรายการค้างเท่านั้น)"""
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'synced': self.last_seq, 'sheet': None}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        self._file.close()
+
+
+def _retry_as_is(error):
+    """True เมื่อแน่ใจว่า remote ยังไม่ได้รับคำขอ (ส่งคำขอเดิมซ้ำได้)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code == 429
+
+
+class WriteBehindBackend(StorageBackend):
+    """อ่าน/เขียนที่ `local` ทันที และซิงก์การเขียน Sheet ไปยัง `remote` ด้วย Worker thread
+
+    เมื่อส่งไม่สำเร็จโดยไม่แน่ใจว่า remote บันทึกไปแล้วหรือไม่ (เช่น timeout ระหว่างรอคำตอบ)
+    ครั้งถัดไปจะเขียนทับทั้ง Sheet ด้วยข้อมูลในเครื่องแทนการส่ง patch ซ้ำ
+    `remote_patch=False` เมื่อ remote ไม่รองรับ patch: ซิงก์ด้วยการเขียนทับทั้ง Sheet เสมอ
+    """
+
+    def __init__(self, local, remote, journal_path, flush_interval=0.5, batch_size=100,
+                 backoff=1.0, max_backoff=60.0, remote_patch=True):
+        self.local = local
+        self.remote = remote
+        self.remote_patch = remote_patch
+        self.journal = Journal(journal_path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # ครอบการต่อท้าย journal และการเขียนในเครื่อง เพื่อให้ลำดับตรงกันเสมอ
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._resync = set()
+        self._status = {'synced': 0, 'failures': 0, 'last_error': None, 'last_sync': None}
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._replay()
+
+    def start(self):
+        self._thread.start()
+        self._wake.set()
+        return self
+
+    # --- การเขียนในเครื่อง ---
+
+    def _sheet_info(self, sheet_name):
+        info = self.local.read(sheet_name, offset=0, limit=0)
+        return int(info['version']), info['total']
+
+    def _apply_local(self, entry):
+        if entry['action'] == 'write':
+            return self.local.write(entry['sheet'], entry['payload'])
+        return self.local.patch(entry['sheet'], entry['payload'])
+
+    def _replay(self):
+        """เขียนรายการที่ค้างใน journal แต่ยังไม่ถึงที่เก็บในเครื่อง (Process ล่มระหว่างบันทึก)"""
+        for entry in list(self.journal.pending):
+            version, _ = self._sheet_info(entry['sheet'])
+            if entry['version'] > version:
+                self._apply_local(entry)
+
+    def _submit(self, sheet_name, action, payload, base_version=None):
+        with self._lock:
+            version, total = self._sheet_info(sheet_name)
+            if base_version is not None and str(base_version) != str(version):
+                # ตรวจกับ version ในเครื่องก่อนลง journal (รายการที่ลง journal แล้วต้องซิงก์ได้เสมอ)
+                return conflict_response(str(version))
+            entry = self.journal.append({
+                'sheet': sheet_name, 'action': action, 'payload': payload,
+                'rows': total, 'version': version + 1
+            })
+            try:
+                result = self._apply_local(entry)
+            except Exception:
+                self.journal.drop(entry)
+                raise
+        self._wake.set()
+        return result
+
+    # --- สัญญาของ StorageBackend ---
+
+    def read(self, sheet_name, **params):
+        return self.local.read(sheet_name, **params)
+
+    def write(self, sheet_name, records):
+        return self._submit(sheet_name, 'write', records)
+
+    def patch(self, sheet_name, changes, base_version=None):
+        return self._submit(sheet_name, 'patch', changes, base_version)
+
+    @property
+    def persists_risk(self):
+        return self.local.persists_risk
+
+    def risk_departments(self):
+        return self.local.risk_departments()
+
+    def read_risk(self, department):
+        return self.local.read_risk(department)
+
+    def write_risk(self, department, df):
+        return self.local.write_risk(department, df)
+
+    # --- การซิงก์ ---
+
+    def _coalesce(self, entries):
+        """รวมรายการที่รอเป็นคำขอไม่เกิน 2 ครั้ง: write ล่าสุด (ถ้ามี) และ patch ที่รวมแล้วของรายการหลังจากนั้น"""
+        writes = [i for i, e in enumerate(entries) if e['action'] == 'write']
+        batch = []
+        if writes:
+            last = entries[writes[-1]]
+            batch.append(('write', last['payload']))
+            rest, total = entries[writes[-1] + 1:], len(last['payload'])
+        else:
+            rest, total = entries, entries[0]['rows']
+        if rest:
+            changes = compose_changesets([e['payload'] for e in rest], total, self.local.first_row)
+            batch.append(('patch', changes))
+        return batch
+
+    def _flush_sheet(self, sheet_name):
+        with self._lock:
+            entries = [e for e in self.journal.pending if e['sheet'] == sheet_name]
+            if sheet_name in self._resync or not self.remote_patch:
+                data = self.local.read(sheet_name)['data']
+                batch = [('write', [{k: v for k, v in r.items() if k != 'rowIndex'} for r in data])]
+            else:
+                entries = entries[:self.batch_size]
+                batch = self._coalesce(entries)
+
+        try:
+            for action, payload in batch:
+                send = self.remote.write if action == 'write' else self.remote.patch
+                result = send(sheet_name, payload)
+                if result.get('status') != 'success':
+                    raise SyncError(result.get('message') or f"{action} ไม่สำเร็จ")
+        except Exception as e:
+            with self._lock:
+                self._status['failures'] += 1
+                self._status['last_error'] = f"{type(e).__name__}: {e}"
+                if not _retry_as_is(e):
+                    self._resync.add(sheet_name)
+            return False
+
+        with self._lock:
+            self.journal.mark_synced(sheet_name, entries[-1]['seq'])
+            self._resync.discard(sheet_name)
+            self._status['synced'] += len(entries)
+            self._status['last_error'] = None
+            self._status['last_sync'] = time.time()
+        return True
+
+    def flush(self):
+        """ส่งรายการที่รอของทุก Sheet ไปยัง remote หนึ่งรอบ คืน True เมื่อส่งสำเร็จทั้งหมด"""
+        with self._lock:
+            sheets = list(dict.fromkeys(e['sheet'] for e in self.journal.pending))
+        ok = True
+        for sheet_name in sheets:
+            ok = self._flush_sheet(sheet_name) and ok
+        return ok
+
+    def _run(self):
+        failures = 0
+        while True:
+            if failures:
+                delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+                if self._stop.wait(delay):
+                    return
+            else:
+                self._wake.wait()
+                self._wake.clear()
+                # รอสักครู่เพื่อรวมการบันทึกที่ตามมาติด ๆ กันเป็นคำขอเดียว
+                if self._stop.wait(self.flush_interval):
+                    return
+            failures = 0 if self.flush() else failures + 1
+            if not failures and self.pending_count():
+                # ยังมีรายการเกิน batch_size: ส่งรอบถัดไปทันที
+                self._wake.set()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self.journal.pending)
+
+    def sync_status(self):
+        """สถานะสำหรับแสดงใน UI: จำนวนรายการที่รอ/ซิงก์แล้ว และข้อผิดพลาดล่าสุด"""
+        with self._lock:
+            return dict(self._status, pending=len(self.journal.pending))
+
+    def wait_synced(self, timeout=None):
+        """รอจนไม่มีรายการค้าง (ใช้ใน benchmark/การปิดโปรแกรม) คืน True เมื่อซิงก์ครบ"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_count():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self):
+        """หยุด Worker (รายการที่ค้างยังอยู่ใน journal และจะถูกส่งเมื่อเริ่มใหม่)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            self.journal.close()
+        self.local.close()
+        self.remote.close()